@@ -4,7 +4,9 @@
 
 from os import getcwd
 from os import makedirs
+from os import remove
 from os.path import join
+from glob import glob
 import pathlib
 import argparse
 from importlib import import_module
@@ -12,6 +14,10 @@ import sys
 from shutil import copy
 import time
 from datetime import timedelta
+from collections import deque
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 import h5py
 import numpy as np
@@ -95,8 +101,12 @@ def checkCommandArguments():
                                      formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     Parser.add_argument('inputFile', help='User input file')
     Parser.add_argument('output_directory', help='Output directory for results')
-    Parser.add_argument('--skipHDF5', dest='skipHDF5', default=False, help='Skip the creation of the HDF5 files.  Only do this if you know they have been created.')
-    Parser.add_argument('--seed', dest='seed', type=int, default=None, help='Specify a single integer to fix the seed of the random number generator. Only used in serial mode.')
+    Parser.add_argument('--skipHDF5', dest='skipHDF5', default=False, help='Skip the creation of the HDF5 files.  Only do this if you know they have been created. Data points that already have results in the files are not inverted again, so use this to restart an interrupted inversion.')
+    Parser.add_argument('--seed', dest='seed', type=int, default=None, help='Specify a single integer to fix the master seed of the random number generators. Each data point is inverted with a generator spawned from the master seed and its fiducial, so its results do not depend on the number of processes or the order of the inversions.')
+    Parser.add_argument('--batchSize', dest='batchSize', type=int, default=1, help='Number of data points the master sends to a worker per request. Only used in parallel mode.')
+    Parser.add_argument('--workers', dest='workers', type=int, default=None, help='Number of worker processes to invert a dataset with on a single machine, without MPI. Only used in serial mode.')
+    Parser.add_argument('--schedule', dest='schedule', default='fifo', choices=['fifo', 'ljf'], help='Order in which the master sends out data points. fifo follows the data file. ljf sends the points with the largest estimated cost first. Only used in parallel mode.')
+    Parser.add_argument('--shards', dest='shards', action='store_true', help='Each worker writes its results to its own shard file rather than sending them to the master. The shards are merged into the line results files at the end of the run, or with geobipy_merge after an interrupted run. Only used in parallel mode.')
 
     args = Parser.parse_args()
 
@@ -105,15 +115,22 @@ def checkCommandArguments():
 
     output_directory = pathlib.Path(args.output_directory)
 
-    return inputFile, output_directory, args.skipHDF5, args.seed
+    assert args.batchSize > 0, ValueError("batchSize must be > 0")
+    if not args.workers is None:
+        assert args.workers > 0, ValueError("workers must be > 0")
 
+    return inputFile, output_directory, args.skipHDF5, args.seed, args.batchSize, args.schedule, args.workers, args.shards
 
-def serial_geobipy(inputFile, output_directory, seed=None):
+
+def serial_geobipy(inputFile, output_directory, seed=None, skipHDF5=False, workers=None):
 
     print('Running GeoBIPy in serial mode')
     print('Using user input file {}'.format(inputFile))
     print('Output files will be produced at {}'.format(output_directory))
 
+    seed = masterSeed(seed)
+    print('Using master seed {}'.format(seed))
+
     # Make sure the results folders exist
     makedirs(output_directory, exist_ok=True)
 
@@ -128,8 +145,29 @@ def serial_geobipy(inputFile, output_directory, seed=None):
 
     if isinstance(Dataset, DataPoint):
         serial_datapoint(userParameters, output_directory, seed=seed)
+    elif workers is None:
+        serial_dataset(userParameters, output_directory, seed=seed, skipHDF5=skipHDF5)
     else:
-        serial_dataset(userParameters, output_directory, seed=seed)
+        multiprocessing_dataset(inputFile, userParameters, output_directory, workers, seed=seed, skipHDF5=skipHDF5)
+
+
+def masterSeed(seed=None):
+    """Get the master seed of the random number generators.
+
+    Parameters
+    ----------
+    seed : int, optional
+        Seed given by the user. If None, a seed is drawn from the operating system.
+
+    Returns
+    -------
+    out : int
+        Master seed. Rerun with this seed to reproduce the results.
+
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    return seed
 
 
 def serial_datapoint(userParameters, output_directory, seed=None):
@@ -138,7 +176,7 @@ def serial_datapoint(userParameters, output_directory, seed=None):
     datapoint.read(userParameters.dataFilename)
 
     # Get the random number generator
-    prng = np.random.RandomState(seed)
+    prng = customFunctions.fiducialPrng(seed, datapoint.fiducial)
 
     options = userParameters.userParameters(datapoint)
     options.output_directory = output_directory
@@ -146,21 +184,25 @@ def serial_datapoint(userParameters, output_directory, seed=None):
     infer(options, datapoint, prng=prng)
 
 
-def serial_dataset(userParameters, output_directory, seed=None):
+def serial_dataset(userParameters, output_directory, seed=None, skipHDF5=False):
 
     Dataset = type(userParameters.data_type)(systems=userParameters.systemFilename)
 
     results = Inference3D(output_directory, userParameters.systemFilename)
-    results.createHDF5(Dataset, userParameters)
+    if skipHDF5:
+        Dataset._initLineByLineRead(userParameters.dataFilename, userParameters.systemFilename)
+    else:
+        results.createHDF5(Dataset, userParameters)
 
-    # Get the random number generator
-    prng = np.random.RandomState(seed)
+    completed = completedDatapoints(results.lineNumbers, results.lines)
 
     # Loop through data points in the file.
-    for _ in range(Dataset.nPoints):
-        datapoint = Dataset._readSingleDatapoint()
+    for datapoint in remainingDatapoints(Dataset, completed):
         options = userParameters.userParameters(datapoint)
 
+        # Get the random number generator for this data point
+        prng = customFunctions.fiducialPrng(seed, datapoint.fiducial)
+
         iLine = results.lineIndex(lineNumber=datapoint.lineNumber)
         infer(options, datapoint, prng=prng, LineResults=results.lines[iLine])
 
@@ -168,11 +210,180 @@ def serial_dataset(userParameters, output_directory, seed=None):
     Dataset._closeDatafiles()
 
 
-def parallel_geobipy(inputFile, outputDir, skipHDF5):
+def completedDatapoints(lineNumbers, LineResults):
+    """Get the data points that already have results in the line results files.
+
+    Parameters
+    ----------
+    lineNumbers : array_like
+        Line number of each line results file.
+    LineResults : list of geobipy.Inference2D
+        Line results files.
+
+    Returns
+    -------
+    out : set of tuples
+        Line number and fiducial of each completed data point.
+
+    """
+    out = set()
+    for line, LR in zip(lineNumbers, LineResults):
+        out.update((line, fiducial) for fiducial in LR.fiducials[LR.completed])
+    return out
+
+
+def remainingDatapoints(Dataset, completed):
+    """Generator over the data points in the data file that are not completed.
+
+    Parameters
+    ----------
+    Dataset : geobipy.Data
+        Dataset prepared for reading a point at a time.
+    completed : set of tuples
+        Line number and fiducial of each data point to skip.
+
+    """
+    DataPoint = Dataset._readSingleDatapoint()
+    while not DataPoint is None:
+        if not (DataPoint.lineNumber, DataPoint.fiducial) in completed:
+            yield DataPoint
+        DataPoint = Dataset._readSingleDatapoint()
+
+
+def multiprocessing_dataset(inputFile, userParameters, output_directory, nWorkers, seed=None, skipHDF5=False):
+    """Invert a dataset with a pool of worker processes on a single machine.
+
+    This process reads the data points, hands them to the workers, and is the only one that writes to the
+    line results files, so neither MPI nor parallel HDF5 are needed. The workers pass their results back
+    to this process as they finish.
+
+    Parameters
+    ----------
+    inputFile : pathlib.Path
+        User input file.
+    userParameters : module
+        Module imported from the user input file.
+    output_directory : pathlib.Path
+        Directory containing the line results files.
+    nWorkers : int
+        Number of worker processes.
+    seed : int, optional
+        Master seed of the random number generators, see masterSeed.
+    skipHDF5 : bool, optional
+        Write to existing line results files rather than creating them.
+
+    """
+
+    print('Inverting with {} worker processes'.format(nWorkers))
+
+    Dataset = type(userParameters.data_type)(systems=userParameters.systemFilename)
+
+    results = Inference3D(output_directory, userParameters.systemFilename)
+    if skipHDF5:
+        Dataset._initLineByLineRead(userParameters.dataFilename, userParameters.systemFilename)
+    else:
+        results.createHDF5(Dataset, userParameters)
+
+    completed = completedDatapoints(results.lineNumbers, results.lines)
+    remaining = remainingDatapoints(Dataset, completed)
+
+    nPoints = Dataset.nPoints - len(completed)
+    nRead = 0
+    nFinished = 0
+    t0 = time.time()
+
+    # Each worker gets a unique rank, counting from 1 as for the MPI workers.
+    counter = multiprocessing.Value('i', 0)
+
+    with ProcessPoolExecutor(max_workers=nWorkers, initializer=_initializeWorker, initargs=(inputFile, counter, masterSeed(seed))) as pool:
+
+        running = set()
+        while nFinished < nPoints:
+            # Keep a couple of data points queued for every worker.
+            while nRead < nPoints and len(running) < 2 * nWorkers:
+                DataPoint = next(remaining, None)
+                # If DataPoint is None, then we reached the end of the file and no more points can be read in.
+                if DataPoint is None:
+                    nPoints = nRead
+                    break
+                running.add(pool.submit(_workerInfer, DataPoint))
+                nRead += 1
+
+            if nFinished == nPoints:
+                break
+
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                lineNumber, fiducial, failed, Res = future.result()
+                if not Res is None:
+                    results.lines[results.lineIndex(lineNumber=lineNumber)].results2Hdf(Res)
+                if failed:
+                    print("Datapoint {} failed to converge".format(fiducial))
+                nFinished += 1
+
+            e = time.time() - t0
+            elapsed = str(timedelta(seconds=e))
+            eta = str(timedelta(seconds=(np.float64(nPoints) / np.float64(nFinished)) * e - e))
+            print("Remaining Points {}/{} || Elapsed Time: {} h:m:s || ETA {} h:m:s".format(nPoints-nFinished, nPoints, elapsed, eta))
+
+    results.close()
+    Dataset._closeDatafiles()
+
+
+class _ResultsCollector(object):
+    """Takes the place of the line results in a worker process, and keeps the results so they can be sent to the writer."""
+
+    def __init__(self):
+        self.results = None
+
+    def results2Hdf(self, results):
+        # Figures cannot be sent between processes
+        results.fig = None
+        self.results = results
+
+
+def _initializeWorker(inputFile, counter, seed):
+    """Import the user parameters of a worker process."""
+    global _userParameters, _seed, _rank
+
+    sys.path.append(getcwd())
+    _userParameters = import_module(str(inputFile.with_suffix('')), package='geobipy')
+
+    with counter.get_lock():
+        counter.value += 1
+        _rank = counter.value
+
+    _seed = seed
+
+
+def _workerInfer(DataPoint):
+    """Invert a data point in a worker process.
 
-    parallel_mpi(inputFile, outputDir, skipHDF5)
+    Returns
+    -------
+    lineNumber : float
+        Line number of the data point.
+    fiducial : float
+        Fiducial of the data point.
+    failed : bool
+        Whether the inversion failed to burn in.
+    results : geobipy.Inference1D or None
+        Results of the inversion, None if the user parameters do not save them.
 
-def parallel_mpi(inputFile, outputDir, skipHDF5):
+    """
+    options = _userParameters.userParameters(DataPoint)
+    collector = _ResultsCollector()
+    prng = customFunctions.fiducialPrng(_seed, DataPoint.fiducial)
+    failed = infer(options, DataPoint, prng=prng, rank=_rank, LineResults=collector)
+    return DataPoint.lineNumber, DataPoint.fiducial, failed, collector.results
+
+
+def parallel_geobipy(inputFile, outputDir, skipHDF5, batchSize=1, schedule='fifo', seed=None, shards=False):
+
+    parallel_mpi(inputFile, outputDir, skipHDF5, batchSize, schedule, seed, shards)
+
+def parallel_mpi(inputFile, outputDir, skipHDF5, batchSize=1, schedule='fifo', seed=None, shards=False):
 
     from mpi4py import MPI
     from geobipy.src.base import MPI as myMPI
@@ -199,8 +410,7 @@ def parallel_mpi(inputFile, outputDir, skipHDF5):
             UP.systemFilename = [UP.systemFilename]
 
     # Everyone needs the system classes read in early.
-    Dataset = type(UP.data_type)()
-    Dataset.systems = UP.systemFilename
+    Dataset = type(UP.data_type)(systems=UP.systemFilename)
 
     # Get the number of points in the file.
     if masterRank:
@@ -208,19 +418,14 @@ def parallel_mpi(inputFile, outputDir, skipHDF5):
         assert (nRanks > 1), Exception("You need to use at least 2 ranks for the mpi version.")
         assert (nRanks <= nPoints+1), Exception('You requested more ranks than you have data points.  Please lower the number of ranks to a maximum of {}. '.format(nPoints+1))
 
-    # Create a communicator containing only the master rank.
-    allGroup = world.Get_group()
-    masterGroup = allGroup.Incl([0])
-    masterComm = world.Create(masterGroup)
-
-    # Create a parallel RNG on each worker with a different seed.
-    prng = myMPI.getParallelPrng(world, MPI.Wtime)
+    # Every rank spawns the random number generator of each data point from the same master seed.
+    seed = world.bcast(masterSeed(seed) if masterRank else None)
+    myMPI.rankPrint(world, 'Using master seed {}'.format(seed))
 
     myMPI.rankPrint(world, 'Creating HDF5 files, this may take a few minutes...')
     myMPI.rankPrint(world, 'Files are being created for data files {} and system files {}'.format(UP.dataFilename, UP.systemFilename))
-    ### Only do this using the Master subcommunicator!
-    # Here we initialize the HDF5 files.
-    if (masterComm != MPI.COMM_NULL):
+    # Here we initialize the HDF5 files. Only the master writes to them.
+    if masterRank:
 
         # Make sure the results folders exist
         makedirs(outputDir, exist_ok=True)
@@ -252,7 +457,7 @@ def parallel_mpi(inputFile, outputDir, skipHDF5):
         paras.check(DataPoint)
 
         # Initialize the inversion to obtain the sizes of everything
-        paras, Mod, DataPoint, prior, likelihood, posterior, PhiD = initialize(paras, DataPoint, prng = prng)
+        paras, Mod, DataPoint, prior, likelihood, posterior, PhiD = initialize(paras, DataPoint, prng = customFunctions.fiducialPrng(seed, DataPoint.fiducial))
 
         # Create the results template
         Res = Inference1D(DataPoint, Mod,
@@ -264,37 +469,37 @@ def parallel_mpi(inputFile, outputDir, skipHDF5):
         # For each line. Get the fiducials, and create a HDF5 for the Line results.
         # A line results file needs an initialized Results class for a single data point.
         if not skipHDF5:
+            # Shards from an earlier run belong to the files that are about to be replaced.
+            for shard in glob(join(outputDir, 'shards', '*.h5')):
+                remove(shard)
+
             for line in lineNumbers:
                 fiducialsForLine = np.where(tmp[:, 0] == line)[0]
                 nFids = fiducialsForLine.size
                 # Create a filename for the current line number
                 fName = join(outputDir, '{}.h5'.format(line))
-                # Open a HDF5 file in parallel mode.
-
-                with h5py.File(fName, 'w', driver='mpio', comm=masterComm) as f:
-                    LR = Inference2D().createHdf(f, tmp[fiducialsForLine, 1], Res)
+                with h5py.File(fName, 'w') as f:
+                    LR = Inference2D().createHdf(f, tmp[fiducialsForLine, 1], Res, compression=paras.compression)
                 myMPI.rankPrint(world,'Time to create line {} with {} data points: {} h:m:s'.format(line, nFids, str(timedelta(seconds=MPI.Wtime()-t0))))
                 t0 = MPI.Wtime()
 
             myMPI.print('Initialized results for writing.')
+        else:
+            # Results that an interrupted run left in shards count as completed.
+            mergeShards(outputDir)
 
+        makedirs(join(outputDir, 'shards'), exist_ok=True)
 
-    # Everyone needs the line numbers in order to open the results files collectively.
-    if masterRank:
-        DataPointType = DataPoint.hdfName()
-    else:
-        lineNumbers = None
-        DataPointType = None
-    lineNumbers = myMPI.Bcast(lineNumbers, world)
-    nLines = lineNumbers.size
 
-    DataPointType = world.bcast(DataPointType)
+    DataPointType = world.bcast(DataPoint.hdfName() if masterRank else None)
 
-    # Open the files collectively
-    LR = [None] * nLines
-    for i, line in enumerate(lineNumbers):
-        fName = join(outputDir, '{}.h5'.format(line))
-        LR[i] = Inference2D(fName, UP.systemFilename, hdfFile = h5py.File(fName, 'a', driver='mpio', comm=world))
+    # Workers need the fiducials of every line to lay out their shards like the line results files.
+    if shards:
+        lineFiducials, compression = world.bcast(({line : tmp[tmp[:, 0] == line, 1] for line in lineNumbers}, paras.compression) if masterRank else None)
+
+    # The master is the only rank that opens the results files.
+    if masterRank:
+        LR = [Inference2D(join(outputDir, '{}.h5'.format(line)), UP.systemFilename, mode='a') for line in lineNumbers]
 
     world.barrier()
     myMPI.rankPrint(world,'Files created in {} h:m:s'.format(str(timedelta(seconds=MPI.Wtime()-t1))))
@@ -302,157 +507,469 @@ def parallel_mpi(inputFile, outputDir, skipHDF5):
 
     # Carryout the master-worker tasks
     if (world.rank == 0):
-        masterTask(Dataset, world)
+        # Only invert the data points that do not have results yet.
+        completed = completedDatapoints(lineNumbers, LR)
+        if len(completed) > 0:
+            myMPI.print('Skipping {} data points that already have results'.format(len(completed)))
+        masterTask(Dataset, world, batchSize, schedule, completed=completed, lineNumbers=lineNumbers, LineResults=LR)
     else:
         DataPoint = eval(customFunctions.safeEval(DataPointType))
-        workerTask(DataPoint, UP, prng, world, lineNumbers, LR)
+        shard = _ShardWriter(join(outputDir, 'shards', '{}.h5'.format(world.rank)), lineFiducials, compression) if shards else None
+        workerTask(DataPoint, UP, seed, world, shard=shard)
 
     world.barrier()
-    # Close all the files. Must be collective.
-    for i in range(nLines):
-        LR[i].close()
 
     if masterRank:
+        for LineResults in LR:
+            LineResults.close()
         Dataset._closeDatafiles()
 
-
-def masterTask(Dataset, world):
-  """ Define a Send Recv Send procedure on the master """
+        if shards:
+            t0 = MPI.Wtime()
+            nMerged = mergeShards(outputDir)
+            myMPI.print('Merged {} data points from the shards in {} h:m:s'.format(nMerged, str(timedelta(seconds=MPI.Wtime()-t0))))
+
+
+def estimateCost(DataPoint):
+  """Cheap estimate of the relative cost of inverting a data point.
+
+  Data that a half space cannot fit need more layers and a longer burn in, and points that fail to
+  burn in run the full number of Markov chains. The estimate grows with the log of the normalized
+  misfit of the best fitting half space, so that it stays within a small factor of one.
+
+  Parameters
+  ----------
+  DataPoint : geobipy.EmDataPoint
+      Data point read from the data file.
+
+  Returns
+  -------
+  out : float
+      Estimated cost relative to a point that a half space fits, which has cost 1.
+
+  """
+  # Without errors in the data file the misfit cannot be normalized, so every point is treated equally.
+  if np.any(DataPoint.std[DataPoint.active] <= 0.0):
+    return 1.0
+  halfspace = DataPoint.FindBestHalfSpace()
+  DataPoint.forward(halfspace)
+  PhiD = DataPoint.dataMisfit(squared=True) / DataPoint.nActiveChannels
+  return 1.0 + np.log10(np.maximum(PhiD, 1.0))
+
+
+# Tag of the messages that carry the results of a data point from a worker to the master.
+_resultsTag = 1
+
+
+def masterTask(Dataset, world, batchSize=1, schedule='fifo', lookahead=8, completed=None, lineNumbers=None, LineResults=None, bufferSize=32):
+  """ Define a Send Recv Send procedure on the master
+
+  The master reads data points ahead of the requests and sends them to the workers in batches.
+  Workers request their next batch before they start their last queued data point, so the
+  reply is waiting for them when they finish and they never idle waiting on the master.
+
+  The master is also the only writer of the line results files. Workers send their results without
+  waiting, and the master buffers them until no requests are waiting to be answered. The buffered
+  results are then written one data point at a time, grouped by line and sorted by fiducial, so that
+  consecutive writes land in neighbouring chunks of the line file.
+
+  Parameters
+  ----------
+  Dataset : geobipy.Data
+      Dataset prepared for reading a point at a time.
+  world : mpi4py.MPI.Comm
+      MPI communicator.
+  batchSize : int, optional
+      Number of data points sent to a worker per request.
+  schedule : str, optional
+      'fifo' sends the data points in the order of the data file.
+      'ljf' sends the points with the largest cost from estimateCost first.
+      The ordering is local to the read ahead window, not global over the file. The costs are
+      estimated by the master only while no worker is waiting on it, so the first batches, and any
+      batch requested before the window has been estimated, are sent in the order of the file.
+      The estimated costs are also used for the ETA.
+  lookahead : int, optional
+      With schedule='ljf', the number of batches per worker that are read ahead and ordered by cost.
+  completed : set of tuples, optional
+      Line number and fiducial of data points that are not sent to the workers, see completedDatapoints.
+  lineNumbers : array_like, optional
+      Line number of each line results file.
+  LineResults : list of geobipy.Inference2D, optional
+      Line results files to write the results of the workers to.
+  bufferSize : int, optional
+      Maximum number of results held before they are written, even if requests are waiting.
+
+  """
 
   from mpi4py import MPI
   from geobipy.src.base import MPI as myMPI
 
-  # Set the total number of data points
-  nPoints = Dataset.nPoints
+  assert schedule in ['fifo', 'ljf'], ValueError("schedule must be either 'fifo' or 'ljf'")
+  ljf = schedule == 'ljf'
 
-  nFinished = 0
-  nSent = 0
-#   continueRunning = np.empty(1, dtype=np.int32)
-#   rankRecv = np.zeros(3, dtype = np.float64)
+  if completed is None:
+    completed = set()
+  remaining = remainingDatapoints(Dataset, completed)
 
-  # Send out the first indices to the workers
+  # Set the total number of data points
+  nPoints = Dataset.nPoints - len(completed)
+  nWorkers = world.size - 1
+
+  # Parsed data points waiting to be sent. Those with an estimated cost are in a heap ordered by
+  # decreasing cost then file order, the others wait in file order for the master to be idle.
+  readAhead = []
+  unestimated = deque()
+  nReadAhead = batchSize * nWorkers * (lookahead if ljf else 1)
+  nRead = 0
+  # Sum and number of the costs of the points that have been estimated or sent.
+  totalCost = 0.0
+  nCosts = 0
+
+  # Per rank counts of points sent and inverted, and time spent waiting on the master.
+  nSent = np.zeros(world.size, dtype=np.int64)
+  nInverted = np.zeros(world.size, dtype=np.int64)
+  idleTime = np.zeros(world.size)
+  # Costs of the points sent to each rank that have not been inverted yet.
+  sentCosts = [deque() for i in range(world.size)]
+  finishedCost = 0.0
+
+  # Results received from the workers that have not been written yet, per line.
+  buffered = {}
+  nBuffered = 0
+
+  def prefetch():
+    """Fill the read ahead buffer, without estimating the costs."""
+    nonlocal nRead
+    while len(readAhead) + len(unestimated) < nReadAhead:
+      DataPoint = next(remaining, None)
+      # If DataPoint is None, then we reached the end of the file and no more points can be read in.
+      if DataPoint is None:
+        return
+      unestimated.append((nRead, DataPoint))
+      nRead += 1
+
+  def estimate():
+    """Estimate the cost of the oldest read ahead point and move it to the heap."""
+    nonlocal totalCost, nCosts
+    iRead, DataPoint = unestimated.popleft()
+    cost = estimateCost(DataPoint)
+    heapq.heappush(readAhead, (-cost, iRead, cost, DataPoint))
+    totalCost += cost
+    nCosts += 1
+
+  def nextPoint():
+    """The costliest estimated point, or the next point in the file if none have been estimated."""
+    nonlocal totalCost, nCosts
+    if len(readAhead) > 0:
+      return heapq.heappop(readAhead)[2:]
+    # A point that is sent before its cost is estimated counts as the average so far.
+    cost = totalCost / nCosts if nCosts > 0 else 1.0
+    totalCost += cost
+    nCosts += 1
+    return cost, unestimated.popleft()[1]
+
+  def sendBatch(rank):
+    """Send the number of points in the batch, followed by the points. Zero points shuts the worker down."""
+    n = min(batchSize, len(readAhead) + len(unestimated))
+    world.send(n, dest=rank)
+    for i in range(n):
+      cost, DataPoint = nextPoint()
+      # The systems are only sent with the first data point a worker receives.
+      DataPoint.Isend(dest=rank, world=world, systems=None if nSent[rank] == 0 else DataPoint.system)
+      nSent[rank] += 1
+      sentCosts[rank].append(cost)
+
+  def flush():
+    """Write the buffered results one data point at a time, grouped by line and in the order of the file."""
+    nonlocal nBuffered
+    for lineNumber in sorted(buffered):
+      LR = LineResults[np.searchsorted(lineNumbers, lineNumber)]
+      for Res in sorted(buffered[lineNumber], key=lambda x: x.fiducial):
+        LR.results2Hdf(Res)
+    buffered.clear()
+    nBuffered = 0
+
+  # Send out the first batches to the workers
+  prefetch()
   for iWorker in range(1, world.size):
-    # Get a datapoint from the file.
-    DataPoint = Dataset._readSingleDatapoint()
-
-    # If DataPoint is None, then we reached the end of the file and no more points can be read in.
-    if DataPoint is None:
-        # Send the kill switch to the worker to shut down.
-        # continueRunning[0] = 0 # Do not continue running
-        continueRunning =False
-        world.send(continueRunning, dest=iWorker)
-    else:
-        # continueRunning[0] = 1 # Yes, continue with the next point.
-        continueRunning = True
-        world.send(continueRunning, dest=iWorker)
-        DataPoint.Isend(dest=iWorker, world=world)
-
-    nSent += 1
+    sendBatch(iWorker)
+    prefetch()
 
   # Start a timer
   t0 = MPI.Wtime()
 
   myMPI.print("Initial data points sent. Master is now waiting for requests")
 
-  # Now wait to send indices out to the workers as they finish until the entire data set is finished
-  while nFinished < nPoints:
-    # Wait for a worker to request the next data point
+  nFinishedWorkers = 0
+  nextReport = nWorkers
+
+  # Now wait to send batches out to the workers as they ask, until every worker has shut down.
+  while nFinishedWorkers < nWorkers:
+    # Estimate the costs of the read ahead points while no worker is waiting on the master.
+    while ljf and len(unestimated) > 0 and not world.Iprobe(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG):
+      estimate()
+
+    # Wait for a worker to request the next batch, or to say that it has finished
     status = MPI.Status()
-    dummy = world.recv(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG, status = status)
+    request = world.recv(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG, status = status)
     requestingRank = status.Get_source()
-    # requestingRank = np.int(rankRecv[0])
-    # dataPointProcessed = rankRecv[1]
 
-    nFinished += 1
+    if status.Get_tag() == _resultsTag:
+      lineNumber, Res = request
+      buffered.setdefault(lineNumber, []).append(Res)
+      nBuffered += 1
+      # Answering requests comes first, write once no worker is waiting on the master.
+      if nBuffered >= bufferSize or not world.Iprobe(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG):
+        flush()
+      continue
+
+    nInvertedByRank, idleTime[requestingRank], moreRequested = request
+    for i in range(nInvertedByRank - nInverted[requestingRank]):
+      finishedCost += sentCosts[requestingRank].popleft()
+    nInverted[requestingRank] = nInvertedByRank
+
+    if moreRequested:
+      sendBatch(requestingRank)
+      # Parse the next points while the workers are busy
+      prefetch()
+    else:
+      nFinishedWorkers += 1
 
-    # Read the next data point from the file
-    DataPoint = Dataset._readSingleDatapoint()
+    nFinished = np.sum(nInverted)
+    report = nFinished >= nextReport or nFinishedWorkers == nWorkers
 
-    # If DataPoint is None, then we reached the end of the file and no more points can be read in.
-    if DataPoint is None:
-        # Send the kill switch to the worker to shut down.
-        # continueRunning[0] = 0 # Do not continue running
-        continueRunning = False
-        world.send(continueRunning, dest=requestingRank)
-    else:
-        # continueRunning[0] = 1 # Yes, continue with the next point.
-        continueRunning = True
-        world.send(continueRunning, dest=requestingRank)
-        DataPoint.Isend(dest=requestingRank, world=world, systems=DataPoint.system)
+    if report and nFinished > 0:
+      nextReport = nFinished + nWorkers
+      e = MPI.Wtime() - t0
+      elapsed = str(timedelta(seconds=e))
+      # Points without a cost yet are assumed to have the average cost of those that have one.
+      remainingCost = totalCost - finishedCost + (nPoints - nCosts) * (totalCost / np.maximum(nCosts, 1))
+      eta = str(timedelta(seconds=(remainingCost / finishedCost) * e))
+      myMPI.print("Remaining Points {}/{} || Elapsed Time: {} h:m:s || ETA {} h:m:s".format(nPoints-nFinished, nPoints, elapsed, eta))
+      myMPI.print("    Queue depth per rank: {}".format(' '.join(str(x) for x in (nSent - nInverted)[1:])))
+      myMPI.print("    Idle time per rank (s): {}".format(' '.join('{:.2f}'.format(x) for x in idleTime[1:])))
+
+    if nBuffered > 0 and not world.Iprobe(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG):
+      flush()
 
-    report = (nFinished % (world.size - 1)) == 0 or nFinished == nPoints
+  # Workers send all their results before they finish
+  flush()
 
-    if report:
-        e = MPI.Wtime() - t0
-        elapsed = str(timedelta(seconds=e))
-        eta = str(timedelta(seconds=(nPoints / nFinished-1) * e))
-        myMPI.print("Remaining Points {}/{} || Elapsed Time: {} h:m:s || ETA {} h:m:s".format(nPoints-nFinished, nPoints, elapsed, eta))
-        # myMPI.print('Inverted data point {} in {:.3f}s  ||  Time: {:.3f}s  ||  QueueLength: {}/{}  ||  ETA: {:.3f}s'.format(dataPointProcessed, rankRecv[2], elapsed, nPoints-nFinished, nPoints, eta))
 
+def workerTask(_DataPoint, UP, seed, world, maxPending=2, shard=None):
+    """ Define a wait run ping procedure for each worker
 
-def workerTask(_DataPoint, UP, prng, world, lineNumbers, LineResults):
-    """ Define a wait run ping procedure for each worker """
+    Results are sent to the master, which writes them, so the worker starts its next data point
+    straight away. At most maxPending results are in flight before the worker waits for the oldest send to complete.
+    If a shard is given, the results are written to it instead.
+
+    """
 
     # Import here so serial code still works...
     from mpi4py import MPI
     from geobipy.src.base import MPI as myMPI
 
-    # Initialize the worker process to go
-    Go = True
-
-    # Wait till you are told what to process next
-    continueRunning = world.recv(source=0)
-    # If we continue running, receive the next DataPoint. Otherwise, shutdown the rank
-    if continueRunning:
-        DataPoint = _DataPoint.Irecv(source=0, world=world)
-    else:
-        Go = False
+    # Data points received from the master that have not been inverted yet.
+    queue = deque()
+    systems = None
+    idleTime = 0.0
+    nInverted = 0
+    writer = _ResultsSender(world, maxPending) if shard is None else shard
 
-    # communicationTime = 0.0
+    def receiveBatch():
+        """Receive a batch of data points. Returns False if the master has no more points."""
+        nonlocal systems, idleTime
+        t0 = MPI.Wtime()
+        n = world.recv(source=0)
+        for i in range(n):
+            DataPoint = _DataPoint.Irecv(source=0, world=world, systems=systems)
+            systems = DataPoint.system
+            queue.append(DataPoint)
+        idleTime += MPI.Wtime() - t0
+        return n > 0
+
+    # Wait till you are told what to process first
+    Go = receiveBatch()
+
+    while len(queue) > 0:
+        # Ask for the next batch before starting the last queued point,
+        # so that the master replies while this rank is busy.
+        requested = Go and len(queue) == 1
+        if requested:
+            world.send((nInverted, idleTime, True), dest=0)
+
+        DataPoint = queue.popleft()
 
-    while Go:
         # initialize the parameters
         paras = UP.userParameters(DataPoint)
 
-        # Pass through the line results file object if a parallel file system is in use.
-        iLine = lineNumbers.searchsorted(DataPoint.lineNumber)
-        failed = infer(paras, DataPoint, prng=prng, rank=world.rank, LineResults=LineResults[iLine])
+        # Get the random number generator for this data point
+        prng = customFunctions.fiducialPrng(seed, DataPoint.fiducial)
 
-        # Ping the Master to request a new index
-        t0 = MPI.Wtime()
-        world.send(1, dest=0)
+        writer.lineNumber = DataPoint.lineNumber
+        failed = infer(paras, DataPoint, prng=prng, rank=world.rank, LineResults=writer)
 
-        # Wait till you are told whether to continue or not
-        continueRunning = world.recv(source=0)
+        nInverted += 1
 
         if failed:
             print("Datapoint {} failed to converge".format(DataPoint.fiducial))
 
-        # If we continue running, receive the next DataPoint. Otherwise, shutdown the rank
-        if continueRunning:
-            DataPoint = _DataPoint.Irecv(source=0, world=world, systems=DataPoint.system)
-#            communicationTime += MPI.Wtime() - t0
-        else:
-#            communicationTime += MPI.Wtime() - t0
-#            s = str(timedelta(seconds = communicationTime))
-#            print('Communicaton Time on Rank {} {} h:m:s'.format(world.rank, s))
-            Go = False
+        # If the master has more points they are received here. Otherwise, finish the queue and shutdown the rank
+        if requested:
+            Go = receiveBatch()
+
+    # Tell the master that this rank has finished, after the last of the results.
+    writer.close()
+    world.send((nInverted, idleTime, False), dest=0)
+
+
+class _ResultsSender(object):
+    """Takes the place of the line results in an MPI worker, and sends the results to the master without waiting for it to write them."""
+
+    def __init__(self, world, maxPending=2):
+        self.world = world
+        self.maxPending = maxPending
+        self.lineNumber = None
+        self.pending = deque()
+
+    def results2Hdf(self, results):
+        # Figures cannot be sent between processes
+        results.fig = None
+        # The results are pickled before isend returns, so the caller is free to change them.
+        self.pending.append(self.world.isend((self.lineNumber, results), dest=0, tag=_resultsTag))
+        while len(self.pending) > self.maxPending:
+            self.pending.popleft().wait()
+
+    def close(self):
+        """Wait for all the results to be received by the master."""
+        while len(self.pending) > 0:
+            self.pending.popleft().wait()
+
+
+class _ShardWriter(object):
+    """Takes the place of the line results in an MPI worker, and writes the results to a shard file that only this worker opens.
+
+    The shard has a group per line with the same layout as the line results file, created when the worker
+    receives its first data point from that line. Data points of other workers are never written, and chunks that
+    are never written are not allocated. Large entries such as the hitmaps have a chunk per data point, so they
+    only take space for this worker's points. Small entries are grouped into chunks of about 64 KiB, see
+    repeated_storage, and a written chunk is allocated in full, so those datasets can take the size of the whole
+    line in every shard. See mergeShards.
+
+    """
+
+    def __init__(self, fName, lineFiducials, compression=None):
+        self.hdfFile = h5py.File(fName, 'w')
+        self.lineFiducials = lineFiducials
+        self.compression = compression
+        self.lineNumber = None
+        self.lines = {}
+
+    def results2Hdf(self, results):
+        if not self.lineNumber in self.lines:
+            LR = Inference2D()
+            LR.createHdf(self.hdfFile.create_group(str(self.lineNumber)), self.lineFiducials[self.lineNumber], results, compression=self.compression)
+            self.lines[self.lineNumber] = LR
+        self.lines[self.lineNumber].results2Hdf(results)
+
+    def close(self):
+        self.hdfFile.close()
+
+
+def mergeShards(outputDir):
+    """Copy the completed data points in the shards of a run into the line results files, and remove the shards.
+
+    Every dataset that holds an entry per data point is copied with one read and write per run of consecutive
+    completed points. The inversion times are copied last since they mark the points as completed.
+
+    Parameters
+    ----------
+    outputDir : str or pathlib.Path
+        Output directory of the run, containing the line results files and the shards folder.
+
+    Returns
+    -------
+    out : int
+        Number of data points that were merged.
+
+    """
+    nMerged = 0
+    # Names of the per data point datasets of each line, the layout is the same in every shard.
+    lineKeys = {}
+    for shardFile in sorted(glob(join(outputDir, 'shards', '*.h5'))):
+        with h5py.File(shardFile, 'r') as shard:
+            for line in shard:
+                src = shard[line]
+                with h5py.File(join(outputDir, '{}.h5'.format(np.float64(line))), 'r+') as dst:
+                    nPoints = dst['fiducials/data'].size
+                    assert np.all(src['fiducials/data'][:] == dst['fiducials/data'][:]), Exception("Shard {} does not match the fiducials of line {}".format(shardFile, line))
+
+                    # Runs of consecutive completed points
+                    i = np.flatnonzero(~np.isnan(src['invtime'][:]))
+                    splits = np.flatnonzero(np.diff(i) > 1) + 1
+                    runs = [np.s_[r[0]:r[-1]+1] for r in np.split(i, splits) if r.size > 0]
+
+                    # The per data point datasets are the chunked ones created with nRepeats, and the scalars written by results2Hdf.
+                    if not line in lineKeys:
+                        keys = ['i', 'iburn', 'ibest', 'burnedin', 'multiplier']
+                        def perPoint(key, x):
+                            if isinstance(x, h5py.Dataset) and not x.chunks is None and x.shape[0] == nPoints:
+                                keys.append(key)
+                        src.visititems(perPoint)
+                        lineKeys[line] = keys + ['invtime']
+
+                    for key in lineKeys[line]:
+                        for run in runs:
+                            dst[key][run] = src[key][run]
+
+                    nMerged += i.size
+        remove(shardFile)
+
+    return nMerged
 
 
 def geobipy():
     """Run the serial implementation of GeoBIPy. """
 
-    inputFile, output_directory, _, seed = checkCommandArguments()
+    inputFile, output_directory, skipHDF5, seed, _, _, workers, _ = checkCommandArguments()
     sys.path.append(getcwd())
 
-    serial_geobipy(inputFile, output_directory, seed)
+    serial_geobipy(inputFile, output_directory, seed, skipHDF5, workers)
 
 
 def geobipy_mpi():
     """Run the parallel implementation of GeoBIPy. """
 
-    inputFile, output_directory, skipHDF5, _ = checkCommandArguments()
+    inputFile, output_directory, skipHDF5, seed, batchSize, schedule, _, shards = checkCommandArguments()
     sys.path.append(getcwd())
 
-    parallel_geobipy(inputFile, output_directory, skipHDF5)
+    parallel_geobipy(inputFile, output_directory, skipHDF5, batchSize, schedule, seed, shards)
+
+
+def geobipy_merge():
+    """Merge the shards of an interrupted parallel run into the line results files. """
+
+    Parser = argparse.ArgumentParser(description="Merge GeoBIPy result shards into the line results files",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    Parser.add_argument('output_directory', help='Output directory of the run that was started with --shards.')
+
+    args = Parser.parse_args()
+
+    t0 = time.time()
+    nMerged = mergeShards(args.output_directory)
+    print('Merged {} data points in {} h:m:s'.format(nMerged, str(timedelta(seconds=time.time()-t0))))
+
+
+def geobipy_store():
+    """Convert data files to binary stores, so that later runs do not parse the text files. """
+
+    Parser = argparse.ArgumentParser(description="Convert GeoBIPy data files to binary stores",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    Parser.add_argument('dataFiles', nargs='+', help='Data files to convert. Each store is written next to its data file and is used until the data file is modified.')
+
+    args = Parser.parse_args()
 
+    for dataFile in args.dataFiles:
+        t0 = time.time()
+        store = fileIO.createStore(dataFile)
+        print('Created {} in {} h:m:s'.format(store, str(timedelta(seconds=time.time()-t0))))
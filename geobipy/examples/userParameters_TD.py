@@ -180,6 +180,19 @@ class userParameters(_userParameters):
     self.multiplier = None
     # Clipping Ratio for interface contrasts
     self.clipRatio = None
+    # Make proposals in preallocated memory instead of deepcopying the model and data point every iteration.
+    # Default is True
+    self.inPlaceProposals = None
+    # Number of tempered Markov chains per data point. Chains exchange states, and only the coldest chain is recorded.
+    # The chains are advanced in turn, so the time to invert a data point grows linearly with the number of chains.
+    # Default is 1, no tempering.
+    self.nTemperatures = None
+    # Temperature of the hottest chain. Temperatures are spaced logarithmically from 1.
+    # Default is 10.0
+    self.maximumTemperature = None
+    # Compress the line results files with 'gzip' or 'lzf'.
+    # Default is None, no compression.
+    self.compression = None
 
     # Display the resistivity?
     self.reciprocateParameters = True
@@ -158,3 +158,50 @@ def write_nd_indexed(arr, h5obj, myName, index):
         elif(nda == 6):
             ds[i[0], i[1], i[2], :s[0], :s[1], :s[2], :s[3], :s[4], :s[5]] = arr
 
+
+
+def repeated_storage(h5obj, shape, dtype, nRepeats, chunkBytes=65536):
+    """Chunking and filter keywords for a dataset that stores nRepeats entries of the given shape.
+
+    Entries are written one at a time by index, so chunks hold whole entries.  Entries smaller than
+    chunkBytes are grouped along the first repeated dimension so that chunks are not too small to compress.
+    Filters are taken from the storage profile in the attributes of the file, see Inference2D.createHdf.
+
+    Parameters
+    ----------
+    h5obj : h5py._hl.files.File or h5py._hl.group.Group
+        A HDF file or group object the dataset will be created in.
+    shape : ints
+        Shape of a single entry.
+    dtype : dtype
+        Data type of the dataset.
+    nRepeats : int or ints
+        Number of entries in each of the leading dimensions of the dataset.
+    chunkBytes : int, optional
+        Target size in bytes of a chunk when entries are small.
+
+    Returns
+    -------
+    out : dict
+        Keyword arguments for h5py's create_dataset.  Empty if the dataset cannot be chunked.
+
+    """
+    shape = tuple(np.atleast_1d(shape))
+    nRepeats = tuple(np.atleast_1d(nRepeats))
+
+    if np.any(np.r_[nRepeats, shape] == 0):
+        return {}
+
+    entryBytes = np.prod(shape) * np.dtype(dtype).itemsize
+    rows = int(np.clip(chunkBytes // entryBytes, 1, nRepeats[0]))
+
+    out = {'chunks': (rows, *[1 for i in nRepeats[1:]], *shape)}
+
+    compression = h5obj.file.attrs.get('compression', '')
+    if len(compression) > 0:
+        out['compression'] = compression
+        out['shuffle'] = bool(h5obj.file.attrs.get('shuffle', True))
+        if compression == 'gzip':
+            out['compression_opts'] = int(h5obj.file.attrs.get('compression_opts', 4))
+
+    return out
@@ -316,6 +316,45 @@ def Inv(A):
     return 1.0 / A
 
 
+def choInv(L):
+    """Invert a symmetric positive definite matrix from its lower Cholesky factor.
+
+    Parameters
+    ----------
+    L : ndarray of floats
+        Lower Cholesky factor of the matrix.
+
+    Returns
+    -------
+    out : ndarray of floats
+        The inverse of L L^T.
+
+    """
+    from scipy.linalg.lapack import dpotri
+
+    out, info = dpotri(L, lower=1)
+    assert info == 0, np.linalg.LinAlgError('Cholesky factor is singular')
+    # Only the lower triangle is returned
+    return np.tril(out) + np.tril(out, -1).T
+
+
+def isDiagonal(A):
+    """Test whether a matrix is diagonal.
+
+    Parameters
+    ----------
+    A : numpy.ndarray
+        A 2D array.
+
+    Returns
+    -------
+    out : bool
+        Whether all the non-zero entries of A are on its diagonal.
+
+    """
+    return np.count_nonzero(A) == np.count_nonzero(np.diagonal(A))
+
+
 def isNumpy(x):
     """Test that the variable is a compatible numpy type with built ins like .ndim
 
@@ -825,4 +864,26 @@ def safeEval(string):
     if (any(x in string for x in allowed)):
         return string
 
-    raise  ValueError("Problem evaluating string "+string)
\ No newline at end of file
+    raise  ValueError("Problem evaluating string "+string)
+
+def fiducialPrng(seed, fiducial):
+    """Random number generator for the inversion of a single data point.
+
+    The generator is spawned from a master seed and the fiducial of the data point, so a data point draws the same random numbers
+    whichever process inverts it, and in whatever order.
+
+    Parameters
+    ----------
+    seed : int
+        Master seed of the inversion.
+    fiducial : float
+        Fiducial of the data point.
+
+    Returns
+    -------
+    out : numpy.random.Generator
+        PCG64 random number generator.
+
+    """
+    key = int(np.float64(fiducial).view(np.uint64))
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(key,))))
@@ -2,9 +2,11 @@
 Module with custom file handling operations
 """
 import re
+import warnings
+from itertools import islice
 import numpy as np
 import os
-from subprocess import Popen, PIPE, STDOUT
+import h5py
 
 def filesExist(fNames):
     """Check if all files in fNames exist on disk
@@ -147,7 +149,9 @@ def getFileSize(fName):
         return bytes2readable(os.stat(fName).st_size)
 
 def wccount(fname):
-    """Count the number of lines in a file using a wc system call
+    """Count the number of lines in a file, the same as wc -l
+
+    The file is read in binary blocks and the newlines in each block are counted.
 
     Parameters
     ----------
@@ -161,8 +165,8 @@ def wccount(fname):
 
     """
     assert fileExists(fname), 'Cannot find file '+fname
-    out = Popen(['wc', '-l', fname], stdout=PIPE, stderr=STDOUT).communicate()[0]
-    return(np.int(out.strip().split()[0]))
+    with open(fname, 'rb') as f:
+        return sum(block.count(b'\n') for block in iter(lambda: f.read(1048576), b''))
 
 def getNlines(fname, nHeaders=0):
     """Gets the number of lines in a file after taking into account the number of header lines
@@ -181,6 +185,10 @@ def getNlines(fname, nHeaders=0):
 
     """
     assert fileExists(fname), 'Cannot find file '+fname
+    store = getStore(fname)
+    if not store is None:
+        with h5py.File(store, 'r') as f:
+            return f['values'].shape[0] + f.attrs['nHeaders'] - nHeaders
     nLines = wccount(fname)
     return nLines - nHeaders
 #    with open(fname) as f: # Open the file
@@ -227,9 +235,11 @@ def skipLines(f, nLines=0):
         next(f)
 
 
-def read_columns(fName, indices=None, nHeaders=0, nLines=0):
+def read_columns(fName, indices=None, nHeaders=0, nLines=0, chunkSize=65536):
     """Reads specified columns from a file
 
+    The file is parsed chunkSize lines at a time, see parseLines.
+
     Parameters
     ----------
     fName : str
@@ -241,6 +251,8 @@ def read_columns(fName, indices=None, nHeaders=0, nLines=0):
         The number of header lines to skip in the file.
     nLines : int, optional
         The number of lines to read in.  By default, all lines are read in after the header lines.
+    chunkSize : int, optional
+        The number of lines parsed at a time.
 
     Returns
     -------
@@ -251,23 +263,231 @@ def read_columns(fName, indices=None, nHeaders=0, nLines=0):
 
     assert fileExists(fName), 'Cannot find file '+fName
 
-    indices = np.atleast_1d(indices)
     if (nLines == 0):
         # Get the number of lines in the file
         nLines = getNlines(fName, nHeaders)
 
-    nCols = getNcolumns(fName, nHeaders) if indices is None else indices.size
+    nCols = getNcolumns(fName, nHeaders) if indices is None else np.size(indices)
 
     values = np.zeros([nLines, nCols], dtype='float64', order='F')  # Initialize output
 
+    store = getStore(fName, nHeaders)
+    if not store is None:
+        with h5py.File(store, 'r') as f:
+            for j in range(0, nLines, chunkSize):
+                tmp = f['values'][j:j+chunkSize, :]
+                values[j:j+tmp.shape[0], :] = tmp if indices is None else tmp[:, indices]
+        return values
+
     with open(fName) as f:  # Open the file
         skipLines(f, nHeaders)  # Skip header lines
-        for j, line in enumerate(f):  # For each line in the file
+        j = 0
+        while j < nLines:
+            lines = list(islice(f, min(chunkSize, nLines - j)))
+            if len(lines) == 0:
+                break
+            tmp = parseLines(lines, indices, firstLine=j+nHeaders, fName=fName)
+            values[j:j+tmp.shape[0], :] = tmp
+            j += len(lines)
+    return values
+
+
+def read_rows(f, indices=None, chunkSize=1024):
+    """Generator over the rows of an open file.
+
+    The rows are parsed chunkSize lines at a time, see parseLines.
+
+    Parameters
+    ----------
+    f : _io.TextIOWrapper
+        A file handle positioned at the first row to read.
+    indices : int or list of ints, optional
+        The indices of the columns to read.  By default, all columns are read in.
+    chunkSize : int, optional
+        The number of lines parsed at a time.
+
+    Yields
+    ------
+    out : numpy.ndarray
+        The values of the requested columns in the next row.
+
+    """
+    while True:
+        lines = list(islice(f, chunkSize))
+        if len(lines) == 0:
+            return
+        yield from parseLines(lines, indices)
+
+
+def storeFilename(fName):
+    """Get the file name of the binary store of a text file, see createStore.
+
+    Parameters
+    ----------
+    fName : str
+        A path and/or file name.
+
+    Returns
+    -------
+    out : str
+        File name of the store.
+
+    """
+    return str(fName) + '.h5'
+
+
+def createStore(fName, nHeaders=1, chunkSize=65536):
+    """Convert the numbers in a text file to a binary store.
+
+    The store is a HDF5 file next to the text file, containing every column of the file in a single array chunked by rows.
+    read_columns, getNlines, and read_store_rows read from the store instead of parsing the text file, as long as the
+    text file has not been modified since the store was created.
+
+    Parameters
+    ----------
+    fName : str
+        A path and/or file name.
+    nHeaders : int, optional
+        The number of header lines to skip in the file.
+    chunkSize : int, optional
+        The number of lines parsed at a time.
+
+    Returns
+    -------
+    out : str
+        File name of the store.
+
+    """
+    assert fileExists(fName), 'Cannot find file '+fName
+
+    nLines = wccount(fName) - nHeaders
+    nCols = getNcolumns(fName, nHeaders)
+
+    store = storeFilename(fName)
+    with h5py.File(store, 'w') as f:
+        values = f.create_dataset('values', shape=(nLines, nCols), maxshape=(None, nCols), dtype=np.float64, chunks=(min(max(nLines, 1), 1024), nCols))
+
+        with open(fName) as txt:
+            skipLines(txt, nHeaders)
+            j = 0
+            for lines in iter(lambda: list(islice(txt, chunkSize)), []):
+                tmp = parseLines(lines, firstLine=j+nHeaders, fName=fName)
+                values[j:j+tmp.shape[0], :] = tmp
+                j += tmp.shape[0]
+        # Empty lines are not stored
+        values.resize(j, axis=0)
+
+        f.attrs['nHeaders'] = nHeaders
+        f.attrs['size'] = os.stat(fName).st_size
+        f.attrs['mtime'] = os.stat(fName).st_mtime
+
+    return store
+
+
+def getStore(fName, nHeaders=None):
+    """Get the binary store of a text file if it exists and is up to date with the text file.
+
+    Parameters
+    ----------
+    fName : str
+        A path and/or file name.
+    nHeaders : int, optional
+        If given, the store must have been created with the same number of header lines.
+
+    Returns
+    -------
+    out : str or None
+        File name of the store, or None if the text file must be parsed.
+
+    """
+    store = storeFilename(fName)
+    if not os.path.isfile(store):
+        return None
+    try:
+        with h5py.File(store, 'r') as f:
+            stat = os.stat(fName)
+            valid = (f.attrs['size'] == stat.st_size) and (f.attrs['mtime'] == stat.st_mtime)
+            if not nHeaders is None:
+                valid = valid and (f.attrs['nHeaders'] == nHeaders)
+    except (OSError, KeyError):
+        # Unreadable or incomplete stores are ignored
+        return None
+    return store if valid else None
+
+
+def read_store_rows(fName, indices=None, chunkSize=1024):
+    """Generator over the rows of a text file, read from its binary store.
+
+    Parameters
+    ----------
+    fName : str
+        A path and/or file name of the text file.
+    indices : int or list of ints, optional
+        The indices of the columns to read.  By default, all columns are read in.
+    chunkSize : int, optional
+        The number of rows read at a time.
+
+    Yields
+    ------
+    out : numpy.ndarray
+        The values of the requested columns in the next row.
+
+    """
+    with h5py.File(storeFilename(fName), 'r') as f:
+        values = f['values']
+        for j in range(0, values.shape[0], chunkSize):
+            tmp = values[j:j+chunkSize, :]
+            yield from (tmp if indices is None else tmp[:, indices])
+
+
+def parseLines(lines, indices=None, firstLine=0, fName=''):
+    """Parse many lines of numbers at once.
+
+    The lines are joined and converted in a single call to numpy, which is much faster than getRealNumbersfromLine for each line.
+    Entries may be separated by spaces, tabs, or commas, and * is read as NaN. Empty lines are skipped.
+
+    Parameters
+    ----------
+    lines : list of str
+        The lines to parse.  Every line must have the same number of entries.
+    indices : int or list of ints, optional
+        The indices of the columns to keep.  By default, all columns are kept.
+    firstLine : int, optional
+        Line number of the first line in the file, used in error messages.
+    fName : str, optional
+        Name of the file, used in error messages.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        2D array with a row for each line that is not empty.
+
+    """
+    lines = [line for line in lines if not line.isspace() and len(line) > 0]
+
+    text = ' '.join(lines).replace('*', 'NaN').replace(',', ' ')
+    try:
+        with warnings.catch_warnings():
+            # Older versions of numpy warn, rather than raise, when the text is not all numbers.
+            warnings.simplefilter('error', DeprecationWarning)
+            values = np.fromstring(text, sep=' ')
+        # Ragged lines can still have a total that reshapes, so every line must have the same number of entries.
+        nColumns = {len(line.replace(',', ' ').split()) for line in lines}
+        if len(nColumns) != 1 or values.size != len(lines) * nColumns.pop():
+            raise ValueError("Lines have different numbers of entries")
+        values = values.reshape(len(lines), -1)
+    except (ValueError, DeprecationWarning):
+        # Find the offending line
+        nColumns = None
+        for j, line in enumerate(lines):
             try:
-                values[j, ] = getRealNumbersfromLine(line, indices)  # grab the requested entries
+                tmp = getRealNumbersfromLine(line)
             except:
-                assert False, Exception("Could not read numbers from line {} in file {} \n\n {}".format(j+nHeaders, fName, line))
-    return values
+                tmp = None
+            assert not tmp is None and (nColumns is None or tmp.size == nColumns), Exception("Could not read numbers from line {} in file {} \n\n {}".format(j+firstLine, fName, line))
+            nColumns = tmp.size
+
+    return values if indices is None else values[:, indices]
 
 
 def getRealNumbersfromLine(line, indices=None, delimiters=','):
@@ -7,7 +7,7 @@ from ...base import customPlots as cP
 from ..statistics.Distribution import Distribution
 from ..statistics.baseDistribution import baseDistribution
 from .myObject import myObject
-from ...base.HDF.hdfWrite import write_nd
+from ...base.HDF.hdfWrite import write_nd, repeated_storage
 from ...base import MPI as myMPI
 
 from ...base.HDF import hdfRead
@@ -171,6 +171,17 @@ class StatArray(np.ndarray, myObject):
         return np.ndarray.__array_wrap__(self, out_arr, context)
 
 
+    def __reduce__(self):
+        # numpy only pickles the values, append the name, units, and statistics.
+        pickled = np.ndarray.__reduce__(self)
+        return (pickled[0], pickled[1], pickled[2] + (self.__dict__,))
+
+
+    def __setstate__(self, state):
+        np.ndarray.__setstate__(self, state[:-1])
+        self.__dict__.update(state[-1])
+
+
     ### Properties
     @property
     def name(self):
@@ -1467,6 +1478,9 @@ class StatArray(np.ndarray, myObject):
 
         Notes
         -----
+        When nRepeats is given, the dataset is chunked so that each repeat can be written on its own,
+        and is compressed if the file has a storage profile, see geobipy.base.HDF.hdfWrite.repeated_storage.
+
         This method can be used in serial and MPI. As an example in MPI.
         Given 10 MPI ranks, each with a 10 length array, it is faster to create a 10x10 empty array, and have each rank write its row.
         Rather than creating 10 separate length 10 arrays because the overhead when creating the file metadata can become very
@@ -1509,10 +1523,9 @@ class StatArray(np.ndarray, myObject):
             grp.create_dataset('data', self.shape, dtype=self.dtype, fillvalue=fillvalue)
         else:
             nRepeats = np.atleast_1d(nRepeats)
-            if (self.size == 1):
-                grp.create_dataset('data', [*nRepeats, 1], dtype=self.dtype, fillvalue=fillvalue)
-            else:
-                grp.create_dataset('data', [*nRepeats, *self.shape], dtype=self.dtype, fillvalue=fillvalue)
+            shape = [1] if self.size == 1 else self.shape
+            storage = repeated_storage(h5obj, shape, self.dtype, nRepeats)
+            grp.create_dataset('data', [*nRepeats, *shape], dtype=self.dtype, fillvalue=fillvalue, **storage)
 
 
         if withPosterior:
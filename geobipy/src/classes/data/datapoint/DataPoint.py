@@ -44,6 +44,9 @@ class DataPoint(Point):
 
     """
 
+    # Whether updateSensitivity only recomputes the columns of the changed layers, rather than the whole matrix
+    _incrementalSensitivity = False
+
     def __init__(self, nChannelsPerSystem=1, x=0.0, y=0.0, z=0.0, elevation=None, data=None, std=None, predictedData=None, units="", channelNames=None, lineNumber=0.0, fiducial=0.0):
         """ Initialize the Data class """
 
@@ -91,6 +94,40 @@ class DataPoint(Point):
 
         return out
 
+
+    def copyFrom(self, other):
+        """Overwrite the values of self with those of another data point without allocating new memory.
+
+        Priors, proposals, and posteriors attached to self are kept.
+        Used to reuse a candidate data point for every iteration of a Markov chain instead of deepcopying.
+
+        Parameters
+        ----------
+        other : geobipy.DataPoint
+            Data point with the same number of channels to copy values from.
+
+        Returns
+        -------
+        out : geobipy.DataPoint
+            self, with the values of other.
+
+        """
+        assert self.nChannels == other.nChannels, ValueError("Cannot copy a data point with {} channels into one with {}".format(other.nChannels, self.nChannels))
+        self._x[:] = other.x
+        self._y[:] = other.y
+        self._z[:] = other.z
+        self._elevation[:] = other.elevation
+        self._data[:] = other.data
+        self._std[:] = other.std
+        self._predictedData[:] = other.predictedData
+        if self._predictedData.hasPrior:
+            self._predictedData.prior.copyVariance(other.predictedData.prior)
+        self._relErr[:] = other.relErr
+        self._addErr[:] = other.addErr
+        self._lineNumber = other.lineNumber
+        self._fiducial = other.fiducial
+        return self
+
     @property
     def additive_error(self):
         return self._addErr
@@ -413,7 +450,7 @@ class DataPoint(Point):
         self._std[:] = np.sqrt(tmp)
 
         if self._predictedData.hasPrior:
-            self._predictedData.prior.variance[np.diag_indices(self.nActiveChannels)] = tmp[self.active]
+            self._predictedData.prior.variance = tmp[self.active]
 
 
     def Isend(self, dest, world):
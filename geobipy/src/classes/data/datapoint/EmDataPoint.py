@@ -48,11 +48,43 @@ class EmDataPoint(DataPoint):
         return out
 
 
-    def FindBestHalfSpace(self, minConductivity=1e-4, maxConductivity=1e4, nSamples=100):
+    def copyFrom(self, other):
+        """Overwrite the values of self with those of another EM data point without allocating new memory.
+
+        The means of any proposals on the height and errors are copied from other so that
+        the next perturbation is centred identically.
+
+        Parameters
+        ----------
+        other : subclass of geobipy.EmDataPoint
+            Data point to copy values from.
+
+        Returns
+        -------
+        out : subclass of geobipy.EmDataPoint
+            self, with the values of other.
+
+        """
+        super().copyFrom(other)
+
+        # Copy the internal means directly, the setters would round trip through exp/log on log distributions.
+        for this, that in ((self.z, other.z), (self.relErr, other.relErr), (self.addErr, other.addErr)):
+            if this.hasProposal and that.hasProposal:
+                this.proposal._mean = np.copy(that.proposal._mean)
+
+        # The sensitivity matrix is always replaced, never modified in place, so it can be shared.
+        self.J = other.J
+
+        return self
+
+
+    def FindBestHalfSpace(self, minConductivity=1e-4, maxConductivity=1e4, nSamples=9, nRefinements=3):
         """Computes the best value of a half space that fits the data.
 
-        Carries out a brute force search of the halfspace conductivity that best fits the data.
+        Carries out a coarse to fine grid search of the halfspace conductivity that best fits the data.
         The profile of data misfit vs halfspace conductivity is not quadratic, so a bisection will not work.
+        Each level of the search forward models all of its conductivities in a single call, and the next level
+        searches between the neighbours of the best fitting conductivity.
 
         Parameters
         ----------
@@ -61,30 +93,61 @@ class EmDataPoint(DataPoint):
         maxConductivity : float, optional
             The maximum conductivity to search over
         nSamples : int, optional
-            The number of values between the min and max
+            The number of values between the min and max at each level of the search
+        nRefinements : int, optional
+            The number of times the search is refined around the best fitting value.
 
         Returns
         -------
-        out : np.float64
-            The best fitting log10 conductivity for the half space
+        out : geobipy.Model1D
+            The best fitting half space model
 
         """
         assert maxConductivity > minConductivity, ValueError("Maximum conductivity must be greater than the minimum")
-        minConductivity = np.log10(minConductivity)
-        maxConductivity = np.log10(maxConductivity)
-        c = np.logspace(minConductivity, maxConductivity, nSamples)
-        PhiD = np.zeros(nSamples)
+        assert nSamples > 2, ValueError("nSamples must be greater than 2")
+        c0 = np.log10(minConductivity)
+        c1 = np.log10(maxConductivity)
+
+        a = self.active
+        w = 1.0 / self._std[a]
+        for i in range(nRefinements + 1):
+            c = np.logspace(c0, c1, nSamples)
+            PhiD = np.sum((w * (self._forwardHalfSpace(c)[:, a] - self._data[a]))**2.0, axis=1)
+            j = np.argmin(PhiD)
+            # Bracket the minimum with its neighbours
+            c0 = np.log10(c[np.maximum(j - 1, 0)])
+            c1 = np.log10(c[np.minimum(j + 1, nSamples - 1)])
+
         p = StatArray.StatArray(1, 'Conductivity', r'$\frac{S}{m}$')
         model = Model1D(1, parameters=p)
-        for i in range(nSamples):
-            model._par[0] = c[i]
-            self.forward(model)
-            PhiD[i] = self.dataMisfit(squared=True)
-        i = np.argmin(PhiD)
-        model._par[0] = c[i]
+        model._par[0] = c[j]
         return model
 
 
+    def _forwardHalfSpace(self, conductivities):
+        """Forward model the data for many half space conductivities.
+
+        Parameters
+        ----------
+        conductivities : array_like
+            Conductivity of each half space.
+
+        Returns
+        -------
+        out : array_like
+            Predicted data with shape (conductivities.size, nChannels).
+
+        """
+        p = StatArray.StatArray(1, 'Conductivity', r'$\frac{S}{m}$')
+        model = Model1D(1, parameters=p)
+        out = np.empty((np.size(conductivities), self.nChannels))
+        for i in range(np.size(conductivities)):
+            model._par[0] = conductivities[i]
+            self.forward(model)
+            out[i, :] = self._predictedData
+        return out
+
+
     def priorProbability(self, rErr, aErr, height, calibration, verbose=False):
         """Evaluate the probability for the EM data point given the specified attached priors
 
@@ -3,7 +3,7 @@ Module describing a frequency domain EMData Point that contains a single measure
 """
 from copy import copy, deepcopy
 from ....classes.core import StatArray
-from ...forwardmodelling.Electromagnetic.FD.fdem1d import fdem1dfwd, fdem1dsen
+from ...forwardmodelling.Electromagnetic.FD.fdem1d import fdem1dfwd, fdem1dfwdHalfspace, fdem1dsen, fdem1dfwdsen
 from .EmDataPoint import EmDataPoint
 from ...model.Model import Model
 from ...model.Model1D import Model1D
@@ -77,6 +77,19 @@ class FdemDataPoint(EmDataPoint):
         return out
 
 
+    def copyFrom(self, other):
+        """Overwrite the values of self with those of another FdemDataPoint without allocating new memory.
+
+        See Also
+        --------
+        geobipy.EmDataPoint.copyFrom
+
+        """
+        super().copyFrom(other)
+        self.calibration[:] = other.calibration
+        return self
+
+
     @property
     def units(self):
         return self._units
@@ -484,60 +497,25 @@ class FdemDataPoint(EmDataPoint):
         self.J = self.sensitivity(model)
 
 
-    def FindBestHalfSpace(self, minConductivity=1e-6, maxConductivity=1e2, percentThreshold=1.0, maxIterations=100):
-        """Uses the bisection approach to find a half space conductivity that best matches the EM data by minimizing the data misfit
+    def FindBestHalfSpace(self, minConductivity=1e-6, maxConductivity=1e2, nSamples=9, nRefinements=3):
+        """Computes the best value of a half space that fits the data.
 
-        Parameters
-        ----------
-        minConductivity : float
-            Minimum conductivity to start the search
-        maxConductivity : float
-            Maximum conductivity to start the search
-        percentThreshold : float, optional
-            Stopping criteria for the relative change in data fit
-        maxIterations : int, optional
-            Stop after this number of iterations
-
-        Returns
-        -------
-        out : geobipy.Model1D
-            Best fitting halfspace model
+        See Also
+        --------
+        geobipy.EmDataPoint.FindBestHalfSpace
 
         """
-        percentThreshold = 0.01 * percentThreshold
-        c0 = np.log10(minConductivity)
-        c1 = np.log10(maxConductivity)
-        cnew = 0.5 * (c0 + c1)
-        # Initialize a single layer model
-        p = StatArray.StatArray(1, 'Conductivity', r'$\frac{S}{m}$')
-        model = Model1D(1, parameters=p)
-        # Initialize the first conductivity
-        model._par[0] = 10.0**c0
-        self.forward(model)  # Forward model the EM data
-        PhiD1 = self.dataMisfit(squared=True)  # Compute the measure between observed and predicted data
-        # Initialize the second conductivity
-        model._par[0] = 10.0**c1
-        self.forward(model)  # Forward model the EM data
-        PhiD2 = self.dataMisfit(squared=True)  # Compute the measure between observed and predicted data
-        # Compute a relative change in the data misfit
-        dPhiD = abs(PhiD2 - PhiD1) / PhiD2
-        i = 1
-        # Continue until there is less than 1% change
-        while (dPhiD > percentThreshold and i < maxIterations):
-            cnew = 0.5 * (c0 + c1)  # Bisect the conductivities
-            model._par[0] = 10.0**cnew
-            self.forward(model)  # Forward model the EM data
-            PhiDnew = self.dataMisfit(squared=True)
-            if (PhiD2 > PhiDnew):
-                c1 = cnew
-                PhiD2 = PhiDnew
-            elif (PhiD1 > PhiDnew):
-                c0 = cnew
-                PhiD1 = PhiDnew
-            dPhiD = abs(PhiD2 - PhiD1) / PhiD2
-            i += 1
-
-        return model
+        return super().FindBestHalfSpace(minConductivity, maxConductivity, nSamples, nRefinements)
+
+
+    def _forwardHalfSpace(self, conductivities):
+        """ Forward model the data for many half space conductivities in a single call """
+        out = np.empty((np.size(conductivities), self.nChannels))
+        for i, s in enumerate(self.system):
+            tmp = fdem1dfwdHalfspace(s, conductivities, self.z[0])
+            out[:, :self.nFrequencies[i]] = tmp.real
+            out[:, self.nFrequencies[i]:] = tmp.imag
+        return out
 
 
     def forward(self, mod):
@@ -548,11 +526,27 @@ class FdemDataPoint(EmDataPoint):
         self._forward1D(mod)
 
 
-    def sensitivity(self, mod):
-        """ Compute the sensitivty matrix for the given model """
+    def sensitivity(self, mod, forward=False):
+        """Compute the sensitivty matrix for the given model
+
+        Parameters
+        ----------
+        mod : geobipy.Model1D
+            Model to compute the sensitivity for.
+        forward : bool, optional
+            Also update the predicted data.  Both come from a single kernel call that shares the layer recursion.
+
+        Returns
+        -------
+        J : geobipy.StatArray
+            Sensitivity matrix, also stored in self.J.
+
+        """
 
         assert isinstance(mod, Model), TypeError("Invalid model class for sensitivity matrix [1D]")
 
+        if forward:
+            return StatArray.StatArray(self._forwardSensitivity1D(mod), 'Sensitivity', '$\\frac{ppm.m}{S}$')
         return StatArray.StatArray(self._sensitivity1D(mod), 'Sensitivity', '$\\frac{ppm.m}{S}$')
 
 
@@ -579,6 +573,21 @@ class FdemDataPoint(EmDataPoint):
         return self.J
 
 
+    def _forwardSensitivity1D(self, mod):
+        """ Forward model the data and compute the sensitivity matrix for a 1D layered earth model """
+        J = np.zeros([self.nChannels, np.int(mod.nCells[0])])
+
+        for j, s in enumerate(self.system):
+            tmp, Jtmp = fdem1dfwdsen(s, mod, self.z[0])
+            self._predictedData[:self.nFrequencies[j]] = tmp.real
+            self._predictedData[self.nFrequencies[j]:] = tmp.imag
+            J[:self.nFrequencies[j], :] = Jtmp.real
+            J[self.nFrequencies[j]:, :] = Jtmp.imag
+
+        self.J = J[self.active, :]
+        return self.J
+
+
     def Isend(self, dest, world, systems=None):
         tmp = np.asarray([self.x, self.y, self.z, self.elevation, self.nSystems, self.lineNumber, self.fiducial], dtype=np.float64)
         myMPI.Isend(tmp, dest=dest, ndim=1, shape=(7, ), dtype=np.float64, world=world)
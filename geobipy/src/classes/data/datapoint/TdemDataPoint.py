@@ -2,8 +2,9 @@ from copy import deepcopy
 
 from ....classes.core import StatArray
 from ...model.Model import Model
+from ...model.Model1D import Model1D
 from .EmDataPoint import EmDataPoint
-from ...forwardmodelling.Electromagnetic.TD.tdem1d import (tdem1dfwd, tdem1dsen)
+from ...forwardmodelling.Electromagnetic.TD.tdem1d import (tdem1dfwd, tdem1dfwdHalfspace, tdem1dsen)
 from ...system.EmLoop import EmLoop
 from ...system.SquareLoop import SquareLoop
 from ...system.CircularLoop import CircularLoop
@@ -71,6 +72,9 @@ class TdemDataPoint(EmDataPoint):
 
     """
 
+    # updateSensitivity only recomputes the columns of the changed layers
+    _incrementalSensitivity = True
+
     def __init__(self, x=0.0, y=0.0, z=0.0, elevation=0.0, data=None, std=None, predictedData=None, system=None, transmitter_loop=None, receiver_loop=None, loopOffset=[0.0, 0.0, 0.0], lineNumber=0.0, fiducial=0.0):
         """Initializer. """
 
@@ -825,7 +829,7 @@ class TdemDataPoint(EmDataPoint):
 
         # Update the variance of the predicted data prior
         if self._predictedData.hasPrior:
-            self._predictedData.prior.variance[np.diag_indices(self.active.size)] = self._std[self.active]**2.0
+            self._predictedData.prior.variance = self._std[self.active]**2.0
 
 
     def updateSensitivity(self, mod):
@@ -867,11 +871,22 @@ class TdemDataPoint(EmDataPoint):
         tdem1dfwd(self, mod)
 
 
-    def sensitivity(self, model, ix=None, modelChanged=True):
-        """ Compute the sensitivty matrix for the given model """
+    def _forwardHalfSpace(self, conductivities):
+        """ Forward model the data for many half space conductivities """
+        p = StatArray.StatArray(1, 'Conductivity', r'$\frac{S}{m}$')
+        return tdem1dfwdHalfspace(self, Model1D(1, parameters=p), conductivities)
+
+
+    def sensitivity(self, model, ix=None, modelChanged=True, forward=False):
+        """ Compute the sensitivty matrix for the given model
+
+        If forward is True, the predicted data are also forward modelled from the model, see tdem1dsen.
+        Neither GA-AEM nor empymod then repeats the forward model.
+
+        """
 
         assert isinstance(model, Model), TypeError("Invalid model class for sensitivity matrix [1D]")
-        return StatArray.StatArray(tdem1dsen(self, model, ix, modelChanged), 'Sensitivity', '$\\frac{V}{SAm^{3}}$')
+        return StatArray.StatArray(tdem1dsen(self, model, ix, modelChanged, forward), 'Sensitivity', '$\\frac{V}{SAm^{3}}$')
 
 
     def _empymodForward(self, mod):
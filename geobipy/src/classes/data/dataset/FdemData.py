@@ -779,9 +779,15 @@ class FdemData(Data):
 
     def _openDatafiles(self, dataFilename):
         self._file = []
+        self._rows = []
         for i, f in enumerate(dataFilename):
             self._file.append(open(f, 'r'))
             fIO.skipLines(self._file[i], nLines=1)
+            # Rows are parsed, or read from the binary store, a chunk at a time and handed out one at a time.
+            if fIO.getStore(f, nHeaders=1) is None:
+                self._rows.append(fIO.read_rows(self._file[i]))
+            else:
+                self._rows.append(fIO.read_store_rows(f))
 
 
     def _closeDatafiles(self):
@@ -802,12 +808,12 @@ class FdemData(Data):
         endOfFile = False
         values = []
         for i in range(self.nSystems):
-            line = self._file[i].readline()
-            try:
-                values.append(fIO.getRealNumbersfromLine(line, self._indicesForFile[i]))
-            except:
+            row = next(self._rows[i], None)
+            if row is None:
                 self._file[i].close()
                 endOfFile = True
+            else:
+                values.append(row[self._indicesForFile[i]])
 
         if endOfFile:
             return None
@@ -4,7 +4,7 @@ Leon Foks
 June 2015
 """
 import numpy as np
-from .fdem1d_numba import (nbFdem1dfwd, nbFdem1dsen)
+from .fdem1d_numba import (nbFdem1dfwd, nbFdem1dfwdHalfspace, nbFdem1dsen, nbFdem1dfwdsen)
 # from ...ipforward1d_fortran import ipforward1d
 
 def fdem1dfwd(system, model1d, altitude):
@@ -27,6 +27,83 @@ def fdem1dfwd(system, model1d, altitude):
     """
     assert altitude >= model1d.top, "Sensor altitude must be above the top of the model"
 
+    tid, tHeight, rHeight, tMom, rx, scl = _fdemGeometry(system, altitude)
+
+    frequencies = np.asarray(system.frequencies)
+    conductivity = np.asarray(model1d.par)
+    kappa = np.asarray(model1d.magnetic_susceptibility)
+    perm = np.asarray(model1d.magnetic_permeability)
+    thickness = np.asarray(model1d.thk)
+    loopSeparation = np.asarray(system.loopSeparation)
+
+    return nbFdem1dfwd(tid, frequencies, tHeight, rHeight, tMom, rx, loopSeparation, system.w0, system.lamda0, system.lamda02, system.w1, system.lamda1, system.lamda12, scl, conductivity, kappa, perm, thickness)
+
+
+def fdem1dfwdHalfspace(system, conductivities, altitude):
+    """Forward model the frequency domain EM response of many half spaces in a single call
+
+    Parameters
+    ----------
+    system : geobipy.FdemSystem
+        Acquisition system information
+    conductivities : array_like
+        Conductivity of each half space.
+    altitude : float
+        Acquisition height above the half space
+
+    Returns
+    -------
+    predictedData : array_like
+        Frequency domain data with shape (conductivities.size, system.nFrequencies).
+
+    """
+    assert altitude >= 0.0, "Sensor altitude must be above the top of the model"
+
+    tid, tHeight, rHeight, tMom, rx, scl = _fdemGeometry(system, altitude)
+
+    frequencies = np.asarray(system.frequencies)
+    conductivities = np.atleast_1d(np.asarray(conductivities, dtype=np.float64))
+    loopSeparation = np.asarray(system.loopSeparation)
+
+    return nbFdem1dfwdHalfspace(tid, frequencies, tHeight, rHeight, tMom, rx, loopSeparation, system.w0, system.lamda0, system.lamda02, system.w1, system.lamda1, system.lamda12, scl, conductivities)
+
+
+def fdem1dfwdsen(system, model1d, altitude):
+    """Forward model the frequency domain EM data and compute the sensitivity matrix with a single kernel call
+
+    Parameters
+    ----------
+    system : geobipy.FdemSystem
+        Acquisition system information
+    model1d : geobipy.Model1D
+        1D layered earth geometry
+    altitude : float
+        Acquisition height above the model
+
+    Returns
+    -------
+    predictedData : array_like
+        Frequency domain data.
+    J : array_like
+        Sensitivity matrix with shape (system.nFrequencies, model1d.nCells).
+
+    """
+    assert altitude >= model1d.top, "Sensor altitude must be above the top of the model"
+
+    tid, tHeight, rHeight, tMom, rx, scl = _fdemGeometry(system, altitude)
+
+    frequencies = np.asarray(system.frequencies)
+    conductivity = np.asarray(model1d.par)
+    kappa = np.asarray(model1d.magnetic_susceptibility)
+    perm = np.asarray(model1d.magnetic_permeability)
+    thickness = np.asarray(model1d.thk)
+    loopSeparation = np.asarray(system.loopSeparation)
+
+    return nbFdem1dfwdsen(tid, frequencies, tHeight, rHeight, tMom, rx, loopSeparation, system.w0, system.lamda0, system.lamda02, system.w1, system.lamda1, system.lamda12, scl, conductivity, kappa, perm, thickness)
+
+
+def _fdemGeometry(system, altitude):
+    """Get the coil orientations, heights, moments, and offsets for each frequency of a system. """
     # Create the indices of the coil orientations for the frequencies.
     tid = system.getTensorID()
 
@@ -44,14 +121,7 @@ def fdem1dfwd(system, model1d, altitude):
         rx[i] = system.loopOffsets[i, 0]
     scl = tMom * rMom
 
-    frequencies = np.asarray(system.frequencies)
-    conductivity = np.asarray(model1d.par)
-    kappa = np.asarray(model1d.magnetic_susceptibility)
-    perm = np.asarray(model1d.magnetic_permeability)
-    thickness = np.asarray(model1d.thk)
-    loopSeparation = np.asarray(system.loopSeparation)
-
-    return nbFdem1dfwd(tid, frequencies, tHeight, rHeight, tMom, rx, loopSeparation, system.w0, system.lamda0, system.lamda02, system.w1, system.lamda1, system.lamda12, scl, conductivity, kappa, perm, thickness)
+    return tid, tHeight, rHeight, tMom, rx, scl
 
 
 # def ip1dfwd(S, mod, z0):
@@ -41,31 +41,118 @@ def nbFdem1dfwd(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0,
     thk = zeros(nL1, dtype=float64)
     thk[1:] = thickness
 
-    H = empty(nFrequencies, dtype=complex128)
-    H0 = empty(nFrequencies, dtype=complex128)
-
-    useJ0 = False
-    for i in range(len(tid)):
-        if tid[i] in [1, 2, 4, 5, 9]:
-            useJ0 = True
-
-    if (useJ0):
+    if (useJ0(tid)):
         rTEj0, u0j0 = calcFdemforward1D(nLayers, nFrequencies, nC0, frequencies, lamda0, lamda02, par, kappa, perm, thk)
+    else:
+        rTEj0 = zeros((nFrequencies, nC0), dtype=complex128)
+        u0j0 = zeros((nFrequencies, nC0), dtype=complex128)
     rTEj1, u0j1 = calcFdemforward1D(nLayers, nFrequencies, nC1, frequencies, lamda1, lamda12, par, kappa, perm, thk)
 
+    return fdemFields(tid, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, rTEj0, u0j0, rTEj1, u0j1)
 
-    for i in range(len(tid)):
+
+@jit(**_numba_settings)
+def nbFdem1dfwdHalfspace(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivities):
+    """Forward model the response of many half spaces, one row per conductivity.
+
+    For a half space, only the TE reflection coefficients depend on the conductivity and the
+    response is linear in them.  The Hankel transform kernels are therefore computed once and
+    each conductivity costs one complex square root per filter coefficient.
+
+    """
+    nConductivities = int64(len(conductivities))
+    nFrequencies = int64(len(frequencies))
+
+    rTE0 = zeros(nC0, dtype=complex128)
+    rTE1 = zeros(nC1, dtype=complex128)
+
+    # Squared vertical wavenumbers in the air, un^2 = yn*zn + lamda^2, and the wavenumbers themselves
+    u20 = empty((nFrequencies, nC0), dtype=complex128)
+    u21 = empty((nFrequencies, nC1), dtype=complex128)
+    ua0 = empty((nFrequencies, nC0), dtype=complex128)
+    ua1 = empty((nFrequencies, nC1), dtype=complex128)
+    # Kernels that multiply the reflection coefficients
+    G0 = zeros((nFrequencies, nC0), dtype=complex128)
+    G1 = zeros((nFrequencies, nC1), dtype=complex128)
+    use0 = zeros(nFrequencies, dtype=np.bool_)
+    use1 = zeros(nFrequencies, dtype=np.bool_)
+    iwmu = empty(nFrequencies, dtype=complex128)
+
+    for i in range(nFrequencies):
+        omega = pi2 * frequencies[i]
+        iwmu[i] = (omega * mu0) * 1j
+        ynzn = ((omega * eps0) * 1j) * iwmu[i]
+        for jc in range(nC0):
+            u20[i, jc] = ynzn + lamda02[i, jc]
+            ua0[i, jc] = sqrt(u20[i, jc])
+        for jc in range(nC1):
+            u21[i, jc] = ynzn + lamda12[i, jc]
+            ua1[i, jc] = sqrt(u21[i, jc])
+
+        hDiff = rHeight[i] - tHeight[i]
         id = tid[i]
+        # The free space response, with zero reflection coefficients, and the coefficients of rTE in Hxx, Hxz, Hzx, Hzz.
         if id == 1:
-            H[i], H0[i] =  Hxx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj0[i, :], w0, lamda0[i, :], lamda02[i, :], rTEj1[i, :], w1, lamda1[i, :])
+            H, H0 = Hxx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTE0, w0, lamda0[i, :], lamda02[i, :], rTE1, w1, lamda1[i, :])
+            r = 1.0 / separation[i]
+            c0 = -(moments[i] / pi4) * r
+            d0 = c0 * ((rx[i] * r)**2.0)
+            d1 = c0 * (r - ((2.0 * rx[i]**2.0) * (r**3.0)))
+            for jc in range(nC0):
+                G0[i, jc] = -exp(lamda0[i, jc] * hDiff) * lamda02[i, jc] * d0 * w0[jc]
+            for jc in range(nC1):
+                G1[i, jc] = -exp(lamda1[i, jc] * hDiff) * lamda1[i, jc] * d1 * w1[jc]
+            use0[i] = True
+            use1[i] = True
         elif id == 3:
-            H[i], H0[i] =  Hxz(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj1[i, :], w1, lamda1[i, :], lamda12[i, :])
+            H, H0 = Hxz(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTE1, w1, lamda1[i, :], lamda12[i, :])
+            d1 = (rx[i] * moments[i]) / (pi4 * separation[i])
+            for jc in range(nC1):
+                G1[i, jc] = -exp(lamda1[i, jc] * hDiff) * lamda12[i, jc] * d1 * w1[jc]
+            use1[i] = True
         elif id == 7:
-            H[i], H0[i] =  Hzx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj1[i, :], u0j1[i, :], w1, lamda1[i, :], lamda12[i, :])
+            u1 = ua1[i, :]
+            H, H0 = Hzx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTE1, u1, w1, lamda1[i, :], lamda12[i, :])
+            d1 = (rx[i] * moments[i]) / (pi4 * separation[i])
+            for jc in range(nC1):
+                G1[i, jc] = -exp(u1[jc] * hDiff) * lamda12[i, jc] * d1 * w1[jc]
+            use1[i] = True
         elif id == 9:
-            H[i], H0[i] = Hzz(tHeight[i], rHeight[i], moments[i], separation[i], rTEj0[i,  :], u0j0[i,  :], w0, lamda0[i, :])
-
-    return 1.e6 * scale * ((H - H0) / H0)
+            u0 = ua0[i, :]
+            H, H0 = Hzz(tHeight[i], rHeight[i], moments[i], separation[i], rTE0, u0, w0, lamda0[i, :])
+            a2 = moments[i] / (pi4 * separation[i])
+            for jc in range(nC0):
+                G0[i, jc] = exp(u0[jc] * hDiff) * (lamda0[i, jc]**3.0 / u0[jc]) * a2 * w0[jc]
+            use0[i] = True
+        else:
+            H0 = complex128(1.0 + 0j)
+
+        # Normalize by the free space response, as in nbFdem1dfwd
+        a = 1.e6 * scale[i] / H0
+        for jc in range(nC0):
+            G0[i, jc] *= a
+        for jc in range(nC1):
+            G1[i, jc] *= a
+
+    out = zeros((nConductivities, nFrequencies), dtype=complex128)
+    for k in range(nConductivities):
+        for i in range(nFrequencies):
+            iwms = iwmu[i] * conductivities[k]
+            H = complex128(0.0 + 0j)
+            # rTE = (u_air - u_earth) / (u_air + u_earth) since the impedances of both layers are equal
+            if use0[i]:
+                for jc in range(nC0):
+                    ua = ua0[i, jc]
+                    ue = sqrt(u20[i, jc] + iwms)
+                    H += G0[i, jc] * (ua - ue) / (ua + ue)
+            if use1[i]:
+                for jc in range(nC1):
+                    ua = ua1[i, jc]
+                    ue = sqrt(u21[i, jc] + iwms)
+                    H += G1[i, jc] * (ua - ue) / (ua + ue)
+            out[k, i] = H
+
+    return out
 
 
 @jit(**_numba_settings)
@@ -88,17 +175,93 @@ def nbFdem1dsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0,
     thk = zeros(nL1, dtype=float64)
     thk[1:] = thickness
 
-    dH = zeros((nLayers, nFrequencies), dtype=complex128)
-    dH0 = zeros((nLayers, nFrequencies), dtype=complex128)
+    if (useJ0(tid)):
+        rTEj0, u0j0, sens0 = calcFdemSensitivity1D(nLayers, nFrequencies, nC0, frequencies, lamda0, lamda02, par, kappa, perm, thk)
+    else:
+        u0j0 = zeros((nFrequencies, nC0), dtype=complex128)
+        sens0 = zeros((nLayers, nFrequencies, nC0), dtype=complex128)
+    rTEj1, u0j1, sens1 = calcFdemSensitivity1D(nLayers, nFrequencies, nC1, frequencies, lamda1, lamda12, par, kappa, perm, thk)
+
+    return fdemSensitivity(tid, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, u0j0, sens0, u0j1, sens1)
+
+
+@jit(**_numba_settings)
+def nbFdem1dfwdsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness):
+    """Forward model the data and compute the sensitivity matrix in one pass.
 
-    useJ0 = False
+    The reflection coefficients needed by the forward model fall out of the recursion used for the sensitivity.
+
+    """
+    nFrequencies = int64(len(frequencies))
+    nLayers = int64(len(conductivity))
+
+    nL1 = nLayers + 1
+
+    par = zeros(nL1, dtype=float64)
+    par[1:] = conductivity
+
+    kappa = zeros(nL1, dtype=float64)
+    kappa[1:] = susceptibility
+
+    perm = zeros(nL1, dtype=float64)
+    perm[1:] = permeability
+
+    thk = zeros(nL1, dtype=float64)
+    thk[1:] = thickness
+
+    if (useJ0(tid)):
+        rTEj0, u0j0, sens0 = calcFdemSensitivity1D(nLayers, nFrequencies, nC0, frequencies, lamda0, lamda02, par, kappa, perm, thk)
+    else:
+        rTEj0 = zeros((nFrequencies, nC0), dtype=complex128)
+        u0j0 = zeros((nFrequencies, nC0), dtype=complex128)
+        sens0 = zeros((nLayers, nFrequencies, nC0), dtype=complex128)
+    rTEj1, u0j1, sens1 = calcFdemSensitivity1D(nLayers, nFrequencies, nC1, frequencies, lamda1, lamda12, par, kappa, perm, thk)
+
+    predicted = fdemFields(tid, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, rTEj0, u0j0, rTEj1, u0j1)
+    J = fdemSensitivity(tid, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, u0j0, sens0, u0j1, sens1)
+
+    return predicted, J
+
+
+@jit(**_numba_settings)
+def useJ0(tid):
+    """Whether any coil orientation needs the zeroth order Bessel function filter. """
     for i in range(len(tid)):
         if tid[i] in [1, 2, 4, 5, 9]:
-            useJ0 = True
+            return True
+    return False
+
 
-    if (useJ0):
-        u0j0, sens0 = calcFdemSensitivity1D(nLayers, nFrequencies, nC0, frequencies, lamda0, lamda02, par, kappa, perm, thk)
-    u0j1, sens1 = calcFdemSensitivity1D(nLayers, nFrequencies, nC1, frequencies, lamda1, lamda12, par, kappa, perm, thk)
+@jit(**_numba_settings)
+def fdemFields(tid, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, rTEj0, u0j0, rTEj1, u0j1):
+    """Integrate the reflection coefficients into the normalized secondary field for each frequency. """
+    nFrequencies = int64(len(tid))
+
+    H = empty(nFrequencies, dtype=complex128)
+    H0 = empty(nFrequencies, dtype=complex128)
+
+    for i in range(nFrequencies):
+        id = tid[i]
+        if id == 1:
+            H[i], H0[i] =  Hxx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj0[i, :], w0, lamda0[i, :], lamda02[i, :], rTEj1[i, :], w1, lamda1[i, :])
+        elif id == 3:
+            H[i], H0[i] =  Hxz(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj1[i, :], w1, lamda1[i, :], lamda12[i, :])
+        elif id == 7:
+            H[i], H0[i] =  Hzx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj1[i, :], u0j1[i, :], w1, lamda1[i, :], lamda12[i, :])
+        elif id == 9:
+            H[i], H0[i] = Hzz(tHeight[i], rHeight[i], moments[i], separation[i], rTEj0[i,  :], u0j0[i,  :], w0, lamda0[i, :])
+
+    return 1.e6 * scale * ((H - H0) / H0)
+
+
+@jit(**_numba_settings)
+def fdemSensitivity(tid, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, u0j0, sens0, u0j1, sens1):
+    """Integrate the derivatives of the reflection coefficients into the sensitivity matrix. """
+    nFrequencies = int64(len(tid))
+    nLayers = int64(sens1.shape[0])
+
+    dH = zeros((nLayers, nFrequencies), dtype=complex128)
+    dH0 = zeros((nLayers, nFrequencies), dtype=complex128)
 
     for k in range(nLayers):
         for i in range(nFrequencies):
@@ -133,6 +296,7 @@ def calcFdemSensitivity1D(nLayers, nFrequencies, nCoefficients, frequencies, lam
     Y, Yn, un = initCoefficients(nLayers, nFrequencies, nCoefficients, frequencies, lamda, lamda2, par, kappa, perm)
 
     if (nLayers == 1):
+        rTE = empty((nFrequencies, nCoefficients), dtype=complex128)
         u0 = zeros((nFrequencies, nCoefficients), dtype=complex128)
         sens = zeros((nLayers, nFrequencies, nCoefficients), dtype=complex128)
 
@@ -146,12 +310,13 @@ def calcFdemSensitivity1D(nLayers, nFrequencies, nCoefficients, frequencies, lam
                 u0[i, jc] = un[0, i, jc]
                 a0 = Yn[0, i, jc]
                 a1 = Y[1, i, jc]
+                rTE[i, jc] = (a0 - a1) / (a0 + a1)
                 a2 = 1.0 / (a0 + a1)
                 sens[0, i, jc] = -2.0 * a0 * sens[0, i, jc] * a2**2.0
     else:
-        u0, sens = M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par, kappa, perm)
+        rTE, u0, sens = M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par, kappa, perm)
 
-    return u0, sens
+    return rTE, u0, sens
 
 
 @jit(**_numba_settings)
@@ -222,6 +387,7 @@ def M1_0(nLayers, nFrequencies, nCoefficients, Yn, Y, un, thk):
 @jit(**_numba_settings)
 def M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par, kappa, perm):
 
+    rTE = empty((nFrequencies, nCoefficients), dtype=complex128)
     u0 = empty((nFrequencies, nCoefficients), dtype=complex128)
     sens = empty((nLayers, nFrequencies, nCoefficients), dtype=complex128)
 
@@ -285,6 +451,8 @@ def M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par,
 
             a0 = Yn[0, i, jc]
             a1 = Y[1, i, jc]
+            # Reflection coefficient, as in M1_0, before Y is overwritten
+            rTE[i, jc] = (a0 - a1) / (a0 + a1)
             a2 = 1.0 / (a0 + a1)
 
             Y[1, i, jc] = a2**2.0
@@ -300,7 +468,7 @@ def M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par,
             for jc in range(nCoefficients):
                 sens[k,  i, jc] *= Yn[0, i, jc] * accumulate[k2, i, jc]
 
-    return u0, sens
+    return rTE, u0, sens
 
 
 @jit(**_numba_settings)
@@ -36,14 +36,70 @@ def tdem1dfwd(datapoint, model1d):
         return empymod_tdem1dfwd(datapoint, model1d)
 
 
-def tdem1dsen(datapoint, model1d, ix=None, modelChanged=True):
+def tdem1dfwdHalfspace(datapoint, model1d, conductivities):
+    """Forward model the time domain EM response of many half spaces
 
+    Parameters
+    ----------
+    datapoint : geobipy.TdemDataPoint
+        Data point with the acquisition system information.
+    model1d : geobipy.Model1D
+        Single layer model whose parameter is overwritten with each conductivity.
+    conductivities : array_like
+        Conductivity of each half space.
+
+    Returns
+    -------
+    predictedData : array_like
+        Time domain data with shape (conductivities.size, datapoint.nChannels).
+
+    """
+    assert model1d.nCells[0] == 1, ValueError("model1d must be a half space")
+    assert datapoint.z[0] >= model1d.top, "Sensor altitude must be above the top of the model"
+
+    conductivities = np.atleast_1d(conductivities)
+
+    heightTolerance = 0.0
+    if (datapoint.z > heightTolerance):
+        assert isinstance(datapoint.system[0], TdemSystem_GAAEM), TypeError("For airborne data, system must be type TdemSystem_GAAEM")
+        return gaTdem1dfwdHalfspace(datapoint, model1d, conductivities)
+
+    else:
+        return empymod_tdem1dfwdHalfspace(datapoint, model1d, conductivities)
+
+
+def tdem1dsen(datapoint, model1d, ix=None, modelChanged=True, forward=False):
+    """Wrapper to time domain EM sensitivity calculators
+
+    Parameters
+    ----------
+    datapoint : geobipy.TdemDataPoint
+        Data point with the acquisition system information.
+    model1d : geobipy.Model1D
+        1D layered earth geometry
+    ix : array_like of ints, optional
+        Only compute the sensitivity of these layers.
+    modelChanged : bool, optional
+        Whether the GA-AEM systems need to forward model model1d before the sensitivity.
+    forward : bool, optional
+        Also forward model the predicted data of datapoint.
+        The GA-AEM systems then already hold the forward model, and the empymod base response is the forward model.
+
+    Returns
+    -------
+    J : array_like
+        Sensitivity matrix, also stored in datapoint.J.
+
+    """
     heightTolerance = 0.0
     if (datapoint.z > heightTolerance):
         assert isinstance(datapoint.system[0], TdemSystem_GAAEM), TypeError("For airborne data, system must be type TdemSystem_GAAEM")
+        if forward:
+            gaTdem1dfwd(datapoint, model1d)
+            modelChanged = False
         return gaTdem1dsen(datapoint, model1d, ix, modelChanged)
     else:
-        return empymod_tdem1dsen(datapoint, model1d, ix)
+        return empymod_tdem1dsen(datapoint, model1d, ix, forward)
 
 def empymod_tdem1dfwd(datapoint, model1d):
 
@@ -53,7 +109,17 @@ def empymod_tdem1dfwd(datapoint, model1d):
         datapoint._predictedData[iSys] = fm
 
 
-def empymod_tdem1dsen(datapoint, model1d, ix=None):
+def empymod_tdem1dfwdHalfspace(datapoint, model1d, conductivities):
+
+    out = np.empty((conductivities.size, datapoint.nChannels))
+    for j in range(conductivities.size):
+        model1d._par[0] = conductivities[j]
+        for i in range(datapoint.nSystems):
+            out[j, datapoint._systemIndices(i)] = empymod_walktem(datapoint.system[i], model1d)
+    return out
+
+
+def empymod_tdem1dsen(datapoint, model1d, ix=None, forward=False):
 
     if (ix is None):  # Generate a full matrix if the layers are not specified
         ix = range(model1d.nCells[0])
@@ -65,6 +131,8 @@ def empymod_tdem1dsen(datapoint, model1d, ix=None):
         iSys = datapoint._systemIndices(j)
 
         d0 = empymod_walktem(datapoint.system[j], model1d)
+        if forward:
+            datapoint._predictedData[iSys] = d0
         m1 = model1d.deepcopy()
 
         for i in range(np.size(ix)):  # For the specified layers
@@ -100,6 +168,23 @@ try:
             datapoint._predictedData[iSys] = -fm.SZ[:]  # Store the necessary component
 
 
+    def gaTdem1dfwdHalfspace(datapoint, model1d, conductivities):
+        # The geometry is the same for every half space
+        G = Geometry(datapoint.z[0],
+                    datapoint.transmitter.roll, datapoint.transmitter.pitch, datapoint.transmitter.yaw,
+                    datapoint.loopOffset[0], datapoint.loopOffset[1], datapoint.loopOffset[2],
+                    datapoint.receiver.roll, datapoint.receiver.pitch, datapoint.receiver.yaw)
+
+        out = np.empty((conductivities.size, datapoint.nChannels))
+        for j in range(conductivities.size):
+            model1d._par[0] = conductivities[j]
+            E = Earth(model1d.par[:], model1d.thk[:-1])
+            for i in range(datapoint.nSystems):
+                fm = datapoint.system[i].forwardmodel(G, E)
+                out[j, datapoint._systemIndices(i)] = -fm.SZ[:]
+        return out
+
+
     def gaTdem1dsen(datapoint, model1d, ix=None, modelChanged=True):
         """ Compute the sensitivty matrix for a 1D layered earth model, optionally compute the responses for only the layers in ix """
         # Unfortunately the code requires forward modelled data to compute the
@@ -115,18 +200,20 @@ try:
                 datapoint.system[i].forwardmodel(G, E)
 
         if (ix is None):  # Generate a full matrix if the layers are not specified
-            ix = range(np.int(model1d.nCells[0]))
-            J = np.zeros([datapoint.nWindows, np.int(model1d.nCells[0])])
-        else:  # Partial matrix for specified layers
-            J = np.zeros([datapoint.nWindows, np.size(ix)])
+            ix = np.arange(model1d.nCells[0])
+        ix = np.atleast_1d(ix)
+
+        J = np.zeros([datapoint.nWindows, ix.size])
 
         for j in range(datapoint.nSystems):  # For each system
             iSys = datapoint._systemIndices(j)
-            for i in range(np.size(ix)):  # For the specified layers
-                tmp = datapoint.system[j].derivative(
-                    datapoint.system[j].CONDUCTIVITYDERIVATIVE, ix[i] + 1)
+            system = datapoint.system[j]
+            for i in range(ix.size):  # For the specified layers
                 # Store the necessary component
-                J[iSys, i] = -model1d.par[ix[i]] * tmp.SZ[:]
+                J[iSys, i] = system.derivative(system.CONDUCTIVITYDERIVATIVE, ix[i] + 1).SZ[:]
+
+        # Scale all the layer derivatives at once
+        J *= -model1d.par[ix]
 
         datapoint.J = J[datapoint.active, :]
         return datapoint.J
@@ -135,5 +222,8 @@ except:
     def gaTdem1dfwd(*args, **kwargs):
         raise Exception("gatdaem1d is not installed. Please see instructions")
 
+    def gaTdem1dfwdHalfspace(*args, **kwargs):
+        raise Exception("gatdaem1d is not installed. Please see instructions")
+
     def gaTdem1dsen(*args, **kwargs):
         raise Exception("gatdaem1d is not installed. Please see instructions")
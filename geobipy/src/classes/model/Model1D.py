@@ -9,7 +9,9 @@ from ..statistics.Histogram1D import Histogram1D
 from ..statistics.Hitmap2D import Hitmap2D
 from ...base.logging import myLogger
 from ..statistics.Distribution import Distribution
+from ..statistics import logProbability
 import numpy as np
+from scipy.linalg import cho_factor, cho_solve, cholesky
 import matplotlib.pyplot as plt
 from ...base import customPlots as cP
 from ...base import customFunctions as cF
@@ -104,8 +106,18 @@ class Model1D(Model):
         self._halfSpaceParameter = None
         self.Hitmap = None
         self._inverseHessian = None
+        # Lower Cholesky factor of the Hessian, the inverse Hessian is only formed from it on request.
+        self._hessianFactor = None
+        # Reciprocal data errors the inverse Hessian was computed with.
+        self._hessianWeights = None
+        # Number of low rank updates made to the inverse Hessian since it was last computed in full.
+        self._nHessianUpdates = 0
+        self._buffers = None
 
 
+    # Arrays that are preallocated by Model1D.allocateBuffer
+    _bufferedAttributes = ('_depth', '_thk', '_par', '_dpar', '_magnetic_permeability', '_magnetic_susceptibility')
+
     @property
     def nCells(self):
         return self._nCells
@@ -134,6 +146,8 @@ class Model1D(Model):
 
     @property
     def inverseHessian(self):
+        if (self._inverseHessian is None) and (not self._hessianFactor is None):
+            self._inverseHessian = cF.choInv(self._hessianFactor)
         return self._inverseHessian
 
 
@@ -258,6 +272,9 @@ class Model1D(Model):
         other.Hitmap = self.Hitmap
         other.hasHalfspace = self.hasHalfspace
         other._inverseHessian = deepcopy(self._inverseHessian)
+        other._hessianFactor = deepcopy(self._hessianFactor)
+        other._hessianWeights = self._hessianWeights
+        other._nHessianUpdates = self._nHessianUpdates
         other.parameterBounds = self.parameterBounds
         other._halfSpaceParameter = self._halfSpaceParameter
         return other
@@ -293,6 +310,83 @@ class Model1D(Model):
         return tmp
 
 
+    def allocateBuffer(self):
+        """Create a copy of the model whose arrays are views into memory preallocated for maxLayers cells.
+
+        A buffered model can be overwritten in place using copyFrom, insertLayer, deleteLayer, and perturbStructure
+        with the out keyword.  This allows a Markov chain to reuse the same memory for every proposal instead of
+        deepcopying the model, and its priors and proposals, on every iteration.
+
+        Returns
+        -------
+        out : geobipy.Model1D
+            Copy of the model with preallocated memory.
+
+        """
+        assert not self.maxLayers is None, ValueError("No priors are set, user Model1D.setPriors() to do so.")
+
+        other = self.deepcopy()
+        other._buffers = {}
+        for key in Model1D._bufferedAttributes:
+            tmp = getattr(other, key)
+            other._buffers[key] = StatArray.StatArray(np.int(self.maxLayers), tmp.name, tmp.units, dtype=tmp.dtype)
+
+        return other.copyFrom(self)
+
+
+    def copyFrom(self, other):
+        """Overwrite the values of a buffered model with those of another model.
+
+        Priors, proposals, and posteriors attached to self are kept.  Only the dimensions of the priors are updated to match other.
+
+        Parameters
+        ----------
+        other : geobipy.Model1D
+            Model to copy the values from.
+
+        Returns
+        -------
+        out : geobipy.Model1D
+            self, with the values of other.
+
+        """
+        self._setCells(np.int(other.nCells))
+        self._nCells[:] = other.nCells
+        self._top = other.top
+        self._depth[:] = other.depth
+        self._thk[:] = other.thk
+        self._par[:] = other.par
+        self._dpar[:] = other.dpar
+        self._magnetic_permeability[:] = other.magnetic_permeability
+        self._magnetic_susceptibility[:] = other.magnetic_susceptibility
+
+        if self.par.hasPrior:
+            self.par.prior.ndim = other.par.prior.ndim
+        if self.dpar.hasPrior:
+            self.dpar.prior.ndim = other.dpar.prior.ndim
+
+        self.action = other.action.copy()
+        # The inverse Hessian and its factor are always replaced, never modified in place, so they can be shared.
+        self._inverseHessian = other._inverseHessian
+        self._hessianFactor = other._hessianFactor
+        self._hessianWeights = other._hessianWeights
+        self._nHessianUpdates = other._nHessianUpdates
+        return self
+
+
+    def _setCells(self, nCells):
+        """Point the arrays of a buffered model at the first nCells entries of its preallocated memory."""
+        for key, buffer in self._buffers.items():
+            n = np.maximum(0, nCells - 1) if key == '_dpar' else nCells
+            current = getattr(self, key)
+            if (current.base is buffer) and (current.size == n):
+                continue
+            view = buffer[:n]
+            # Carry over the name, units, and any attached distributions.
+            view.__dict__.update(current.__dict__)
+            setattr(self, key, view)
+
+
     def depthFromThickness(self):
         """Given the thicknesses of each layer, create the depths to each interface. The last depth is inf for the halfspace."""
         self._depth[:] = np.cumsum(self.thk)
@@ -303,7 +397,8 @@ class Model1D(Model):
 
     def thicknessFromDepth(self):
         """Given the depths to each interface, compute the layer thicknesses. The last thickness is nan for the halfspace."""
-        self._thk = self.thk.resize(np.int(self.nCells))
+        if (self.thk.size != np.int(self.nCells)):
+            self._thk = self.thk.resize(np.int(self.nCells))
         self._thk[0] = self.depth[0]
         for i in range(1, np.int(self.nCells)):
             self._thk[i] = self.depth[i] - self.depth[i - 1]
@@ -312,7 +407,7 @@ class Model1D(Model):
             self._thk[-1] = np.inf
 
 
-    def localParameterVariance(self, dataPoint=None):
+    def localParameterVariance(self, dataPoint=None, forward=False):
         """Generate a localized inverse Hessian matrix using a dataPoint and the current realization of the Model1D.
 
         Parameters
@@ -320,6 +415,8 @@ class Model1D(Model):
         dataPoint : geobipy.DataPoint, optional
             The data point to use when computing the local estimate of the variance.
             If None, only the prior derivative is used.
+        forward : bool, optional
+            Also forward model the predicted data of dataPoint from this model, see dataPoint.sensitivity.
 
         Returns
         -------
@@ -327,61 +424,168 @@ class Model1D(Model):
             Inverse Hessian matrix
 
         """
+        self._localHessian(dataPoint, forward)
+        return self.inverseHessian
+
+
+    def _localHessian(self, dataPoint=None, forward=False):
+        """Compute the local Hessian, see localParameterVariance, without forming its inverse. """
         assert self.par.hasPrior or self.dpar.hasPrior, Exception("Model must have either a parameter prior or gradient prior, use self.setPriors()")
 
         if not dataPoint is None:
             # Compute the sensitivity of the data to the perturbed model
-            dataPoint.sensitivity(self)
-            Wd = dataPoint.weightingMatrix(power=1.0)
-            WdJ = np.dot(Wd, dataPoint.J)
-            WdJTWdJ = np.dot(WdJ.T, WdJ)
-
-            # Propose new layer conductivities
-            self._inverseHessian = np.linalg.inv(WdJTWdJ + self.par.prior.derivative(x=None, order=2))
+            dataPoint.sensitivity(self, forward=forward)
+            self._sensitivityInverseHessian(dataPoint)
         else:
             self._inverseHessian = self.par.prior.derivative(x=None, order=2)
+            self._hessianFactor = None
+            self._hessianWeights = None
+            self._nHessianUpdates = 0
 
-        return self._inverseHessian
+
+    def _sensitivityInverseHessian(self, dataPoint):
+        """Factorize the Hessian formed from the sensitivity matrix attached to dataPoint and the parameter prior.
+
+        The Cholesky factor is used directly for the Newton step and the parameter proposal,
+        see _inverseHessianDot and stochasticNewtonPerturbation. The inverse Hessian is only formed on request.
+
+        Parameters
+        ----------
+        dataPoint : geobipy.DataPoint
+            Data point with a sensitivity matrix for this model.
+
+        """
+        # Scale the rows of J by the reciprocal data errors, rather than multiplying by a dense diagonal matrix
+        Wd = dataPoint.std[dataPoint.active]**-1.0
+        WdJ = dataPoint.J * Wd[:, None]
+        WdJTWdJ = np.dot(WdJ.T, WdJ)
+
+        # Propose new layer conductivities
+        # The Hessian is symmetric positive definite, so keep its Cholesky factor
+        hessian = WdJTWdJ + self.par.prior.derivative(x=None, order=2)
+        self._hessianFactor = cholesky(hessian, lower=True, check_finite=False)
+        self._inverseHessian = None
+        self._hessianWeights = Wd
+        self._nHessianUpdates = 0
 
 
-    def updateLocalParameterVariance(self, dataPoint=None):
+    def _inverseHessianDot(self, x):
+        """Multiply x by the inverse Hessian, using the Cholesky factor of the Hessian if there is one. """
+        if self._hessianFactor is None:
+            return np.dot(self._inverseHessian, x)
+        return cho_solve((self._hessianFactor, True), x, check_finite=False)
+
+
+    def updateLocalParameterVariance(self, dataPoint=None, maxUpdates=10):
         """Generate a localized Hessian matrix using
         a dataPoint and the current realization of the Model1D.
 
+        The inverse Hessian is recomputed after a birth or death, and kept after any other action.
+        A full recompute forward models the predicted data of dataPoint along with its sensitivity, so that
+        the Newton step uses the residual of this model rather than that of the model before the change.
+        If dataPoint only updates the columns of its sensitivity matrix for the changed layers, see dataPoint._incrementalSensitivity,
+        the inverse Hessian before the change is updated with low rank corrections instead.
+        This needs the inverse Hessian to have been computed with the current data errors.
+        The updated sensitivity matrix keeps the columns of the unchanged layers from before the change,
+        and the low rank updates give the inverse of its Hessian.
+        Otherwise, and after maxUpdates consecutive updates to bound the drift of those columns, the sensitivity
+        matrix and the inverse Hessian are recomputed in full for the current model.
 
         Parameters
         ----------
         dataPoint : geobipy.DataPoint, optional
             The data point to use when computing the local estimate of the variance.
+        maxUpdates : int, optional
+            Number of consecutive low rank updates before the inverse Hessian is recomputed in full.
+
+        """
+        # Compute a new parameter variance matrix if the structure of the model changed.
+
+        if (self._inverseHessian is None) and (self._hessianFactor is None):
+            self._localHessian(dataPoint, forward=True)
+
+        elif (self.action[0] in ['birth', 'death']):
+            nHessian = np.shape(self._inverseHessian if self._hessianFactor is None else self._hessianFactor)[0]
+            if (dataPoint is None) or (not dataPoint._incrementalSensitivity) or (np.shape(dataPoint.J)[1] != nHessian):
+                self._localHessian(dataPoint, forward=True)
+
+            elif (self._nHessianUpdates < maxUpdates) and np.array_equal(self._hessianWeights, dataPoint.std[dataPoint.active]**-1.0):
+                try:
+                    self._lowRankInverseHessian(dataPoint)
+                except np.linalg.LinAlgError:
+                    # The updated sensitivity matrix keeps the columns of the unchanged layers, so recompute it in full
+                    self._localHessian(dataPoint, forward=True)
+
+            else:
+                self._localHessian(dataPoint, forward=True)
+
+
+    def _lowRankInverseHessian(self, dataPoint):
+        """Update the inverse Hessian for the birth or death given by self.action.
+
+        A birth splits layer i into layers i and i+1, and a death merges layers i and i+1 into layer i.
+        The rows and columns of the removed layers are taken out of the inverse Hessian, and the
+        added layers are bordered back in using the Schur complement.
+        Only the sensitivities of the added layers are needed, so the cost is O(n^2) rather than O(n^3).
+
+        Parameters
+        ----------
+        dataPoint : geobipy.DataPoint
+            Data point whose sensitivity matrix and data errors match the inverse Hessian before the structural change.
+            Its sensitivity matrix is updated for the changed layers.
 
         Returns
         -------
         out : array_like
-            Hessian matrix
+            Inverse Hessian matrix
 
         """
-        # Compute a new parameter variance matrix if the structure of the model changed.
+        i = self.action[1]
+        Hi = self.inverseHessian
 
-        if (self.action[0] in ['birth', 'death']):
-            # Compute the sensitivity of the data to the perturbed model
-            # dataPoint.updateSensitivity(self)
-            # Wd = dataPoint.weightingMatrix(power=1.0)
-            # WdJ = np.dot(Wd, dataPoint.J)
-            # WdJTWdJ = np.dot(WdJ.T, WdJ)
+        if self.action[0] == 'birth':
+            removed, added = [i], [i, i+1]
+        else:
+            removed, added = [i, i+1], [i]
 
-            # # Propose new layer conductivities
-            # self._inverseHessian = np.linalg.inv(WdJTWdJ + self.par.prior.derivative(x=None, order=2))
-            self.localParameterVariance(dataPoint)
+        kept = np.setdiff1d(np.arange(Hi.shape[0]), removed)
+        newKept = np.setdiff1d(np.arange(self.nCells[0]), added)
 
-        else:  # There was no change in the model
+        # The unchanged layers keep their sensitivities from before the structural change,
+        # so that the bordered matrix is exactly the Hessian of the updated sensitivity matrix.
+        Wd = self._hessianWeights[:, None]
+        WdJK = dataPoint.J[:, kept] * Wd
 
-            if self.inverseHessian is None:
-                self.localParameterVariance(dataPoint)
+        # Sensitivity of the data to the new structure, only the changed layers are recomputed where possible
+        dataPoint.updateSensitivity(self)
+        WdJA = dataPoint.J[:, added] * Wd
+        prior = self.par.prior.derivative(x=None, order=2)
 
-        return self.inverseHessian
+        # Inverse of the Hessian without the removed layers
+        HiK = Hi[np.ix_(kept, kept)] - np.dot(Hi[np.ix_(kept, removed)], np.linalg.solve(Hi[np.ix_(removed, removed)], Hi[np.ix_(removed, kept)]))
+
+        # Border the added layers using the Schur complement of the new Hessian
+        B = np.dot(WdJK.T, WdJA) + prior[np.ix_(newKept, added)]
+        C = np.dot(WdJA.T, WdJA) + prior[np.ix_(added, added)]
+
+        HiKB = np.dot(HiK, B)
+        Si = cho_solve(cho_factor(C - np.dot(B.T, HiKB), lower=True), np.eye(len(added)))
+        X = np.dot(HiKB, Si)
+
+        out = np.empty((self.nCells[0], self.nCells[0]))
+        out[np.ix_(newKept, newKept)] = HiK + np.dot(X, HiKB.T)
+        out[np.ix_(newKept, added)] = -X
+        out[np.ix_(added, newKept)] = -X.T
+        out[np.ix_(added, added)] = Si
 
+        self._inverseHessian = out
+        self._hessianFactor = None
+        self._nHessianUpdates += 1
 
-    def insertLayer(self, z, par=None):
+        return self._inverseHessian
+
+
+    def insertLayer(self, z, par=None, out=None):
         """Insert a new layer into a model at a given depth
 
         Parameters
@@ -391,6 +595,9 @@ class Model1D(Model):
         par : numpy.float64, optional
             Value of the parameter for the new layer
             If None, The value of the split layer is duplicated.
+        out : geobipy.Model1D, optional
+            Buffered model, see Model1D.allocateBuffer, to write the result into.
+            If None, a new model is created.
 
         Returns
         -------
@@ -401,8 +608,25 @@ class Model1D(Model):
 
         # Deepcopy the 1D Model
         tmp = self.depth[:-1]
+        # Proposals pass the depth as a single element array
+        z = np.float64(z).item()
         # Get the index to insert the new layer
-        i = tmp.searchsorted(z)
+        i = int(tmp.searchsorted(z))
+
+        if not out is None:
+            out.copyFrom(self)
+            out._setCells(np.int(self.nCells) + 1)
+            out._nCells += 1
+            # Shift the cells below the new interface down by one
+            out._depth[i + 1:] = self.depth[i:]
+            out._depth[i] = z
+            out._par[i + 1:] = self.par[i:]
+            out._par[i] = self.par[i] if par is None else par
+            out.thicknessFromDepth()
+            out._magnetic_permeability[:] = 0.0
+            out._magnetic_susceptibility[:] = 0.0
+            out.action = ['birth', np.int(i), z]
+            return out
         # Deepcopy the 1D Model
         other = self.deepcopy()
         # Increase the number of cells
@@ -429,13 +653,16 @@ class Model1D(Model):
         return other
 
 
-    def deleteLayer(self, i):
+    def deleteLayer(self, i, out=None):
         """Remove a layer from the model
 
         Parameters
         ----------
         i : int
             The layer to remove.
+        out : geobipy.Model1D, optional
+            Buffered model, see Model1D.allocateBuffer, to write the result into.
+            If None, a new model is created.
 
         Returns
         -------
@@ -449,6 +676,20 @@ class Model1D(Model):
 
         assert i < np.int(self.nCells) - 1, ValueError("i must be less than the number of cells - 1{}".format(np.int(self.nCells)-1))
 
+        if not out is None:
+            out.copyFrom(self)
+            out._setCells(np.int(self.nCells) - 1)
+            out._nCells -= 1
+            # Shift the cells below the removed interface up by one
+            out._depth[i:] = self.depth[i + 1:]
+            out._par[i:] = self.par[i + 1:]
+            out._par[i] = 0.5 * (self.par[i] + self.par[i + 1])
+            out._magnetic_permeability[i:] = self.magnetic_permeability[i + 1:]
+            out._magnetic_susceptibility[i:] = self.magnetic_susceptibility[i + 1:]
+            out.thicknessFromDepth()
+            out.action = ['death', np.int(i), self.depth[i]]
+            return out
+
         # Deepcopy the 1D Model to ensure priors and proposals are passed
         other = self.deepcopy()
         # Decrease the number of cells
@@ -470,7 +711,7 @@ class Model1D(Model):
         return other
 
 
-    def perturbStructure(self):
+    def perturbStructure(self, out=None):
         """Perturb a model
 
         Generates a new model by perturbing the current model based on four probabilities.
@@ -487,6 +728,12 @@ class Model1D(Model):
         If the new layer thickness test fails, the birth or perturbation tries again. If the cycle fails after 10 tries, the entire process begins again
         such that a death, or no change is possible thus preventing any neverending cycles.
 
+        Parameters
+        ----------
+        out : geobipy.Model1D, optional
+            Buffered model, see Model1D.allocateBuffer, to write the perturbed model into.
+            If None, a new model is created.
+
         Returns
         -------
         out[0] : Model1D
@@ -526,7 +773,7 @@ class Model1D(Model):
 
             # Return if no change
             if (event == 3):
-                out = self.deepcopy()
+                out = self.deepcopy() if out is None else out.copyFrom(self)
                 out.action = ['none', 0, 0.0]
                 return out
 
@@ -551,7 +798,7 @@ class Model1D(Model):
                         newThicknessBiggerThanMinimum = True # just to exit.
                         tryAgain = True
                 if (not tryAgain):
-                    out = self.insertLayer(newDepth)
+                    out = self.insertLayer(newDepth, out=out)
                     # Update the dimensions of any priors.
                     out.par.prior.ndim = out.nCells
                     out.dpar.prior.ndim = np.maximum(1, out.nCells-1)
@@ -561,7 +808,7 @@ class Model1D(Model):
                 # Get the layer to remove
                 iDeleted = np.int64(prng.uniform(0, self.nCells - 1, 1)[0])
                 # Remove the layer and return
-                out = self.deleteLayer(iDeleted)
+                out = self.deleteLayer(iDeleted, out=out)
                 out.par.prior.ndim = out.nCells
                 out.dpar.prior.ndim = np.maximum(1, out.nCells-1)
                 return out
@@ -575,7 +822,7 @@ class Model1D(Model):
                     # Get the layer to perturb
                     i = np.int64(prng.uniform(0, k, 1)[0])
                     # Get the perturbation amount
-                    dz = np.sign(prng.randn()) * hmin * prng.uniform()
+                    dz = np.sign(prng.standard_normal()) * hmin * prng.uniform()
                     # Perturb the layer
                     z = z.prepend(0.0)
                     z[i + 1] += dz
@@ -590,7 +837,7 @@ class Model1D(Model):
                         newThicknessBiggerThanMinimum = True
                         tryAgain = True
                 if (not tryAgain):
-                    out = self.deepcopy()
+                    out = self.deepcopy() if out is None else out.copyFrom(self)
                     out.depth[i] += dz  # Perturb the depth in the model
                     out.thicknessFromDepth()
                     out.action = ['perturb', np.int(i), dz]
@@ -780,37 +1027,32 @@ class Model1D(Model):
         # else:
         # Compute the stochastic newton offset.
         # The negative sign because we want to move downhill
-        SN_step_from_perturbed = 0.5 * np.dot(self._inverseHessian, gradient)
+        SN_step_from_perturbed = 0.5 * self._inverseHessianDot(gradient)
 
-        prng = self.par.proposal.prng
+        # The proposal the perturbed parameters were drawn from, see stochasticNewtonPerturbation.
+        # Both log densities share its variance, so its cached factor is used for both.
+        forwardProposal = self.par.proposal
 
-        # Create a multivariate normal distribution centered on the shifted parameter values, and with variance computed from the forward step.
+        # Evaluate a multivariate normal distribution centered on the shifted parameter values, and with variance computed from the forward step.
         # We don't recompute the variance using the perturbed parameters, because we need to check that we could in fact step back from
         # our perturbed parameters to the unperturbed parameters. This is the crux of the reversible jump.
-        tmp = Distribution('MvLogNormal', np.exp(np.log(self.par) - SN_step_from_perturbed), self.inverseHessian, linearSpace=True, prng=prng)
         # Probability of jumping from our perturbed parameter values to the unperturbed values.
-        proposal = tmp.probability(x=remappedModel.par, log=True)  # CUR.prop
+        proposal = logProbability.mvLogNormal(remappedModel.par, np.log(self.par) - SN_step_from_perturbed, forwardProposal.factor, forwardProposal.logDeterminant, forwardProposal._diagonal, not forwardProposal._precision is None)  # CUR.prop
 
-        tmp = Distribution('MvLogNormal', remappedModel.par, self.inverseHessian, linearSpace=True, prng=prng)
-        proposal1 = tmp.probability(x=self.par, log=True)
+        # Probability of jumping from the unperturbed parameter values to the perturbed values, centred on the stochastic Newton step they were drawn with.
+        proposal1 = forwardProposal.probability(self.par, log=True)
 
         if self.action[0] == 'birth':
-            k = self.nCells - 1
+            k = self.nCells[0] - 1
 
-            forward = Distribution('Uniform', 0.0, self.remainingSpace(k))
-            reverse = Distribution('Uniform', 0.0, k)
-
-            proposal  += reverse.probability(1, log=True)
-            proposal1 += forward.probability(0.0, log=True)
+            proposal  += logProbability.uniform(1, 0.0, k)
+            proposal1 += logProbability.uniform(0.0, 0.0, self.remainingSpace(k))
 
         if self.action[0] == 'death':
-            k = self.nCells
-
-            forward = Distribution('Uniform', 0.0, self.remainingSpace(k))
-            reverse = Distribution('Uniform', 0.0, k)
+            k = self.nCells[0]
 
-            proposal  += forward.probability(0.0, log=True)
-            proposal1 += reverse.probability(1, log=True)
+            proposal  += logProbability.uniform(0.0, 0.0, self.remainingSpace(k))
+            proposal1 += logProbability.uniform(1, 0.0, k)
 
         return proposal, proposal1
 
@@ -841,7 +1083,7 @@ class Model1D(Model):
     #     return Pforward, Preverse
 
 
-    def perturb(self, datapoint=None):
+    def perturb(self, datapoint=None, out=None):
         """Perturb a model's structure and parameter values.
 
         Uses a stochastic newtown approach if a datapoint is provided.
@@ -852,6 +1094,9 @@ class Model1D(Model):
         ----------
         dataPoint : geobipy.DataPoint, optional
             The datapoint to use to perturb using a stochastic Newton approach.
+        out : sequence of two geobipy.Model1D, optional
+            Buffered models, see Model1D.allocateBuffer, to write the remapped and perturbed models into.
+            If None, new models are created.
 
         Returns
         -------
@@ -861,7 +1106,7 @@ class Model1D(Model):
             The model with perturbed structure and parameter values.
 
         """
-        return self.stochasticNewtonPerturbation(datapoint)
+        return self.stochasticNewtonPerturbation(datapoint, out)
 
 
     def squeeze(self, thickness, parameters, hasHalfspace=False):
@@ -876,13 +1121,13 @@ class Model1D(Model):
 
 
 
-    def stochasticNewtonPerturbation(self, datapoint=None):
+    def stochasticNewtonPerturbation(self, datapoint=None, out=None):
 
         # Perturb the structure of the model
-        remappedModel = self.perturbStructure()
+        remappedModel = self.perturbStructure(out = None if out is None else out[0])
 
         # Update the local Hessian around the current model.
-        inverseHessian = remappedModel.updateLocalParameterVariance(datapoint)
+        remappedModel.updateLocalParameterVariance(datapoint)
 
         ### Proposing new parameter values
         # Compute the gradient of the "deterministic" objective function using the unperturbed, remapped, parameter values.
@@ -897,15 +1142,16 @@ class Model1D(Model):
         # if (not burnedIn):
         #     SN_step_from_unperturbed = 0.0
         # else:
-        SN_step_from_unperturbed = 0.5 * np.dot(inverseHessian, gradient)
+        SN_step_from_unperturbed = 0.5 * remappedModel._inverseHessianDot(gradient)
 
         mean = np.log(remappedModel.par) - SN_step_from_unperturbed
         # variance = Mod1.inverseHessian
 
-        perturbedModel = remappedModel.deepcopy()
+        perturbedModel = remappedModel.deepcopy() if out is None else out[1].copyFrom(remappedModel)
 
         # Assign a proposal distribution for the parameter using the mean and variance.
-        perturbedModel.par.setProposal('MvLogNormal', np.exp(mean), inverseHessian, linearSpace=True, prng=perturbedModel.par.proposal.prng)
+        # The proposal samples using the factor of the Hessian directly if there is one.
+        perturbedModel.par.setProposal('MvLogNormal', np.exp(mean), remappedModel._inverseHessian, linearSpace=True, prng=perturbedModel.par.proposal.prng, precisionFactor=remappedModel._hessianFactor)
 
         # Generate new conductivities
         perturbedModel.par.perturb()
@@ -1080,9 +1326,8 @@ class Model1D(Model):
         assert (self.dpar.hasPrior), TypeError('No prior defined on parameter gradient. Use Model1D.dpar.addPrior() to set the prior.')
 
         if np.int(self.nCells) == 1:
-            tmp = self.insertLayer(np.log(self.minDepth) + (0.5 * (self.maxDepth - self.minDepth)))
-            tmp.dpar[:] = (np.diff(np.log(tmp.par))) / (np.log(tmp.thk[:-1]) - np.log(self.minThickness))
-            probability = tmp.dpar.probability(log=log)
+            # Splitting a halfspace gives two layers with the same parameter, so the gradient is zero.
+            probability = self.dpar.probability(x=np.zeros(1), log=log)
 
         else:
             self.dpar[:] = (np.diff(np.log(self.par))) / (np.log(self.thk[:-1]) - np.log(self.minThickness))
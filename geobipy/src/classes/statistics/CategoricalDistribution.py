@@ -98,7 +98,7 @@ class Categorical(baseDistribution):
             Event index, 0 to nEvents - 1
 
         """
-        r = self.prng.rand(size)
+        r = self.prng.random(size)
         return np.searchsorted(self._probabilityMassFunction, r)
 
 
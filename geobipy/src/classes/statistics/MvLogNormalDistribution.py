@@ -15,7 +15,7 @@ class MvLogNormal(MvNormal):
     Handles a multivariate lognormal distribution.  Uses Scipy to evaluate probabilities, 
     but Numpy to generate random samples since scipy is slow.
 
-    MvLogNormal(mean, variance, ndim, linearSpace, prng)
+    MvLogNormal(mean, variance, ndim, linearSpace, prng, precisionFactor)
 
     Parameters
     ----------
@@ -32,6 +32,9 @@ class MvLogNormal(MvNormal):
             Inputs are internally logged, and the exponential of any output is returned
     prng : numpy.random.RandomState, optional
         A random state to generate random numbers. Required for parallel instantiation.
+    precisionFactor : array_like, optional
+        Lower Cholesky factor of the inverse of the variance of the logged values, see MvNormal.
+        If given, variance is ignored.
         
     Returns
     -------
@@ -40,12 +43,12 @@ class MvLogNormal(MvNormal):
 
     """
 
-    def __init__(self, mean, variance, ndim=None, linearSpace=False, prng=None):
+    def __init__(self, mean, variance, ndim=None, linearSpace=False, prng=None, precisionFactor=None):
         """ Initialize a multivariate lognormal distribution. """
 
         if linearSpace:
             mean = np.log(mean)
-        super().__init__(mean, variance, ndim, prng=prng)
+        super().__init__(mean, variance, ndim, prng=prng, precisionFactor=precisionFactor)
         self.linearSpace = linearSpace
         
     
@@ -61,10 +64,15 @@ class MvLogNormal(MvNormal):
 
     def deepcopy(self):
         """ Define a deepcopy routine """
+        # Copy the logged mean directly so that repeated copies do not accumulate exp/log round off.
         if self._constant:
-            return MvLogNormal(mean=self.mean[0], variance=self.variance[0, 0], ndim=self.ndim, linearSpace=self.linearSpace, prng=self.prng)
+            out = MvLogNormal(mean=self._mean[0], variance=self._variance[0], ndim=self.ndim, prng=self.prng)
+        elif not self._precision is None:
+            out = MvLogNormal(mean=self._mean, variance=None, prng=self.prng, precisionFactor=self._precision)
         else:
-            return MvLogNormal(mean=self.mean, variance=self.variance, linearSpace=self.linearSpace, prng=self.prng)
+            out = MvLogNormal(mean=self._mean, variance=self._variance, prng=self.prng)
+        out.linearSpace = self.linearSpace
+        return out
 
 
     def derivative(self, x, order):
@@ -73,6 +81,8 @@ class MvLogNormal(MvNormal):
         if order == 1:
             if self.linearSpace:
                 x = np.log(x)
+            if self._diagonal:
+                return (x - self._mean) / self._variance
             return cf.Ax(self.inverseVariance, x - self._mean)
         elif order == 2:
             return self.inverseVariance
@@ -8,6 +8,8 @@ from .baseDistribution import baseDistribution
 from .NormalDistribution import Normal
 from ..core import StatArray
 from scipy.stats import multivariate_normal
+from scipy.linalg import solve_triangular
+from . import logProbability
 
 
 class MvNormal(baseDistribution):
@@ -16,7 +18,14 @@ class MvNormal(baseDistribution):
     Handles a multivariate normal distribution.  Uses Scipy to evaluate probabilities,
     but Numpy to generate random samples since scipy is slow.
 
-    MvNormal(mean, variance, ndim, prng)
+    The Cholesky factor and log-determinant of the variance are cached for evaluating log probabilities.
+    Change the variance by assigning to self.variance so that the cache is reset.
+    A diagonal variance is stored as a vector, and the dense matrix is only formed if self.variance is asked for.
+
+    The distribution can instead be given the Cholesky factor of the inverse of the variance, e.g. of a Hessian.
+    Samples and log probabilities then use that factor directly, and the variance is only formed if it is asked for.
+
+    MvNormal(mean, variance, ndim, prng, precisionFactor)
 
     Parameters
     ----------
@@ -29,6 +38,9 @@ class MvNormal(baseDistribution):
         Only used if mean and variance are scalars that are constant for all dimensions
     prng : numpy.random.RandomState, optional
         A random state to generate random numbers. Required for parallel instantiation.
+    precisionFactor : array_like, optional
+        Lower Cholesky factor of the inverse of the variance, with zeros above the diagonal.
+        If given, variance is ignored.
 
     Returns
     -------
@@ -37,7 +49,7 @@ class MvNormal(baseDistribution):
 
     """
 
-    def __init__(self, mean, variance, ndim=None, prng=None):
+    def __init__(self, mean, variance, ndim=None, prng=None, precisionFactor=None):
         """ Initialize a normal distribution
         mu:     :Mean of the distribution
         sigma:  :Standard deviation of the distribution
@@ -48,22 +60,33 @@ class MvNormal(baseDistribution):
 
         baseDistribution.__init__(self, prng)
 
-        if ndim is None:
+        if not precisionFactor is None:
+            self._mean = np.copy(mean)
+            assert np.all(np.equal(np.shape(precisionFactor), np.size(mean))), ValueError('Precision factor must have same dimensions as the mean')
+            # Formed from the factor on request
+            self._variance = None
+            self._diagonal = False
+            self._constant = False
+
+        elif ndim is None:
             self._mean = np.copy(mean)
 
             # Variance
             ndim = np.ndim(variance)
             if ndim == 0:
-                self._variance = np.diag(np.full(np.size(mean), fill_value=variance))
+                self._variance = np.full(np.size(mean), fill_value=variance)
 
             elif ndim == 1:
                 assert np.size(variance) == np.size(mean), Exception('Mismatch in size of mean and variance')
-                self._variance = np.diag(variance)
+                self._variance = np.array(variance)
 
             elif ndim == 2:
                 assert np.all(np.equal(variance.shape,  np.size(mean))), ValueError('Covariance must have same dimensions as the mean')
                 self._variance = np.asarray(variance)
+                if cf.isDiagonal(self._variance):
+                    self._variance = np.diagonal(self._variance).copy()
 
+            self._diagonal = self._variance.ndim == 1
             self._constant = False
 
         else:
@@ -74,7 +97,11 @@ class MvNormal(baseDistribution):
             ndim = np.int(np.maximum(1, ndim))
             self._constant = True
             self._mean = np.full(ndim, fill_value=mean)
-            self._variance = np.diag(np.full(ndim, fill_value=variance))
+            self._variance = np.full(ndim, fill_value=variance)
+            self._diagonal = True
+
+        self._resetFactor()
+        self._precision = precisionFactor
 
 
     @property
@@ -105,13 +132,11 @@ class MvNormal(baseDistribution):
         else:
             mean = self._mean[0]
 
-        # if np.ndim(self.variance) == 0:
-        #     variance = self.variance
-        # else:
-        variance = self.variance[0, 0]
+        variance = self._variance[0]
 
         self._mean = np.full(newDimension, fill_value=mean)
-        self._variance = np.diag(np.full(newDimension, fill_value=variance))
+        self._variance = np.full(newDimension, fill_value=variance)
+        self._resetFactor()
 
 
     @property
@@ -120,19 +145,104 @@ class MvNormal(baseDistribution):
 
     @property
     def variance(self):
+        if self._diagonal:
+            if self._denseVariance is None:
+                self._denseVariance = np.diag(self._variance)
+            return self._denseVariance
+        if self._variance is None:
+            self._variance = cf.choInv(self._precision)
         return self._variance
 
+    @variance.setter
+    def variance(self, values):
+        """Set the variance and reset the cached factorization.
+
+        A scalar or vector sets a diagonal variance. The variance is copied so that it is never modified through the given array.
+
+        """
+        values = np.asarray(values)
+        if values.ndim < 2:
+            self._variance = np.array(np.broadcast_to(values, self.ndim), dtype=np.float64)
+        else:
+            assert np.all(np.equal(values.shape, self.ndim)), ValueError('Covariance must have same dimensions as the mean')
+            self._variance = np.diagonal(values).copy() if cf.isDiagonal(values) else np.array(values)
+        self._diagonal = self._variance.ndim == 1
+        self._precision = None
+        self._resetFactor()
+
+    def copyVariance(self, other):
+        """Share the variance of another distribution along with its cached factorization.
+
+        Avoids the diagonal check and the factorization of the variance setter.
+
+        Parameters
+        ----------
+        other : geobipy.MvNormal
+            Distribution with the same number of dimensions.
+
+        """
+        if (self._variance is other._variance) and (self._precision is other._precision):
+            return
+        # The variance and its cached factorization are always replaced, never modified in place, so they can be shared.
+        self._variance = other._variance
+        self._precision = other._precision
+        self._diagonal = other._diagonal
+        self._cholesky = other._cholesky
+        self._logDeterminant = other._logDeterminant
+        self._inverseVariance = other._inverseVariance
+        self._denseVariance = other._denseVariance
+
+
     @property
     def inverseVariance(self):
-        return np.linalg.inv(self.variance)
+        if self._inverseVariance is None:
+            if not self._precision is None:
+                self._inverseVariance = np.dot(self._precision, self._precision.T)
+            elif self._diagonal:
+                self._inverseVariance = np.diag(1.0 / self._variance)
+            else:
+                self._inverseVariance = np.linalg.inv(self._variance)
+        return self._inverseVariance
+
+    @property
+    def factor(self):
+        """Factor of the variance, see logProbability.factorize."""
+        if self._cholesky is None:
+            self._factorize()
+        return self._cholesky
+
+    @property
+    def logDeterminant(self):
+        """Log-determinant of the variance."""
+        if self._logDeterminant is None:
+            self._factorize()
+        return self._logDeterminant
+
+
+    def _resetFactor(self):
+        """Forget the cached factorization, inverse, and dense diagonal of the variance."""
+        self._logDeterminant = None
+        self._cholesky = None
+        self._inverseVariance = None
+        self._denseVariance = None
+
+
+    def _factorize(self):
+        """Cache the Cholesky factor and log-determinant of the variance."""
+        if not self._precision is None:
+            self._cholesky, self._logDeterminant = logProbability.factorizePrecision(self._precision)
+        else:
+            self._cholesky, self._logDeterminant = logProbability.factorize(self._variance, self._diagonal)
 
 
     def deepcopy(self):
         """ Define a deepcopy routine """
         if self._constant:
-            return MvNormal(mean=self.mean[0], variance=self.variance[0, 0], ndim=self.ndim, prng=self.prng)
+            return MvNormal(mean=self.mean[0], variance=self._variance[0], ndim=self.ndim, prng=self.prng)
+        elif not self._precision is None:
+            return MvNormal(mean=self.mean, variance=None, prng=self.prng, precisionFactor=self._precision)
         else:
-            return MvNormal(mean=self.mean, variance=self.variance, prng=self.prng)
+            return MvNormal(mean=self.mean, variance=self._variance, prng=self.prng)
 
 
     # def derivative(self, x, order):
@@ -146,6 +256,10 @@ class MvNormal(baseDistribution):
 
     def rng(self, size = 1):
         """  """
+        if not self._precision is None:
+            # x = mean + L^-T z has the covariance (L L^T)^-1
+            z = self.prng.standard_normal((size, self.ndim))
+            return np.atleast_1d(np.squeeze(self._mean + solve_triangular(self._precision, z.T, lower=True, trans='T', check_finite=False).T))
         return np.atleast_1d(np.squeeze(self.prng.multivariate_normal(self._mean, self.variance, size)))
 
 
@@ -166,15 +280,8 @@ class MvNormal(baseDistribution):
             if (nD == 1):
                 mean = np.repeat(self._mean, N)
 
-            dv = 0.5 * np.prod(np.linalg.slogdet(self.variance))
-            # subtract the mean from the samples
-            xMu = x - mean
-            # Start computing the exponent term
-            # e^(-0.5*(x-mu)'*inv(cov)*(x-mu))                        (1)
-            # Compute the multiplication on the right of equation 1
-            tmp = 0.5 * np.dot(xMu, np.dot(self.inverseVariance, xMu))
-            # Probability Density Function
-            return -(0.5 * N) * np.log(2.0 * np.pi) - dv - tmp
+            # Probability Density Function using the cached factor of the variance
+            return logProbability.mvNormal(x, mean, self.factor, self.logDeterminant, self._diagonal, not self._precision is None)
 
 
         else:
@@ -71,7 +71,9 @@ class Normal(baseDistribution):
 
         """
         # return deepcopy(self)
-        return Normal(self.mean, self.variance, self.log, self.prng)
+        out = Normal(self._mean, self.variance, prng=self.prng)
+        out.log = self.log
+        return out
 
 
     def derivative(self, x, moment):
@@ -6,6 +6,7 @@ from .baseDistribution import baseDistribution
 from ...base import customPlots as cP
 import numpy as np
 from scipy.stats import uniform
+from . import logProbability
 from ..core import StatArray
 
 
@@ -63,7 +64,10 @@ class Uniform(baseDistribution):
 
     def deepcopy(self):
         """ Define a deepcopy routine """
-        return Uniform(self.min, self.max, self.log, self.prng)
+        # Copy the logged bounds directly so that repeated copies do not accumulate exp/log round off.
+        out = Uniform(self._min, self._max, prng=self.prng)
+        out.log = self.log
+        return out
 
 
     def cdf(self, x, log=False):
@@ -88,7 +92,7 @@ class Uniform(baseDistribution):
             x = np.log(x)
 
         if log:
-            out = np.squeeze(uniform.logpdf(x, self._min, self.scale))
+            out = np.squeeze(logProbability.uniform(x, self._min, self._max))
             return np.sum(out) if self.multivariate else out
         else:
             out = np.squeeze(uniform.pdf(x, self._min, self.scale))
@@ -0,0 +1,140 @@
+""" @logProbability
+Module of log probability density functions that operate on raw arrays.
+
+The distribution classes call these kernels, and the inner loop of the Markov chain can call them
+directly without instantiating a distribution for a single evaluation.
+"""
+import numpy as np
+from scipy.linalg import cho_factor, solve_triangular
+
+
+def factorize(variance, diagonal=False):
+    """Factor a covariance matrix for use with mvNormal and mvLogNormal.
+
+    Parameters
+    ----------
+    variance : array_like
+        Symmetric positive definite covariance matrix, or its diagonal if diagonal is True.
+    diagonal : bool, optional
+        Whether the covariance is diagonal.
+
+    Returns
+    -------
+    factor : ndarray
+        Lower Cholesky factor of the covariance, or the reciprocal of its diagonal if diagonal is True.
+    logDeterminant : float
+        Natural log of the determinant of the covariance.
+
+    """
+    if diagonal:
+        d = variance if np.ndim(variance) == 1 else np.diagonal(variance)
+        return 1.0 / d, np.sum(np.log(d))
+
+    factor, _ = cho_factor(variance, lower=True)
+    return factor, 2.0 * np.sum(np.log(np.diagonal(factor)))
+
+
+def factorizePrecision(factor):
+    """Log-determinant of a covariance given the Cholesky factor of its inverse, for use with mvNormal and mvLogNormal.
+
+    Parameters
+    ----------
+    factor : ndarray
+        Lower Cholesky factor of the inverse of the covariance, with zeros above the diagonal.
+
+    Returns
+    -------
+    factor : ndarray
+        The given factor.
+    logDeterminant : float
+        Natural log of the determinant of the covariance.
+
+    """
+    return factor, -2.0 * np.sum(np.log(np.diagonal(factor)))
+
+
+def mvNormal(x, mean, factor, logDeterminant, diagonal=False, precision=False):
+    """Log probability density of a multivariate normal distribution.
+
+    Parameters
+    ----------
+    x : array_like
+        Sample.
+    mean : array_like
+        Mean of the distribution.
+    factor : ndarray
+        Factor of the covariance from factorize.
+    logDeterminant : float
+        Natural log of the determinant of the covariance from factorize.
+    diagonal : bool, optional
+        Whether factor is from a diagonal covariance.
+    precision : bool, optional
+        Whether factor is the Cholesky factor of the inverse of the covariance, see factorizePrecision.
+
+    Returns
+    -------
+    out : float
+        Log probability density.
+
+    """
+    xMu = x - mean
+    if diagonal:
+        tmp = np.dot(xMu * factor, xMu)
+    elif precision:
+        z = np.dot(xMu, factor)
+        tmp = np.dot(z, z)
+    else:
+        z = solve_triangular(factor, xMu, lower=True, check_finite=False)
+        tmp = np.dot(z, z)
+
+    return -0.5 * (np.size(xMu) * np.log(2.0 * np.pi) + logDeterminant + tmp)
+
+
+def mvLogNormal(x, mean, factor, logDeterminant, diagonal=False, precision=False):
+    """Log probability density of the logged values of a multivariate lognormal distribution.
+
+    Matches geobipy.MvLogNormal.probability with linearSpace=True.
+
+    Parameters
+    ----------
+    x : array_like
+        Sample in linear space.
+    mean : array_like
+        Mean of the logged values.
+    factor : ndarray
+        Factor of the covariance of the logged values from factorize.
+    logDeterminant : float
+        Natural log of the determinant of the covariance from factorize.
+    diagonal : bool, optional
+        Whether factor is from a diagonal covariance.
+    precision : bool, optional
+        Whether factor is the Cholesky factor of the inverse of the covariance, see factorizePrecision.
+
+    Returns
+    -------
+    out : float
+        Log probability density.
+
+    """
+    return mvNormal(np.log(x), mean, factor, logDeterminant, diagonal, precision)
+
+
+def uniform(x, min, max):
+    """Log probability density of a uniform distribution.
+
+    Parameters
+    ----------
+    x : scalar or array_like
+        Samples.
+    min : scalar or array_like
+        Lower bound of the distribution.
+    max : scalar or array_like
+        Upper bound of the distribution.
+
+    Returns
+    -------
+    out : scalar or ndarray
+        Log probability density of each sample, -inf outside of [min, max].
+
+    """
+    return np.where((x >= min) & (x <= max), -np.log(max - min), -np.inf)
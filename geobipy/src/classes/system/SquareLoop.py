@@ -1,7 +1,7 @@
 from copy import deepcopy
 import numpy as np
 from ...base import MPI as myMPI
-from ...base.HDF.hdfWrite import write_nd
+from ...base.HDF.hdfWrite import write_nd, repeated_storage
 from .EmLoop import EmLoop
 
 class SquareLoop(EmLoop):
@@ -130,10 +130,10 @@ class SquareLoop(EmLoop):
         grp.attrs["repr"] = self.hdfName()
 
         if (not nRepeats is None):
-            grp.create_dataset('orientation', [nRepeats],    dtype="S1")
-            grp.create_dataset('moment',      [nRepeats],    dtype=np.int32,   fillvalue=fillvalue)
-            grp.create_dataset('data',        [nRepeats, 6], dtype=np.float64, fillvalue=fillvalue)
-            grp.create_dataset('sideLength',      [nRepeats],    dtype=np.float64, fillvalue=fillvalue)
+            grp.create_dataset('orientation', [nRepeats],    dtype="S1", **repeated_storage(grp, [], "S1", nRepeats))
+            grp.create_dataset('moment',      [nRepeats],    dtype=np.int32,   fillvalue=fillvalue, **repeated_storage(grp, [], np.int32, nRepeats))
+            grp.create_dataset('data',        [nRepeats, 6], dtype=np.float64, fillvalue=fillvalue, **repeated_storage(grp, 6, np.float64, nRepeats))
+            grp.create_dataset('sideLength',      [nRepeats],    dtype=np.float64, fillvalue=fillvalue, **repeated_storage(grp, [], np.float64, nRepeats))
         else:
             grp.create_dataset('orientation', [1], dtype="S1")
             grp.create_dataset('moment',      [1], dtype=np.int32,   fillvalue=fillvalue)
@@ -1,4 +1,6 @@
 import os
+import json
+import hashlib
 import numpy as np
 import numpy.ma as ma
 import h5py
@@ -153,12 +155,32 @@ class Inference2D(myObject):
 
 
     def compute_posterior_opacity(self, posterior, percent=95.0, log=None):
-        opacity = StatArray.StatArray(np.zeros(self.nPoints))
+        """Opacity of each data point from the credible range of a posterior histogram, see Histogram1D.credibleRange.
 
-        for i in range(self.nPoints):
-            h = Histogram1D(bins = self.additiveErrorPosteriors._cellEdges + self.additiveErrorPosteriors.relativeTo[i])
-            h._counts[:] = self.additiveErrorPosteriors.counts[i, :]
-            opacity[i] = h.credibleRange(percent, log)
+        The credible intervals of every data point are found at once from the cumulative sums of the counts.
+
+        """
+        counts = np.asarray(posterior.counts)
+        p = 0.01 * percent
+
+        # Bins are relative to each data point, the intervals are taken at the internal edges.
+        x = posterior._cellEdges[1:-1] + np.reshape(posterior.relativeTo, (-1, 1))
+
+        cs = np.cumsum(counts, axis=-1)
+        cs = cs / cs[:, -1:]
+
+        # Equivalent to searchsorted on the cumulative sums of every data point
+        ix1 = np.minimum(np.sum(cs < (1.0 - p), axis=-1), x.shape[-1] - 1)
+        ix2 = np.minimum(np.sum(cs < p, axis=-1), x.shape[-1] - 1)
+
+        low = np.take_along_axis(x, ix1[:, None], axis=-1)[:, 0]
+        high = np.take_along_axis(x, ix2[:, None], axis=-1)[:, 0]
+
+        if (not log is None):
+            low, dum = cF._log(low, log=log)
+            high, dum = cF._log(high, log=log)
+
+        opacity = StatArray.StatArray(high - low)
 
         opacity = opacity.normalize()
         return 1.0 - opacity
@@ -198,70 +220,250 @@ class Inference2D(myObject):
 
     @cached_property
     def credibleLower(self):
-        # Read in the opacity if present
-        if "credible_lower" in self.hdfFile.keys():
-            return StatArray.StatArray().fromHdf(self.hdfFile['credible_lower'])
-        else:
-            cl, _ = self.computeCredibleInterval(log=10)
-            return cl
+        # Read from the line file if up to date
+        cl, _ = self.computeCredibleInterval(log=10)
+        return cl
 
 
     @cached_property
     def credibleUpper(self):
-        # Read in the opacity if present
-        if "credible_upper" in self.hdfFile.keys():
-            return StatArray.StatArray().fromHdf(self.hdfFile['credible_upper'])
-        else:
-            _, cu = self.computeCredibleInterval(log=10)
-            return cu
+        # Read from the line file if up to date
+        _, cu = self.computeCredibleInterval(log=10)
+        return cu
 
 
-    def computeCredibleInterval(self, percent=95.0, log=None, progress=False):
+    def computeCredibleInterval(self, percent=95.0, log=None, progress=False, chunkSize=256):
+        """Compute the credible intervals of the parameter posterior at every depth of every data point, see Hitmap2D.credibleIntervals.
 
-        s = 'percent={}'.format(percent)
+        See computeStatistics.
 
-        credibleLower = StatArray.StatArray(np.zeros(self.mesh.shape), '{}% Credible Interval'.format(100.0 - percent), self.parameterUnits)
-        credibleUpper = StatArray.StatArray(np.zeros(self.mesh.shape), '{}% Credible Interval'.format(percent), self.parameterUnits)
+        """
+        self.computeStatistics(['credible'], percent=percent, log=log, chunkSize=chunkSize)
+
+        credibleLower = StatArray.StatArray(np.asarray(self.hdfFile['credible_lower/data']), '{}% Credible Interval'.format(100.0 - percent), self.parameterUnits)
+        credibleUpper = StatArray.StatArray(np.asarray(self.hdfFile['credible_upper/data']), '{}% Credible Interval'.format(percent), self.parameterUnits)
 
+        return credibleLower, credibleUpper
+
+
+    def _parameterPosteriors(self, chunkSize=256):
+        """Generator over the parameter posteriors of chunks of consecutive data points.
+
+        Yields
+        ------
+        i : slice
+            Indices of the data points in the chunk.
+        counts : ndarray
+            Counts of the posteriors with shape (chunk, nz, nx).
+        x : ndarray
+            Parameter bin centres of each posterior with shape (chunk, nx).
+
+        """
         loc = 'currentmodel/par/posterior'
-        a = np.asarray(self.hdfFile[loc+'/arr/data'])
-        try:
-            b = np.asarray(self.hdfFile[loc+'/x/data'])
-        except:
-            b = np.asarray(self.hdfFile[loc+'/x/x/data'])
+        counts = self.hdfFile[loc+'/arr/data']
+        x = self.hdfFile[loc+'/x/data'] if 'data' in self.hdfFile[loc+'/x'] else self.hdfFile[loc+'/x/x/data']
 
-        try:
-            c = np.asarray(self.hdfFile[loc+'/y/data'])
-        except:
-            c = np.asarray(self.hdfFile[loc+'/y/x/data'])
-
-        h = Hitmap2D(xBinCentres = StatArray.StatArray(b[0, :]), yBinCentres = StatArray.StatArray(c[0, :]))
-        h._counts[:, :] = a[0, :, :]
-        m, l, u = h.credibleIntervals(percent=percent, log=log)
-        credibleLower[:, 0] = l
-        credibleUpper[:, 0] = u
-
-        print('Computing {}% Credible Intervals'.format(percent), flush=True)
-        for i in progressbar.progressbar(range(1, self.nPoints)):
-            h.x.xBinCentres = b[i, :]
-            h._counts[:, :] = a[i, :, :]
-            m, l, u = h.credibleIntervals(percent=percent, log=log)
-            credibleLower[:, i] = l
-            credibleUpper[:, i] = u
-
-        key = 'credible_lower'
-        if key in self.hdfFile.keys():
-            credibleLower.writeHdf(self.hdfFile, key)
-        else:
-            credibleLower.toHdf(self.hdfFile, key)
+        for j in progressbar.progressbar(range(0, self.nPoints, chunkSize)):
+            i = np.s_[j:j+chunkSize]
+            yield i, np.asarray(counts[i]), np.asarray(x[i])
 
-        key = 'credible_upper'
+
+    def _createProduct(self, key, shape, name=None, units=None):
+        """Get the dataset of a derived product in the line file so that it can be written a chunk of data points at a time.
+
+        The product is stored in the same layout as StatArray.toHdf and can be read with StatArray.fromHdf.
+
+        """
         if key in self.hdfFile.keys():
-            credibleUpper.writeHdf(self.hdfFile, key)
-        else:
-            credibleUpper.toHdf(self.hdfFile, key)
+            if self.hdfFile[key+'/data'].shape == shape:
+                # No longer valid until it is completely rewritten
+                self.hdfFile[key].attrs.pop('source', None)
+                return self.hdfFile[key+'/data']
+            del self.hdfFile[key]
 
-        return credibleLower, credibleUpper
+        grp = self.hdfFile.create_group(key)
+        grp.attrs['repr'] = StatArray.StatArray(1, name, units).hdfName().replace(str((1,)), str(shape), 1)
+        return grp.create_dataset('data', shape, dtype=np.float64)
+
+
+    @property
+    def _sourceVersion(self):
+        """Fingerprint of the posteriors in the line file.
+
+        The inversion time of a data point is written along with its posteriors, so any new results change the fingerprint.
+
+        """
+        return hashlib.sha1(np.asarray(self.hdfFile['invtime'][:]).tobytes()).hexdigest()
+
+
+    def _isCached(self, key, source, **parameters):
+        """Whether the derived product key in the line file was computed with these parameters from the current posteriors. """
+        if not key in self.hdfFile.keys():
+            return False
+        attrs = self.hdfFile[key].attrs
+        return (attrs.get('source') == source) and (attrs.get('parameters') == json.dumps(parameters, sort_keys=True))
+
+
+    def _setCached(self, key, source, **parameters):
+        """Record the parameters and posteriors that the derived product key in the line file was computed with. """
+        attrs = self.hdfFile[key].attrs
+        attrs['parameters'] = json.dumps(parameters, sort_keys=True)
+        attrs['source'] = source
+
+
+    def computeStatistics(self, statistics=('mean', 'mode', 'credible', 'opacity', 'doi'), percent=95.0, log=10, value=None, depth=None, depth2=None, doiPercent=67.0, chunkSize=256):
+        """Compute statistics of the parameter posteriors of every data point in a single pass over the line.
+
+        The posteriors are read from the line file a chunk of data points at a time and each statistic is written
+        back to the file as each chunk is finished, so the memory used does not grow with the length of the line.
+
+        Each product is stored with the parameters it was computed with and a fingerprint of the posteriors.
+        Products that are up to date are not computed again, and are recomputed once new results are written to the line.
+
+        Parameters
+        ----------
+        statistics : sequence of str, optional
+            Any of
+
+            * 'mean' : Mean parameter at every depth, see Histogram2D.mean. Written to 'mean_parameter'.
+            * 'mode' : Mode parameter at every depth, see Hitmap2D.mode. Written to 'mode_parameter'.
+            * 'credible' : Credible intervals at every depth. Written to 'credible_lower' and 'credible_upper'.
+            * 'opacity' : One minus the credible range normalized over depth. Written to 'opacity'.
+            * 'doi' : Depth of investigation from the opacity, see computeDOI. Written to 'doi'.
+            * 'percentage' : Probability that the parameter is greater than value, see percentageParameter. Written to 'percentage_parameter'.
+        percent : float, optional
+            Percent of the credible intervals.
+        log : 'e' or float, optional
+            Take the log of the credible intervals, and so their range for the opacity, to this base.
+        value : float, optional
+            Parameter value for 'percentage'.
+        depth : float, optional
+            Only use depths from depth for 'percentage'.
+        depth2 : float, optional
+            Only use depths from depth to depth2 for 'percentage'.
+        doiPercent : float or array_like of floats, optional
+            Opacity cutoffs in percent for 'doi', see computeDOI.
+        chunkSize : int, optional
+            Number of data points read at a time.
+
+        """
+
+        statistics = set(statistics)
+        allowed = {'mean', 'mode', 'credible', 'opacity', 'doi', 'percentage'}
+        assert statistics <= allowed, ValueError("statistics must be in {}".format(sorted(allowed)))
+        doiPercents = np.atleast_1d(np.asarray(doiPercent, dtype=np.float64))
+        assert np.all((0.0 < doiPercents) & (doiPercents < 100.0)), ValueError("Must have 0.0 < doiPercent < 100.0")
+
+        percent = np.float64(percent)
+
+        keys = {'mean' : ['mean_parameter'],
+                'mode' : ['mode_parameter'],
+                'credible' : ['credible_lower', 'credible_upper'],
+                'opacity' : ['opacity'],
+                'doi' : ['doi'],
+                'percentage' : ['percentage_parameter']}
+        parameters = {'mean' : {},
+                      'mode' : {},
+                      'credible' : {'percent' : percent, 'log' : log},
+                      'opacity' : {'percent' : percent, 'log' : log},
+                      'doi' : {'percent' : percent, 'log' : log, 'doiPercent' : np.asarray(doiPercent, dtype=np.float64).tolist(), 'window' : 1},
+                      'percentage' : {'value' : value, 'depth' : depth, 'depth2' : depth2}}
+
+        source = self._sourceVersion
+        statistics = {s for s in statistics if not all(self._isCached(key, source, **parameters[s]) for key in keys[s])}
+        if len(statistics) == 0:
+            return
+
+        # The doi needs the opacity, which needs the credible intervals.
+        doOpacity = len(statistics & {'opacity', 'doi'}) > 0
+        doCredible = doOpacity or ('credible' in statistics)
+
+        shape = self.mesh.shape
+        name = self.parameterName
+        units = self.parameterUnits
+        p = 0.01 * percent
+
+        out = {}
+        if 'mean' in statistics:
+            out['mean'] = self._createProduct('mean_parameter', shape, name, units)
+        if 'mode' in statistics:
+            out['mode'] = self._createProduct('mode_parameter', shape, name, units)
+        if 'credible' in statistics:
+            out['lower'] = self._createProduct('credible_lower', shape, '{}% Credible Interval'.format(100.0 - percent), units)
+            out['upper'] = self._createProduct('credible_upper', shape, '{}% Credible Interval'.format(percent), units)
+        if 'opacity' in statistics:
+            out['opacity'] = self._createProduct('opacity', shape, 'Opacity', '')
+        if 'doi' in statistics:
+            z = self.hitmap(0).z
+            out['doi'] = self._createProduct('doi', np.shape(doiPercent) + (self.nPoints, ), 'Depth of investigation', self.height.units)
+        if 'percentage' in statistics:
+            assert not value is None, ValueError("Please specify the value for 'percentage'")
+            iz = np.s_[:]
+            if (not depth is None):
+                assert depth <= self.mesh.z.cellEdges[-1], 'Depth is greater than max depth '+str(self.mesh.z.cellEdges[-1])
+                j = self.mesh.z.cellIndex(depth)
+                k = j+1
+                if (not depth2 is None):
+                    assert depth2 <= self.mesh.z.cellEdges[-1], 'Depth2 is greater than max depth '+str(self.mesh.z.cellEdges[-1])
+                    assert depth <= depth2, 'Depth2 must be >= depth'
+                    k = self.mesh.z.cellIndex(depth2)
+                iz = np.s_[j:k]
+            out['percentage'] = self._createProduct('percentage_parameter', (self.nPoints, ), "Probability of {} > {:0.2f}".format(name, value), units)
+
+        print('Computing {}'.format(', '.join(sorted(statistics))), flush=True)
+        for i, counts, x in self._parameterPosteriors(chunkSize):
+            nx = x.shape[-1]
+
+            if 'mean' in statistics:
+                total = np.sum(counts, axis=-1)
+                tmp = np.sum(counts * x[:, None, :], axis=-1)
+                out['mean'][:, i] = np.divide(tmp, total, out=np.zeros_like(tmp), where=total > 0.0).T
+
+            if 'mode' in statistics:
+                out['mode'][:, i] = np.take_along_axis(x, np.argmax(counts, axis=-1), axis=-1).T
+
+            if doCredible:
+                cs = np.cumsum(counts, axis=-1)
+                cs = cs / cs[:, :, -1:]
+
+                # Equivalent to searchsorted on the cumulative sums at every depth of every data point
+                ix1 = np.minimum(np.sum(cs < (1.0 - p), axis=-1), nx - 1)
+                ix2 = np.minimum(np.sum(cs < p, axis=-1), nx - 1)
+
+                lower = np.take_along_axis(x, ix1, axis=-1).T
+                upper = np.take_along_axis(x, ix2, axis=-1).T
+
+                if (not log is None):
+                    lower, dum = cF._log(lower, log=log)
+                    upper, dum = cF._log(upper, log=log)
+
+                if 'credible' in statistics:
+                    out['lower'][:, i] = lower
+                    out['upper'][:, i] = upper
+
+            if doOpacity:
+                opacity = 1.0 - StatArray.StatArray(upper - lower).normalize(axis=0)
+
+                if 'opacity' in statistics:
+                    out['opacity'][:, i] = opacity
+
+                if 'doi' in statistics:
+                    out['doi'][..., i] = np.reshape(self._depthOfInvestigation(opacity, doiPercents, z), np.shape(doiPercent) + (-1, ))
+
+            if 'percentage' in statistics:
+                # Cell of value in the parameter bins of each data point
+                edges = StatArray.StatArray(x).edges(axis=-1)
+                pj = np.clip(np.sum(edges <= value, axis=-1) - 1, 0, nx)
+
+                tmp = np.sum(counts[:, iz, :], axis=1)
+                out['percentage'][i] = np.sum(np.where(np.arange(nx) >= pj[:, None], tmp, 0.0), axis=-1) / np.sum(tmp, axis=-1)
+
+        for s in statistics:
+            for key in keys[s]:
+                self._setCached(key, source, **parameters[s])
+
+        for key in ['credibleLower', 'credibleUpper', 'modeParameter', 'opacity', 'doi']:
+            self.__dict__.pop(key, None)
 
 
     @property
@@ -285,53 +487,108 @@ class Inference2D(myObject):
 
     @cached_property
     def doi(self):
-        if 'doi' in self.hdfFile.keys():
-            return StatArray.StatArray(np.asarray(self.getAttribute('doi')), 'Depth of investigation', 'm')
-        else:
-            self.computeDOI()
+        # Read from the line file if up to date
+        return self.computeDOI()
+
+
+    def computeDOI(self, percent=67.0, window=1, opacityPercent=95.0, opacityLog=10):
+        """Compute the depth of investigation of every data point from the opacity.
 
+        The depth of investigation is taken from the deepest cell whose opacity is at least the percentage cutoff.
+        Several cutoffs are found in one pass, and only the opacity is read so no posteriors are needed once
+        the opacity is up to date in the line file.
+
+        Parameters
+        ----------
+        percent : float or array_like of floats, optional
+            Opacity cutoffs in percent.
+        window : int, optional
+            Width of a running mean along the line.
+        opacityPercent : float, optional
+            Percent of the credible intervals of the opacity, see computeOpacity.
+        opacityLog : 'e' or float, optional
+            Log base of the credible intervals of the opacity, see computeOpacity.
+
+        Returns
+        -------
+        out : geobipy.StatArray
+            Depth of investigation with shape (nPoints, ) for a single cutoff or (nCutoffs, nPoints).
 
-    def computeDOI(self, percent=67.0, window=1):
-        """ Get the DOI of the line depending on a percentage credible interval cutoff for each data point """
+        """
 
         if 'doi' in self.__dict__:
             del self.__dict__['doi']
 
+        percents = np.atleast_1d(np.asarray(percent, dtype=np.float64))
+
         assert window > 0, ValueError("window must be >= 1")
-        assert 0.0 < percent < 100.0, ValueError("Must have 0.0 < percent < 100.0")
+        assert np.all((0.0 < percents) & (percents < 100.0)), ValueError("Must have 0.0 < percent < 100.0")
 
-        opacity = self.opacity
+        # Parameters of the opacity property. A single cutoff and a list of one cutoff give different shapes.
+        parameters = {'percent' : np.float64(opacityPercent), 'log' : opacityLog, 'doiPercent' : np.asarray(percent, dtype=np.float64).tolist(), 'window' : window}
+        source = self._sourceVersion
+        if self._isCached('doi', source, **parameters):
+            return StatArray.StatArray(np.asarray(self.hdfFile['doi/data']), 'Depth of investigation', self.height.units)
 
-        nz = self.hitmap(0).z.nCells
-        doi = StatArray.StatArray(np.full(self.nPoints, fill_value=self.hitmap(0).z.cellEdges[-1]), 'Depth of investigation', self.height.units)
+        print('Computing Depth of Investigation', flush=True)
+        opacity = self.computeOpacity(percent=opacityPercent, log=opacityLog)
+        doi = self._depthOfInvestigation(np.asarray(opacity), percents, self.hitmap(0).z)
 
-        p = 0.01 * percent
+        if window > 1:
+            doi = self._runningMean(doi, window)
 
-        print('Computing Depth of Investigation', flush=True)
+        doi = StatArray.StatArray(np.reshape(doi, np.shape(percent) + (-1, )), 'Depth of investigation', self.height.units)
 
-        for i in progressbar.progressbar(range(self.nPoints)):
-            tmp = opacity[:, i]
-            iCell = nz-1
-            while tmp[iCell] < p and iCell >= 0:
-                iCell -=1
+        self._createProduct('doi', doi.shape, doi.name, doi.units)[...] = doi
+        self._setCached('doi', source, **parameters)
 
-            if iCell >= 0:
-                doi[i] = self.hitmap(0).z.cellCentres[iCell-1]
+        return doi
 
-        doiOut = doi
-        if window > 1:
-            buffer = np.int(0.5 * window)
-            tmp = doi.rolling(np.mean, window)
-            doiOut[buffer:-buffer] = tmp
-            doiOut[:buffer] = tmp[0]
-            doiOut[-buffer:] = tmp[-1]
-
-        if 'doi' in self.hdfFile.keys():
-            doiOut.writeHdf(self.hdfFile, 'doi')
-        else:
-            doiOut.toHdf(self.hdfFile, 'doi')
 
-        return doiOut
+    @staticmethod
+    def _depthOfInvestigation(opacity, percents, z):
+        """Depth of investigation of each column of the opacity for each percentage cutoff.
+
+        Parameters
+        ----------
+        opacity : array_like
+            Opacity with shape (nz, n).
+        percents : array_like
+            Cutoffs in percent.
+        z : geobipy.RectilinearMesh1D
+            Depth mesh of the opacity.
+
+        Returns
+        -------
+        out : ndarray
+            Depths with shape (nCutoffs, n).
+
+        """
+        above = np.asarray(opacity)[None, :, :] >= 0.01 * np.reshape(percents, (-1, 1, 1))
+
+        # Deepest cell whose opacity reaches each cutoff
+        iCell = above.shape[1] - 1 - np.argmax(above[:, ::-1, :], axis=1)
+
+        return np.where(np.any(above, axis=1), z.cellCentres[np.maximum(iCell - 1, 0)], z.cellEdges[-1])
+
+
+    @staticmethod
+    def _runningMean(values, window):
+        """Running mean along the last axis centred on each value. The ends take the first and last means. """
+        n = values.shape[-1]
+        if (window <= 1) or (n < window):
+            return values
+
+        tmp = np.mean(cF.rolling_window(np.ascontiguousarray(values), window), axis=-1)
+
+        buffer = window // 2
+        i1 = buffer + tmp.shape[-1]
+        out = np.empty_like(values)
+        out[..., buffer:i1] = tmp
+        out[..., :buffer] = tmp[..., :1]
+        out[..., i1:] = tmp[..., -1:]
+        return out
+
 
     @property
     def easting(self):
@@ -437,6 +694,12 @@ class Inference2D(myObject):
         return zPosterior
 
 
+    @property
+    def completed(self):
+        """ Get whether the results of each data point have been written to the line results file """
+        return ~np.isnan(self.hdfFile['invtime'][:])
+
+
     @cached_property
     def fiducials(self):
         """ Get the id numbers of the data points in the line results file """
@@ -786,40 +1049,58 @@ class Inference2D(myObject):
         return self.computeLineHitmap()
 
 
-    def computeLineHitmap(self, nBins=250, log=10):
+    def computeLineHitmap(self, nBins=250, xBins=None, chunkSize=256):
+        """Aggregate the parameter posteriors of every data point onto common parameter bins.
 
-        # if 'lineHitmap' in self.__dict__:
-        #     del self.__dict__['lineHitmap']
+        Parameters
+        ----------
+        nBins : int, optional
+            Number of log spaced parameter bins between the minimum and maximum parameter of the line.
+        xBins : geobipy.StatArray, optional
+            Use these parameter bin edges instead.
+        chunkSize : int, optional
+            Number of data points read at a time.
 
-        # First get the min max of the parameter hitmaps
-        x0 = np.log10(self.minParameter)
-        x1 = np.log10(self.maxParameter)
+        Returns
+        -------
+        out : geobipy.Histogram2D
+            Line hitmap.
 
-        counts = self.hdfFile['currentmodel/par/posterior/arr/data']
+        """
 
-        xBins = StatArray.StatArray(np.logspace(x0, x1, nBins+1), self.parameterName, units = self.parameterUnits)
+        if xBins is None:
+            # First get the min max of the parameter hitmaps
+            x0 = np.log10(self.minParameter)
+            x1 = np.log10(self.maxParameter)
+            xBins = StatArray.StatArray(np.logspace(x0, x1, nBins+1), self.parameterName, units = self.parameterUnits)
 
         lineHitmap = Histogram2D(xBins=xBins, yBins=self.mesh.z.cellEdges)
 
-        parameters = RectilinearMesh1D().fromHdf(self.hdfFile['currentmodel/par/posterior/x'])
+        self._addToHitmap(lineHitmap, chunkSize)
 
-        # Bar = progressbar.ProgressBar()
-        # for i in Bar(range(self.nPoints)):
-        for i in range(self.nPoints):
-            p = RectilinearMesh1D(cellEdges=parameters.cellEdges[i, :])
+        return lineHitmap
 
-            pj = lineHitmap.x.cellIndex(p.cellCentres, clip=True)
 
-            cTmp = counts[i, :, :]
+    def _addToHitmap(self, hitmap, chunkSize=256):
+        """Add the parameter posteriors of every data point to a hitmap with the same depth bins.
 
-            lineHitmap._counts[:, pj] += cTmp
+        The posterior bins of each data point are mapped to the parameter bins of the hitmap, and the
+        counts of a chunk of data points are summed with a single bincount over the flattened depth and bin indices.
 
-        # if 'line_hitmap' in self.hdfFile.keys():
-        #     del self.hdfFile['line_hitmap']
+        """
+        nz = hitmap.y.nCells
+        nx = hitmap.x.nCells
 
-        # lineHitmap.toHdf(self.hdfFile, 'line_hitmap')
+        iz = np.arange(nz)[None, :, None]
 
-        return lineHitmap
+        for i, counts, x in self._parameterPosteriors(chunkSize):
+            assert counts.shape[1] == nz, ValueError("hitmap must have {} depth cells".format(counts.shape[1]))
+
+            # Hitmap bin of each posterior bin of each data point
+            pj = np.reshape(hitmap.x.cellIndex(x, clip=True), x.shape)
+
+            k = iz * nx + pj[:, None, :]
+            hitmap._counts += np.bincount(k.ravel(), weights=counts.ravel(), minlength=nz * nx).reshape(nz, nx).astype(hitmap._counts.dtype)
 
 
     @property
@@ -864,49 +1145,19 @@ class Inference2D(myObject):
     @cached_property
     def modeParameter(self):
         """ """
-        # Read in the opacity if present
-        if "mode_parameter" in self.hdfFile.keys():
-            return StatArray.StatArray().fromHdf(self.hdfFile['mode_parameter'])
-        else:
-            return self.computeModeParameter()
+        # Read from the line file if up to date
+        return self.computeModeParameter()
 
 
-    def computeModeParameter(self):
+    def computeModeParameter(self, chunkSize=256):
+        """Compute the mode of the parameter posterior at every depth of every data point, see Hitmap2D.mode.
 
-        if 'modeParameter' in self.__dict__:
-            del self.__dict__['modeParameter']
+        See computeStatistics.
 
-        modeParameter = StatArray.StatArray(np.zeros(self.mesh.shape), self.parameterName, self.parameterUnits)
-
-        loc = 'currentmodel/par/posterior'
-        a = np.asarray(self.hdfFile[loc+'/arr/data'])
-        try:
-            b = np.asarray(self.hdfFile[loc+'/x/data'])
-        except:
-            b = np.asarray(self.hdfFile[loc+'/x/x/data'])
-
-        try:
-            c = np.asarray(self.hdfFile[loc+'/y/data'])
-        except:
-            c = np.asarray(self.hdfFile[loc+'/y/x/data'])
-
-        h = Hitmap2D(xBinCentres = StatArray.StatArray(b[0, :]), yBinCentres = StatArray.StatArray(c[0, :]))
-        h._counts[:, :] = a[0, :, :]
-        modeParameter[:, 0] = h.mode()
-
-        print('Computing Mode Parameter', flush=True)
-        for i in progressbar.progressbar(range(1, self.nPoints)):
-            h.x.xBinCentres = b[i, :]
-            h._counts[:, :] = a[i, :, :]
-            modeParameter[:, i] = h.mode()
-
-
-        if 'mode_parameter' in self.hdfFile.keys():
-            modeParameter.writeHdf(self.hdfFile, 'mode_parameter')
-        else:
-            modeParameter.toHdf(self.hdfFile, 'mode_parameter')
+        """
+        self.computeStatistics(['mode'], chunkSize=chunkSize)
 
-        return modeParameter
+        return StatArray.StatArray(np.asarray(self.hdfFile['mode_parameter/data']), self.parameterName, self.parameterUnits)
 
 
     @cached_property
@@ -928,32 +1179,19 @@ class Inference2D(myObject):
     @cached_property
     def opacity(self):
         """ Get the model parameter opacity using the credible intervals """
-        if "opacity" in self.hdfFile.keys():
-            return StatArray.StatArray().fromHdf(self.hdfFile['opacity'])
-        else:
-            return self.computeOpacity()
-
-
-    def computeOpacity(self, percent=95.0, log=10, multiplier=0.5):
-
-
-        if 'opacity' in self.__dict__:
-            del self.__dict__['opacity']
+        # Read from the line file if up to date
+        return self.computeOpacity()
 
-        tmp = self.credibleRange
 
-        mn = np.nanmin(tmp)
-        mx = np.nanmax(tmp)
+    def computeOpacity(self, percent=95.0, log=10, chunkSize=256):
+        """Compute the opacity at every depth of every data point from the range of the credible intervals.
 
-        opacity = 1.0 - StatArray.StatArray(tmp, "Opacity", "").normalize(axis=0)
-
-        if 'opacity' in self.hdfFile.keys():
-            opacity.writeHdf(self.hdfFile, 'opacity')
-        else:
-            opacity.toHdf(self.hdfFile, 'opacity')
+        See computeStatistics.
 
+        """
+        self.computeStatistics(['opacity'], percent=percent, log=log, chunkSize=chunkSize)
 
-        return opacity
+        return StatArray.StatArray(np.asarray(self.hdfFile['opacity/data']), "Opacity", "")
 
 
     @property
@@ -968,39 +1206,15 @@ class Inference2D(myObject):
         return self.hitmap(0).x.cellCentres.units
 
 
-    def percentageParameter(self, value, depth=None, depth2=None, progress=False):
-
-        # Get the depth grid
-        if (not depth is None):
-            assert depth <= self.mesh.z.cellEdges[-1], 'Depth is greater than max depth '+str(self.mesh.z.cellEdges[-1])
-            j = self.mesh.z.cellIndex(depth)
-            k = j+1
-            if (not depth2 is None):
-                assert depth2 <= self.mesh.z.cellEdges[-1], 'Depth2 is greater than max depth '+str(self.mesh.z.cellEdges[-1])
-                assert depth <= depth2, 'Depth2 must be >= depth'
-                k = self.mesh.z.cellIndex(depth2)
-
-        percentage = StatArray.StatArray(np.empty(self.nPoints), name="Probability of {} > {:0.2f}".format(self.parameterName, value), units = self.parameterUnits)
-
-        if depth:
-            counts = self.hdfFile['currentmodel/par/posterior/arr/data'][:, j:k, :]
-            # return StatArray.StatArray(np.sum(counts[:, :, pj:]) / np.sum(counts) * 100.0, name="Probability of {} > {:0.2f}".format(self.meanParameters.name, value), units = self.meanParameters.units)
-        else:
-            counts = self.hdfFile['currentmodel/par/posterior/arr/data']
+    def percentageParameter(self, value, depth=None, depth2=None, progress=False, chunkSize=256):
+        """Compute the probability that the parameter is greater than value at every data point.
 
-        parameters = RectilinearMesh1D().fromHdf(self.hdfFile['currentmodel/par/posterior/x'])
+        See computeStatistics.
 
-        Bar = progressbar.ProgressBar()
-        print('Computing P(X > value)', flush=True)
-        for i in Bar(range(self.nPoints)):
-            p = RectilinearMesh1D(cellEdges=parameters.cellEdges[i, :])
-            pj = p.cellIndex(value)
-
-            cTmp = counts[i, :, :]
-
-            percentage[i] = np.sum(cTmp[:, pj:]) / cTmp.sum()
+        """
+        self.computeStatistics(['percentage'], value=value, depth=depth, depth2=depth2, chunkSize=chunkSize)
 
-        return percentage
+        return StatArray.StatArray(np.asarray(self.hdfFile['percentage_parameter/data']), name="Probability of {} > {:0.2f}".format(self.parameterName, value), units = self.parameterUnits)
 
 
     @cached_property
@@ -1180,7 +1394,7 @@ class Inference2D(myObject):
 
         xtmp = self.mesh.getXAxis(xAxis, centres=True)
 
-        (self.elevation - self.doi).plot(x=xtmp, **kwargs)
+        (self.elevation - self.computeDOI(percent, window)).plot(x=xtmp, **kwargs)
 
 
     def plotElevation(self, **kwargs):
@@ -2283,14 +2497,33 @@ class Inference2D(myObject):
               "====================================================\n")
 
 
-    def createHdf(self, hdfFile, fiducials, results):
+    def createHdf(self, hdfFile, fiducials, results, compression=None, shuffle=True):
         """ Create the hdf group metadata in file
-        parent: HDF object to create a group inside
-        myName: Name of the group
+
+        Per data point datasets are chunked so that each data point is written on its own.
+
+        Parameters
+        ----------
+        hdfFile : h5py.File or h5py.Group
+            File or group to create the line results in.
+        fiducials : array_like
+            Fiducials of the data points on the line.
+        results : geobipy.Inference1D
+            Results of a single data point used as a template for the sizes of the datasets.
+        compression : str, optional
+            Compress the per data point datasets with 'gzip' or 'lzf'. Filters cannot be used when the file is opened with the mpio driver.
+        shuffle : bool, optional
+            Apply the shuffle filter before compressing.
+
         """
 
         self.hdfFile = hdfFile
 
+        # Storage profile read by the createHdf methods of the classes when allocating repeated datasets.
+        if not compression is None:
+            hdfFile.file.attrs['compression'] = compression
+            hdfFile.file.attrs['shuffle'] = shuffle
+
         nPoints = fiducials.size
         self.fiducials = StatArray.StatArray(np.sort(fiducials), "fiducials")
         assert not np.any(np.isnan(self.fiducials)), ValueError("Cannot have fiducials == NaN")
@@ -2329,7 +2562,8 @@ class Inference2D(myObject):
 
         results.rate.createHdf(hdfFile,'rate',nRepeats=nPoints, fillvalue=np.nan)
 #        hdfFile.create_dataset('rate', [nPoints,results.rate.size], dtype=results.rate.dtype)
-        results.PhiDs.createHdf(hdfFile,'phids',nRepeats=nPoints, fillvalue=np.nan)
+        # Single precision is plenty for the misfit trace of every iteration.
+        results.PhiDs.astype(np.float32).createHdf(hdfFile,'phids',nRepeats=nPoints, fillvalue=np.nan)
         #hdfFile.create_dataset('phids', [nPoints,results.PhiDs.size], dtype=results.PhiDs.dtype)
 
         results.currentDataPoint.createHdf(hdfFile,'currentdatapoint', nRepeats=nPoints, fillvalue=np.nan)
@@ -2394,9 +2628,6 @@ class Inference2D(myObject):
         # Add the multiplier
         hdfFile['multiplier'][i] = results.multiplier
 
-        # Add the inversion time
-        hdfFile['invtime'][i] = results.invTime
-
         # Add the savetime
 #        hdfFile['savetime'][i] = results.saveTime
 
@@ -2427,3 +2658,6 @@ class Inference2D(myObject):
 
         results.bestModel.writeHdf(hdfFile,'bestmodel', withPosterior=False, index=i)
 
+        # Add the inversion time last, it marks the data point as completed when restarting an inversion.
+        hdfFile['invtime'][i] = results.invTime
+
@@ -17,6 +17,7 @@ from ..base import fileIO
 from ..base.MPI import loadBalance1D_shrinkingArrays
 
 from ..classes.statistics.Histogram1D import Histogram1D
+from ..classes.statistics.Histogram2D import Histogram2D
 from ..classes.statistics.Hitmap2D import Hitmap2D
 from ..classes.pointcloud.PointCloud3D import PointCloud3D
 from ..base import interpolation as interpolation
@@ -162,7 +163,7 @@ class Inference3D(myObject):
             fiducialsForLine = np.where(tmp[:, 0] == line)[0]
             H5File = h5py.File(join(self.directory, '{}.h5'.format(line)), 'w')
             lr = Inference2D()
-            lr.createHdf(H5File, fiducials[fiducialsForLine], Res)
+            lr.createHdf(H5File, fiducials[fiducialsForLine], Res, compression=options.compression)
             self._lines.append(lr)
             print('Time to create line {} with {} data points: {} h:m:s'.format(line, fiducialsForLine.size, str(timedelta(seconds=time.time()-t0))))
 
@@ -313,6 +314,56 @@ class Inference3D(myObject):
         return bestParameters
 
 
+    def computeDOI(self, percent=67.0, window=1, opacityPercent=95.0, opacityLog=10):
+        """Compute the depth of investigation of every data point in the survey, see Inference2D.computeDOI. """
+
+        doi = StatArray.StatArray(np.empty(np.shape(percent) + (self.nPoints, )), 'Depth of investigation', self.lines[0].height.units)
+
+        print('Computing Depth of Investigation', flush=True)
+        Bar=progressbar.ProgressBar()
+        for i in Bar(range(self.nLines)):
+            doi[..., self.lineIndices[i]] = self.lines[i].computeDOI(percent, window, opacityPercent, opacityLog)
+
+        self.doi = doi
+        return doi
+
+
+    def computeSurveyHitmap(self, nBins=250, chunkSize=256):
+        """Aggregate the parameter posteriors of every data point in the survey onto common parameter bins.
+
+        Each line is streamed once. Its line hitmap is computed on the survey bins, kept as its lineHitmap, and added to the survey hitmap.
+
+        Parameters
+        ----------
+        nBins : int, optional
+            Number of log spaced parameter bins between the minimum and maximum parameter of the survey.
+        chunkSize : int, optional
+            Number of data points read at a time.
+
+        Returns
+        -------
+        out : geobipy.Histogram2D
+            Survey hitmap.
+
+        """
+
+        x0 = np.log10(np.min([line.minParameter for line in self.lines]))
+        x1 = np.log10(np.max([line.maxParameter for line in self.lines]))
+
+        xBins = StatArray.StatArray(np.logspace(x0, x1, nBins+1), self.lines[0].parameterName, units = self.lines[0].parameterUnits)
+
+        surveyHitmap = Histogram2D(xBins=xBins, yBins=self.zGrid.cellEdges)
+
+        print('Computing survey hitmap', flush=True)
+        for line in self.lines:
+            assert np.allclose(line.mesh.z.cellEdges, self.zGrid.cellEdges), ValueError("Line {} has different depth cells".format(line.line))
+            lineHitmap = line.computeLineHitmap(xBins=xBins, chunkSize=chunkSize)
+            line.__dict__['lineHitmap'] = lineHitmap
+            surveyHitmap._counts += lineHitmap.counts
+
+        return surveyHitmap
+
+
     def computeMarginalProbability(self, fractions, distributions, **kwargs):
         for line in self.lines:
             line.computeMarginalProbability(fractions, distributions, **kwargs)
@@ -340,7 +391,7 @@ class Inference3D(myObject):
         geobipy.Hitmap : Parameter posterior.
 
         """
-        iLine, index = self.lineIndex(fiducial=fiducial, index=index):
+        iLine, index = self.lineIndex(fiducial=fiducial, index=index)
         return self.lines[iLine].hitmap(index=index)
 
 
@@ -109,6 +109,29 @@ class _userParameters(myObject):
         except:
             self.ignoreLikelihood = False
 
+        try:
+            self.nTemperatures = np.int32(1) if self.nTemperatures is None else np.int32(self.nTemperatures)
+        except:
+            self.nTemperatures = np.int32(1)
+        assert self.nTemperatures >= 1, ValueError("nTemperatures must be >= 1")
+
+        try:
+            self.maximumTemperature = np.float64(10.0) if self.maximumTemperature is None else np.float64(self.maximumTemperature)
+        except:
+            self.maximumTemperature = np.float64(10.0)
+        assert self.maximumTemperature >= 1.0, ValueError("maximumTemperature must be >= 1.0")
+
+        try:
+            self.inPlaceProposals = True if self.inPlaceProposals is None else self.inPlaceProposals
+        except:
+            self.inPlaceProposals = True
+
+        try:
+            self.compression = None if self.compression is None else str(self.compression)
+        except:
+            self.compression = None
+        assert self.compression in (None, 'gzip', 'lzf'), ValueError("compression must be None, 'gzip', or 'lzf'")
+
         self.check(Datapoint)
 
 
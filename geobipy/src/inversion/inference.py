@@ -48,6 +48,20 @@ def infer(userParameters, DataPoint, prng, LineResults=None, rank=1):
         Res.initFigure()
         plt.show(block=False)
 
+    # Preallocate the candidate model and data point so that proposals are made in place rather than by deepcopy.
+    # The current state and the candidate are swapped whenever a proposal is accepted.
+    buffers = None
+    if userParameters.inPlaceProposals:
+        Mod = Mod.allocateBuffer()
+        buffers = (Mod.allocateBuffer(), Mod.allocateBuffer(), deepcopy(DataPoint))
+
+    # Parallel tempering. Additional chains sample the posterior with the likelihood raised to 1/temperature
+    # and exchange states with their neighbours. Only the cold chain, at temperature 1, updates the results.
+    # Every chain is advanced in turn by this process, so the time per iteration grows linearly with nTemperatures.
+    temperatures = np.geomspace(1.0, userParameters.maximumTemperature, userParameters.nTemperatures)
+    chains = [initializeChain(Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers) for t in temperatures[1:]]
+    nExchanges = 0
+
     # Set the saved best models and data
     bestModel = Mod.deepcopy()
     bestData = deepcopy(DataPoint)
@@ -60,7 +74,7 @@ def infer(userParameters, DataPoint, prng, LineResults=None, rank=1):
 
     if userParameters.ignoreLikelihood:
         Res.burnedIn = True
-        Res.iBurn = 0
+        Res.iBurn = np.int64(0)
 
 
     Res.clk.start()
@@ -69,14 +83,42 @@ def infer(userParameters, DataPoint, prng, LineResults=None, rank=1):
     failed = False
     while (Go):
 
+        previous = (Mod, DataPoint)
+
         # Accept or reject the new model
-        [Mod, DataPoint, prior, likelihood, posterior, PhiD, posteriorComponents, ratioComponents, accepted, dimensionChange] = accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior, PhiD, Res, prng)# ,oF, oD, oRel, oAdd, oP, oA, i)
+        [Mod, DataPoint, prior, likelihood, posterior, PhiD, posteriorComponents, ratioComponents, accepted, dimensionChange] = accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior, PhiD, Res, prng, buffers)# ,oF, oD, oRel, oAdd, oP, oA, i)
+
+        # Recycle the previous state as the next candidate
+        if accepted and not buffers is None:
+            buffers = (buffers[0],) + previous
+
+        if len(chains) > 0:
+            for j in range(len(chains)):
+                chains[j] = temperedStep(userParameters, chains[j], temperatures[j + 1], prng)
+
+            cold = Mod
+            chains.insert(0, [Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers])
+            nExchanges += exchange(chains, temperatures, prng)
+            [Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers] = chains.pop(0)
+
+            # If the cold chain took the state of its neighbour, the outcome of its own proposal no longer describes the current state.
+            # Compare the swapped in state with the state at the start of the iteration instead.
+            if not Mod is cold:
+                accepted = False
+                dimensionChange = Mod.nCells[0] != previous[0].nCells[0]
+
+                # The prior components are those of the swapped in state, and no proposal led to it.
+                if userParameters.verbose:
+                    posteriorComponents = np.zeros(8, dtype=np.float64)
+                    _, posteriorComponents[:4] = Mod.priorProbability(userParameters.solveParameter, userParameters.solveGradient, verbose=True)
+                    _, posteriorComponents[4:] = DataPoint.priorProbability(userParameters.solveRelativeError, userParameters.solveAdditiveError, userParameters.solveHeight, userParameters.solveCalibration, verbose=True)
+                    ratioComponents = np.full(7, np.nan)
 
         # Determine if we are burning in
         if (not Res.burnedIn):
             if (PhiD <= multiplier * DataPoint.data.size):
                 Res.burnedIn = True  # Let the results know they are burned in
-                Res.iBurn = i         # Save the burn in iteration to the results
+                Res.iBurn = np.int64(i)         # Save the burn in iteration to the results
                 iBest = i
                 bestModel = Mod.deepcopy()
                 bestData = deepcopy(DataPoint)
@@ -91,6 +133,8 @@ def infer(userParameters, DataPoint, prng, LineResults=None, rank=1):
         if (np.mod(i, userParameters.plotEvery) == 0):
             tPerMod = Res.clk.lap() / userParameters.plotEvery
             tmp = "i=%i, k=%i, %4.3f s/Model, %0.3f s Elapsed\n" % (i, np.float(Mod.nCells[0]), tPerMod, Res.clk.timeinSeconds())
+            if len(chains) > 0:
+                tmp = "{}, {} exchanges\n".format(tmp[:-1], nExchanges)
             if (rank == 1):
                 print(tmp)
 
@@ -213,14 +257,12 @@ def initialize(userParameters, DataPoint, prng=None):
     # if (not userParameters.referenceHitmap is None):
     #     Mod.setReferenceHitmap(userParameters.referenceHitmap)
 
-    # Compute the predicted data
-    DataPoint.forward(Mod)
-
-
+    # Compute the predicted data, along with the sensitivity matrix of the initial model if it is needed.
     if userParameters.ignoreLikelihood:
+        DataPoint.forward(Mod)
         inverseHessian = Mod.localParameterVariance()
     else:
-        inverseHessian = Mod.localParameterVariance(DataPoint)
+        inverseHessian = Mod.localParameterVariance(DataPoint, forward=True)
 
     # Instantiate the proposal for the parameters.
     parameterProposal = Distribution('MvLogNormal', Mod.par, inverseHessian, linearSpace=True, prng=prng)
@@ -254,18 +296,108 @@ def initialize(userParameters, DataPoint, prng=None):
     return (userParameters, Mod, DataPoint, prior, likelihood, posterior, PhiD)
 
 
-def accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior, PhiD, Res, prng):# ,oF, oD, oRel, oAdd, oP, oA ,curIter):
-    """ Propose a new random model and accept or reject it """
+def initializeChain(Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers=None):
+    """Create an independent copy of the state of a Markov chain.
+
+    The model and data point are deepcopied, but their deepcopies keep references to the attached posterior histograms.
+    Every chain therefore shares the posterior histograms, which are only updated by the cold chain.
+
+    Returns
+    -------
+    out : list
+        [Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers]
+
+    """
+    if buffers is None:
+        return [Mod.deepcopy(), deepcopy(DataPoint), prior, likelihood, posterior, PhiD, None]
+
+    Mod = Mod.allocateBuffer()
+    return [Mod, deepcopy(DataPoint), prior, likelihood, posterior, PhiD, (Mod.allocateBuffer(), Mod.allocateBuffer(), deepcopy(DataPoint))]
+
+
+def temperedStep(userParameters, chain, temperature, prng):
+    """Advance a tempered Markov chain by one iteration.
+
+    Parameters
+    ----------
+    chain : list
+        State of the chain, see initializeChain.
+    temperature : float
+        Temperature of the chain.
+
+    Returns
+    -------
+    out : list
+        Updated state of the chain.
+
+    """
+    Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers = chain
+    previous = (Mod, DataPoint)
+
+    Mod, DataPoint, prior, likelihood, posterior, PhiD, _, _, accepted, _ = accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior, PhiD, None, prng, buffers, temperature)
+
+    if accepted and not buffers is None:
+        buffers = (buffers[0],) + previous
+
+    return [Mod, DataPoint, prior, likelihood, posterior, PhiD, buffers]
+
+
+def exchange(chains, temperatures, prng):
+    """Propose to swap the states of a randomly chosen pair of chains at neighbouring temperatures.
+
+    The swap is accepted with probability
+
+    .. math::
+        \min\left(1, \exp\left[\left(\frac{1}{T_{i}} - \frac{1}{T_{i+1}}\right)\left(\log p(\mathbf{d} | \mathbf{m}_{i+1}) - \log p(\mathbf{d} | \mathbf{m}_{i})\right)\right]\right)
+
+    Parameters
+    ----------
+    chains : list
+        States of each chain, see initializeChain, ordered by increasing temperature.  Swapped in place.
+    temperatures : array_like
+        Temperature of each chain.
+
+    Returns
+    -------
+    out : bool
+        Whether the exchange was accepted.
+
+    """
+    i = prng.choice(len(chains) - 1)
+    j = i + 1
+
+    log_acceptanceRatio = ((1.0 / temperatures[i]) - (1.0 / temperatures[j])) * (chains[j][3] - chains[i][3])
+
+    accepted = log_acceptanceRatio >= 0.0 or np.exp(log_acceptanceRatio) > prng.uniform()
+    if accepted:
+        # The buffers belong to each chain, not to the state.
+        chains[i][:6], chains[j][:6] = chains[j][:6], chains[i][:6]
+
+    return accepted
+
+
+def accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior, PhiD, Res, prng, buffers=None, temperature=1.0):# ,oF, oD, oRel, oAdd, oP, oA ,curIter):
+    """ Propose a new random model and accept or reject it
+
+    If buffers is given, it must be a tuple of (remapped model, candidate model, candidate data point) whose memory is overwritten
+    by the proposal, where the models were created with Model1D.allocateBuffer.  Otherwise the current model and data point are deepcopied.
+    The likelihood ratio is divided by temperature for tempered chains.  Res may be None for chains that do not record results.
+    """
     clk = Stopwatch()
     clk.start()
 
-    perturbedDatapoint = deepcopy(DataPoint)
+    if buffers is None:
+        perturbedDatapoint = deepcopy(DataPoint)
+        out = None
+    else:
+        perturbedDatapoint = buffers[2].copyFrom(DataPoint)
+        out = buffers[:2]
 
     # Perturb the current model
     if userParameters.ignoreLikelihood:
-        remappedModel, perturbedModel = Mod.perturb()
+        remappedModel, perturbedModel = Mod.perturb(out=out)
     else:
-        remappedModel, perturbedModel = Mod.perturb(perturbedDatapoint)
+        remappedModel, perturbedModel = Mod.perturb(perturbedDatapoint, out=out)
 
     # Propose a new data point, using assigned proposal distributions
     perturbedDatapoint.perturb(userParameters.solveHeight, userParameters.solveRelativeError, userParameters.solveAdditiveError, userParameters.solveCalibration)
@@ -294,7 +426,7 @@ def accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior,
 
     # Test for early rejection
     if (prior1 == -np.inf):
-        return(Mod, DataPoint, prior, likelihood, posterior, PhiD, posteriorComponents, ratioComponents, False, Mod.nCells[0] != perturbedModel.nCells[0])
+        return(Mod, DataPoint, prior, likelihood, posterior, PhiD, posteriorComponents, None, False, Mod.nCells[0] != perturbedModel.nCells[0])
 
     # Compute the components of each acceptance ratio
     likelihood1 = 1.0
@@ -309,7 +441,7 @@ def accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior,
 
     priorRatio = prior1 - prior
 
-    likelihoodRatio = likelihood1 - likelihood
+    likelihoodRatio = (likelihood1 - likelihood) / temperature
 
     proposalRatio = proposal - proposal1
 
@@ -331,7 +463,8 @@ def accept_reject(userParameters, Mod, DataPoint, prior, likelihood, posterior,
     accepted = acceptanceProbability > prng.uniform()
 
     if (accepted):
-        Res.acceptance += 1
+        if not Res is None:
+            Res.acceptance += 1
         return(perturbedModel, perturbedDatapoint, prior1, likelihood1, posterior1, PhiD1, posteriorComponents, ratioComponents, True, Mod.nCells[0] != perturbedModel.nCells[0])
 
     else: # Rejected
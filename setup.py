@@ -38,7 +38,7 @@ setup(name='geobipy',
     author='Leon Foks',
     author_email='nfoks@contractor.usgs.gov',
     install_requires=[
-        'numpy >= 1.11',
+        'numpy >= 1.17',
         'scipy >= 0.18.1',
         'h5py >= 2.6.0',
         'netcdf4',
@@ -63,6 +63,8 @@ setup(name='geobipy',
         'console_scripts':[
             'geobipy=geobipy:geobipy',
             'geobipy_mpi=geobipy:geobipy_mpi',
+            'geobipy_store=geobipy:geobipy_store',
+            'geobipy_merge=geobipy:geobipy_merge',
         ],
     }
 )
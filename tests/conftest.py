@@ -0,0 +1,171 @@
+""" Shared fixtures for the pytest suite.
+
+test_mpi.py is a script that is run with mpirun and is not collected.
+"""
+import numpy as np
+import pytest
+from os import makedirs
+from os.path import abspath, dirname, join
+from types import SimpleNamespace
+
+from geobipy import FdemData, Inference3D, _ShardWriter, mergeShards
+from geobipy.src.base import customFunctions
+from geobipy.src.inversion._userParameters import _userParameters
+from geobipy.src.inversion.inference import infer
+
+collect_ignore = ['test_mpi.py']
+
+dataPath = join(dirname(abspath(__file__)), '..', 'documentation_source', 'source', 'examples', 'supplementary', 'Data')
+fdemSystemFile = join(dataPath, 'FdemSystem1.stm')
+
+# Two lines of four Resolve data points
+fdemData = """Line fid easting northing height elev I_395 Q_395 I_1822 Q_1822 I_3262 Q_3262 I_8199 Q_8199 I_38760 Q_38760 I_128755 Q_128755
+1 10 0 50 30 0 157.101 236.91 422.47 396.8 253.718 181.551 828.152 510.06 1567.72 435.359 1342.34 229.361
+1 11 100 50 30 0 142.958 218.36 427.431 424.521 275.373 168.866 826.974 546.062 1489.74 423.989 1450.32 262.124
+1 12 200 50 30 0 151.845 210.364 420.902 404.317 258.999 172.56 834.155 494.673 1482.57 392.084 1557.12 255.538
+1 13 300 50 30 0 137.183 209.76 440.908 447.407 282.227 179.154 907.568 500.05 1488.29 409.573 1449.58 282.552
+2 20 0 100 30 0 146.173 215.624 449.249 424.599 264.511 186.196 859.687 540.546 1416.86 411.493 1490.4 267.017
+2 21 100 100 30 0 139.819 230.229 463.1 443.846 267.283 198.228 862.057 480.435 1539.4 376.406 1511.17 249.25
+2 22 200 100 30 0 146.463 220.407 454.892 428.216 264.713 176.713 786.619 511.315 1479.69 409.484 1579.7 260.943
+2 23 300 100 30 0 146.741 230.962 438.393 416.319 251.861 175.347 891.62 500.005 1511.85 414.291 1602.57 256.689
+"""
+
+
+def fdemUserParameters(dataFilename, outputDir=None, **kwargs):
+    """User parameters of a short FDEM inversion, keyword arguments override the defaults. """
+
+    class userParameters(_userParameters):
+
+        def __init__(self, DataPoint):
+            self.nMarkovChains = 1000
+            self.plot = False
+            self.plotEvery = 5000
+            self.savePNG = False
+            self.save = True
+            self.solveParameter = False
+            self.solveGradient = True
+            self.solveRelativeError = True
+            self.solveAdditiveError = True
+            self.solveHeight = False
+            self.solveCalibration = False
+            self.maximumNumberofLayers = 30
+            self.minimumDepth = 1.0
+            self.maximumDepth = 150.0
+            self.minimumThickness = None
+            self.parameterLimits = None
+            self.initialRelativeError = 0.05
+            self.minimumRelativeError = 0.001
+            self.maximumRelativeError = 0.5
+            self.initialAdditiveError = 5.0
+            self.minimumAdditiveError = 3.0
+            self.maximumAdditiveError = 20.0
+            self.maximumElevationChange = 1.0
+            self.stochasticNewton = True
+            self.relativeErrorProposalVariance = 2.5e-7
+            self.additiveErrorProposalVariance = 1.0e-4
+            self.elevationProposalVariance = 0.01
+            self.pBirth = 1.0/6.0
+            self.pDeath = 1.0/6.0
+            self.pPerturb = 1.0/6.0
+            self.pNochange = 0.5
+            self.factor = None
+            self.gradientStd = None
+            self.covScaling = None
+            self.multiplier = None
+            self.clipRatio = None
+            self.inPlaceProposals = None
+            self.nTemperatures = None
+            self.maximumTemperature = None
+            self.compression = None
+            self.reciprocateParameters = True
+            self.dataDirectory = outputDir
+            self.dataFilename = dataFilename
+            self.systemFilename = fdemSystemFile
+            self.verbose = False
+            for key, value in kwargs.items():
+                setattr(self, key, value)
+            _userParameters.__init__(self, DataPoint)
+
+    return userParameters
+
+
+@pytest.fixture
+def fdemDataFile(tmp_path):
+    fName = str(tmp_path / 'data.txt')
+    with open(fName, 'w') as f:
+        f.write(fdemData)
+    return fName
+
+
+def readFdemDataPoint(dataFilename):
+    """ First data point of an FDEM data file. """
+    D = FdemData(systems=fdemSystemFile)
+    D._initLineByLineRead([dataFilename], [fdemSystemFile])
+    return D._readSingleDatapoint()
+
+
+@pytest.fixture
+def fdemDataPoint(fdemDataFile):
+    return readFdemDataPoint(fdemDataFile)
+
+
+class _WriteBoth(object):
+    """ Writes the results of a data point to the line results and to a shard. """
+
+    def __init__(self, LineResults, shard):
+        self.LineResults = LineResults
+        self.shard = shard
+
+    def results2Hdf(self, results):
+        self.LineResults.results2Hdf(results)
+        self.shard.results2Hdf(results)
+
+
+@pytest.fixture(scope='session')
+def fdemInversion(tmp_path_factory):
+    """ Line results of a short inversion of fdemData, computed once per session.
+
+    Every data point is written to the line results files in the 'serial' directory, and to the shard of one of two
+    workers that take the data points in turn. The shards are merged into the line results files in the 'merged' directory.
+    The chains ignore the likelihood so that every data point is burned in and has posteriors after the short chains.
+
+    """
+    directory = tmp_path_factory.mktemp('fdemInversion')
+    dataFilename = str(directory / 'data.txt')
+    with open(dataFilename, 'w') as f:
+        f.write(fdemData)
+
+    paras = SimpleNamespace(data_type=FdemData(), dataFilename=dataFilename, systemFilename=fdemSystemFile, userParameters=fdemUserParameters(dataFilename, ignoreLikelihood=True))
+
+    serial = str(directory / 'serial')
+    merged = str(directory / 'merged')
+    makedirs(join(merged, 'shards'))
+    makedirs(serial)
+
+    results = []
+    for outputDir in (serial, merged):
+        R = Inference3D(outputDir, fdemSystemFile)
+        R.createHDF5(FdemData(systems=fdemSystemFile), paras)
+        results.append(R)
+    results[1].close()
+
+    lineFiducials = {line : LR.fiducials for line, LR in zip(results[0].lineNumbers, results[0].lines)}
+    shards = [_ShardWriter(join(merged, 'shards', '{}.h5'.format(i)), lineFiducials) for i in range(2)]
+
+    D = FdemData(systems=fdemSystemFile)
+    D._initLineByLineRead([dataFilename], [fdemSystemFile])
+    for i in range(D.nPoints):
+        dataPoint = D._readSingleDatapoint()
+        shard = shards[i % 2]
+        shard.lineNumber = dataPoint.lineNumber
+        LR = results[0].line(dataPoint.lineNumber)
+        infer(paras.userParameters(dataPoint), dataPoint, prng=customFunctions.fiducialPrng(0, dataPoint.fiducial), LineResults=_WriteBoth(LR, shard))
+    D._closeDatafiles()
+
+    for shard in shards:
+        shard.close()
+    results[0].close()
+
+    nMerged = mergeShards(merged)
+
+    return SimpleNamespace(serial=serial, merged=merged, nPoints=D.nPoints, nMerged=nMerged)
@@ -0,0 +1,48 @@
+import numpy as np
+from copy import deepcopy
+
+from test_fdem import initialState
+
+
+def test_copy_from_keeps_factorized_variance(fdemDataFile):
+    """copyFrom gives the candidate the prior variance of the current data point without factorizing it again. """
+    _, dataPoint = initialState(fdemDataFile)
+    likelihood = dataPoint.likelihood(log=True)
+    prior = dataPoint.predictedData.prior
+
+    candidate = deepcopy(dataPoint)
+    candidate.updateErrors(0.2, dataPoint.addErr)
+    assert candidate.likelihood(log=True) != likelihood
+
+    candidate.copyFrom(dataPoint)
+    assert candidate.predictedData.prior._variance is prior._variance
+    assert candidate.predictedData.prior._diagonal
+    assert candidate.predictedData.prior._cholesky is prior._cholesky
+    assert candidate.likelihood(log=True) == likelihood
+
+    # Changing the errors of the candidate does not change those of the current data point
+    candidate.updateErrors(0.2, dataPoint.addErr)
+    assert not candidate.predictedData.prior._variance is prior._variance
+    assert dataPoint.likelihood(log=True) == likelihood
+
+
+def test_diagonal_variance_is_a_vector(fdemDataFile):
+    """Updating the errors, the likelihood and its gradient never form the dense variance of the data. """
+    _, dataPoint = initialState(fdemDataFile)
+    prior = dataPoint.predictedData.prior
+
+    dataPoint.updateErrors(0.2, dataPoint.addErr)
+    likelihood = dataPoint.likelihood(log=True)
+    gradient = dataPoint.predictedData.priorDerivative(order=1, i=dataPoint.active)
+
+    assert prior._diagonal and prior._variance.shape == (np.size(dataPoint.active), )
+    assert prior._denseVariance is None
+    assert np.allclose(prior._variance, dataPoint.std[dataPoint.active]**2.0, rtol=1e-12)
+
+    # The same values from the dense variance
+    variance = prior.variance
+    x = dataPoint.predictedData[dataPoint.active]
+    r = x - prior.mean
+    assert np.allclose(gradient, np.linalg.solve(variance, r), rtol=1e-12)
+    assert np.isclose(likelihood, -0.5 * (r.size * np.log(2.0 * np.pi) + np.linalg.slogdet(variance)[1] + np.dot(r, np.linalg.solve(variance, r))), rtol=1e-12)
+    assert np.array_equal(prior.deepcopy()._variance, prior._variance)
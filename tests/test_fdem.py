@@ -0,0 +1,92 @@
+import numpy as np
+from copy import deepcopy
+
+from geobipy import Model1D, StatArray
+from geobipy.src.classes.forwardmodelling.Electromagnetic.FD.fdem1d import fdem1dfwd, fdem1dfwdHalfspace
+from geobipy.src.inversion.inference import initialize
+from conftest import fdemUserParameters, readFdemDataPoint
+
+
+def initialState(dataFilename):
+    dataPoint = readFdemDataPoint(dataFilename)
+    options = fdemUserParameters(dataFilename)(dataPoint)
+    options.check(dataPoint)
+    _, Mod, dataPoint, _, _, _, _ = initialize(options, dataPoint, prng=np.random.RandomState(0))
+    return Mod, dataPoint
+
+
+def test_fused_forward_sensitivity(fdemDataFile):
+    """One pass of the layer recursion gives the predicted data and sensitivity of separate calls to round off. """
+    Mod, dataPoint = initialState(fdemDataFile)
+    Mod = Mod.insertLayer(20.0)
+    Mod.par[:] = [0.01, 0.1, 0.002]
+
+    separate = deepcopy(dataPoint)
+    separate.forward(Mod)
+    J = separate.sensitivity(Mod)
+
+    fused = deepcopy(dataPoint)
+    J1 = fused.sensitivity(Mod, forward=True)
+
+    assert np.allclose(fused.predictedData, separate.predictedData, rtol=1e-12, atol=0.0)
+    assert np.allclose(J1, J, rtol=1e-12, atol=0.0)
+    assert np.allclose(fused.J, J1, rtol=0.0, atol=0.0)
+
+
+def test_initial_state_uses_fused_call(fdemDataFile):
+    """The initial predicted data, sensitivity and inverse Hessian are those of the initial model. """
+    Mod, dataPoint = initialState(fdemDataFile)
+
+    check = deepcopy(dataPoint)
+    check.forward(Mod)
+    J = check.sensitivity(Mod)
+    WdJ = J * (check.std[check.active]**-1.0)[:, None]
+    inverseHessian = np.linalg.inv(np.dot(WdJ.T, WdJ) + Mod.par.prior.derivative(x=None, order=2))
+
+    assert np.allclose(dataPoint.predictedData, check.predictedData, rtol=1e-12, atol=0.0)
+    assert np.allclose(dataPoint.J, J, rtol=1e-12, atol=0.0)
+    assert np.allclose(Mod.inverseHessian, inverseHessian, rtol=1e-8)
+
+
+def test_halfspace_kernel_matches_forward(fdemDataPoint):
+    """The batched half space kernel gives the response of each half space forwarded on its own. """
+    conductivities = np.logspace(-6, 2, 25)
+    system = fdemDataPoint.system[0]
+
+    for height in [5.0, 30.0, 100.0]:
+        batched = fdem1dfwdHalfspace(system, conductivities, height)
+        for k, c in enumerate(conductivities):
+            single = fdem1dfwd(system, Model1D(1, parameters=StatArray(np.r_[c])), height)
+            # Absolute tolerance in ppm, the weakest in-phase channels of resistive half spaces are near 1e-5 ppm
+            assert np.allclose(batched[k], single, rtol=1e-6, atol=1e-6)
+
+    forwarded = fdemDataPoint._forwardHalfSpace(conductivities)
+    for k, c in enumerate(conductivities):
+        fdemDataPoint.forward(Model1D(1, parameters=StatArray(np.r_[c])))
+        assert np.allclose(forwarded[k], fdemDataPoint.predictedData, rtol=1e-6, atol=1e-6)
+
+
+def test_newton_step_uses_fused_call(fdemDataFile, monkeypatch):
+    """After a death, the sensitivity and the predicted data used by the Newton step are those of the remapped model, from one kernel call. """
+    Mod, dataPoint = initialState(fdemDataFile)
+    Mod = Mod.insertLayer(20.0)
+    Mod.par[:] = [0.01, 0.1, 0.002]
+    Mod.par.prior.ndim = Mod.nCells
+    Mod.updateLocalParameterVariance(dataPoint)
+    dataPoint.forward(Mod)
+
+    remapped = Mod.deleteLayer(0)
+    remapped.par.prior.ndim = remapped.nCells
+
+    check = deepcopy(dataPoint)
+    check.forward(remapped)
+    J = check.sensitivity(remapped)
+
+    def separate(*args, **kwargs):
+        raise AssertionError('The sensitivity was computed without the predicted data')
+    monkeypatch.setattr(type(dataPoint), '_sensitivity1D', separate)
+
+    remapped.updateLocalParameterVariance(dataPoint)
+
+    assert np.allclose(dataPoint.predictedData, check.predictedData, rtol=1e-12, atol=0.0)
+    assert np.allclose(dataPoint.J, J, rtol=1e-12, atol=0.0)
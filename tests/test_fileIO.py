@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from geobipy.src.base import fileIO
+
+
+def test_parse_lines():
+    values = fileIO.parseLines(['1 2 3\n', '\n', '4,5,*\n'])
+    assert values.shape == (2, 3)
+    assert np.array_equal(values[0], [1.0, 2.0, 3.0])
+    assert np.isnan(values[1, 2])
+
+    assert np.array_equal(fileIO.parseLines(['1 2 3', '4 5 6'], indices=[0, 2]), [[1.0, 3.0], [4.0, 6.0]])
+
+
+@pytest.mark.parametrize('lines, bad', [(['1 2', '3 4 5', '6'], 1),
+                                        (['1 2 3', '4 5 6', '7 8'], 2),
+                                        (['1 2', '3 a'], 1)])
+def test_parse_lines_reports_bad_line(lines, bad):
+    """Ragged lines are reported even when the total number of entries could be reshaped. """
+    with pytest.raises(Exception, match="line {} in file data.txt".format(bad + 10)):
+        fileIO.parseLines(lines, firstLine=10, fName='data.txt')
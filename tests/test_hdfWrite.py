@@ -0,0 +1,40 @@
+import h5py
+import numpy as np
+
+from geobipy.src.base.HDF.hdfWrite import repeated_storage
+
+
+def test_repeated_storage_chunks(tmp_path):
+    """Large entries get a chunk each, small entries share chunks of about chunkBytes. """
+    with h5py.File(str(tmp_path / 'chunks.h5'), 'w') as f:
+        # A 250 x 250 hitmap of 8 byte counts is larger than a chunk
+        assert repeated_storage(f, (250, 250), np.int64, 100)['chunks'] == (1, 250, 250)
+
+        # Scalars are grouped, but never more than the number of data points
+        assert repeated_storage(f, 1, np.float64, 100000)['chunks'] == (8192, 1)
+        assert repeated_storage(f, 1, np.float64, 100)['chunks'] == (100, 1)
+
+        # Only the first repeated dimension is grouped
+        assert repeated_storage(f, 10, np.float64, (100, 3))['chunks'] == (100, 1, 10)
+
+        # Empty datasets cannot be chunked
+        assert repeated_storage(f, 0, np.float64, 100) == {}
+        assert not 'compression' in repeated_storage(f, 1, np.float64, 100)
+
+        f.attrs['compression'] = 'gzip'
+        out = repeated_storage(f, 1, np.float64, 100)
+        assert out['compression'] == 'gzip' and out['compression_opts'] == 4 and out['shuffle']
+
+
+def test_unwritten_chunks_take_no_space(tmp_path):
+    """Only the chunks that hold written entries are allocated. """
+    with h5py.File(str(tmp_path / 'space.h5'), 'w') as f:
+        big = f.create_dataset('big', shape=(100, 250, 250), dtype=np.int64, **repeated_storage(f, (250, 250), np.int64, 100))
+        small = f.create_dataset('small', shape=(100000,), dtype=np.float64, **repeated_storage(f, (), np.float64, 100000))
+
+        big[3] = 1
+        small[3] = 1.0
+
+        assert big.id.get_storage_size() == 250 * 250 * 8
+        # The written scalar allocates the whole chunk it shares with its neighbours
+        assert small.id.get_storage_size() == 8192 * 8
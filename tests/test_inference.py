@@ -0,0 +1,136 @@
+import numpy as np
+from copy import deepcopy
+
+from geobipy.src.inversion import inference
+from geobipy.src.inversion.inference import initialize, initializeChain, accept_reject, exchange
+from geobipy.src.base import customFunctions
+from conftest import fdemUserParameters, readFdemDataPoint
+
+
+def runChain(dataFilename, inPlaceProposals, nIterations=400, seed=0):
+    """Run the Markov chain of infer without recording results and return the state after each iteration. """
+    dataPoint = readFdemDataPoint(dataFilename)
+    options = fdemUserParameters(dataFilename, inPlaceProposals=inPlaceProposals)(dataPoint)
+    options.check(dataPoint)
+
+    prng = np.random.RandomState(seed)
+    options, Mod, dataPoint, prior, likelihood, posterior, PhiD = initialize(options, dataPoint, prng=prng)
+
+    buffers = None
+    if options.inPlaceProposals:
+        Mod = Mod.allocateBuffer()
+        buffers = (Mod.allocateBuffer(), Mod.allocateBuffer(), deepcopy(dataPoint))
+
+    states = []
+    actions = []
+    for i in range(nIterations):
+        previous = (Mod, dataPoint)
+        Mod, dataPoint, prior, likelihood, posterior, PhiD, _, _, accepted, _ = accept_reject(options, Mod, dataPoint, prior, likelihood, posterior, PhiD, None, prng, buffers)
+        if accepted and not buffers is None:
+            buffers = (buffers[0],) + previous
+        if accepted:
+            actions.append(Mod.action[0])
+
+        states.append((np.int(Mod.nCells[0]), Mod.par.copy(), Mod.depth.copy(), PhiD, posterior, accepted))
+
+    return states, actions
+
+
+def test_in_place_proposals_match_deepcopy(fdemDataFile):
+    """Births, deaths and perturbations made in preallocated buffers give the same chain as deepcopies. """
+    buffered, actions = runChain(fdemDataFile, True)
+    copied, _ = runChain(fdemDataFile, False)
+
+    assert {'birth', 'death', 'perturb'} <= set(actions)
+
+    for a, b in zip(buffered, copied):
+        assert a[0] == b[0]
+        assert np.array_equal(a[1], b[1])
+        assert np.array_equal(a[2], b[2])
+        assert a[3:] == b[3:]
+
+
+def test_insert_layer_with_array_depth(fdemDataFile, fdemDataPoint):
+    """perturbStructure passes the new depth as a single element array. """
+    options = fdemUserParameters(fdemDataFile)(fdemDataPoint)
+    options.check(fdemDataPoint)
+    _, Mod, _, _, _, _, _ = initialize(options, fdemDataPoint, prng=np.random.RandomState(0))
+
+    z = np.exp(np.random.RandomState(1).uniform(np.log(Mod.minDepth), np.log(Mod.maxDepth), 1))
+    copied = Mod.insertLayer(z)
+    buffered = Mod.insertLayer(z, out=Mod.allocateBuffer())
+
+    assert np.int(buffered.nCells[0]) == np.int(Mod.nCells[0]) + 1
+    assert np.array_equal(buffered.depth, copied.depth)
+    assert np.array_equal(buffered.par, copied.par)
+    assert np.array_equal(buffered.thk, copied.thk)
+
+
+def test_tempered_chains_share_posteriors(fdemDataFile, fdemDataPoint):
+    """Chains are independent states that all point at the posterior histograms of the cold chain. """
+    options = fdemUserParameters(fdemDataFile)(fdemDataPoint)
+    options.check(fdemDataPoint)
+    _, Mod, dataPoint, prior, likelihood, posterior, PhiD = initialize(options, fdemDataPoint, prng=np.random.RandomState(0))
+
+    chain = initializeChain(Mod, dataPoint, prior, likelihood, posterior, PhiD)
+
+    assert not chain[0] is Mod
+    assert not chain[0].par is Mod.par
+    assert chain[0].par.posterior is Mod.par.posterior
+    assert chain[0].nCells.posterior is Mod.nCells.posterior
+    assert chain[0].depth.posterior is Mod.depth.posterior
+    assert chain[1].errorPosterior is dataPoint.errorPosterior
+
+
+def test_exchange_swaps_states_but_not_buffers():
+    """An accepted exchange swaps the states of neighbouring chains, each chain keeps its own buffers. """
+    chains = [['model{}'.format(i), 'data{}'.format(i), 0.0, -10.0 * i, 0.0, 0.0, 'buffers{}'.format(i)] for i in range(2)]
+
+    # The hotter chain has the lower likelihood, so the exchange is accepted with probability exp(-5)
+    prng = np.random.RandomState(0)
+    nExchanges = sum(exchange(chains, [1.0, 2.0], prng) for i in range(1000))
+    assert 0 < nExchanges < 50
+
+    # The colder chain takes the higher likelihood, so the exchange is always accepted
+    chains = [['model0', 'data0', 0.0, -10.0, 0.0, 0.0, 'buffers0'], ['model1', 'data1', 0.0, 0.0, 0.0, 0.0, 'buffers1']]
+    assert exchange(chains, [1.0, 2.0], prng)
+    assert chains[0] == ['model1', 'data1', 0.0, 0.0, 0.0, 0.0, 'buffers0']
+    assert chains[1] == ['model0', 'data0', 0.0, -10.0, 0.0, 0.0, 'buffers1']
+
+
+def test_swapped_in_state_records_its_own_components(fdemDataFile, fdemDataPoint, monkeypatch):
+    """After an exchange into the cold chain, the results record the prior components of the swapped in state and no proposal ratio. """
+    options = fdemUserParameters(fdemDataFile, nTemperatures=3, verbose=True, ignoreLikelihood=True)(fdemDataPoint)
+
+    # Prior components of the cold chain after each exchange that changed its state.
+    swapped = {}
+    def spy(chains, temperatures, prng):
+        cold = chains[0][0]
+        accepted = exchange(chains, temperatures, prng)
+        if not chains[0][0] is cold:
+            Mod, DataPoint = chains[0][:2]
+            _, model = Mod.priorProbability(options.solveParameter, options.solveGradient, verbose=True)
+            _, data = DataPoint.priorProbability(options.solveRelativeError, options.solveAdditiveError, options.solveHeight, options.solveCalibration, verbose=True)
+            swapped[len(calls)] = np.r_[model, data]
+        calls.append(accepted)
+        return accepted
+    calls = []
+    monkeypatch.setattr(inference, 'exchange', spy)
+
+    class Collector(object):
+        def results2Hdf(self, results):
+            self.results = results
+    LR = Collector()
+
+    inference.infer(options, fdemDataPoint, prng=customFunctions.fiducialPrng(0, fdemDataPoint.fiducial), LineResults=LR)
+    Res = LR.results
+
+    assert len(swapped) > 0
+    for i, components in swapped.items():
+        assert np.allclose(Res.posteriorComponents[:, i], components)
+        assert np.all(np.isnan(Res.ratioComponents[:, i]))
+        assert not Res.accepted[i]
+
+    # Iterations without a swap keep the ratio of the cold chain's own proposal
+    i = next(i for i in range(len(calls)) if not i in swapped)
+    assert not np.any(np.isnan(Res.ratioComponents[:, i]))
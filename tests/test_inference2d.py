@@ -0,0 +1,266 @@
+import numpy as np
+import pytest
+from os.path import join
+from shutil import copy
+
+from geobipy import Histogram1D, Inference2D, Inference3D, RectilinearMesh1D, StatArray
+from conftest import fdemSystemFile
+
+
+@pytest.fixture
+def lineResults(fdemInversion, tmp_path):
+    """ A copy of the results of the first line, so that derived products can be written to it. """
+    copy(join(fdemInversion.serial, '1.0.h5'), str(tmp_path))
+    LR = Inference2D(str(tmp_path / '1.0.h5'), system_file_path=fdemSystemFile)
+    yield LR
+    LR.close()
+
+
+def hitmap(LR, i):
+    """ Hitmap of a data point with the parameter bin centres as stored, rather than recomputed from the bin edges. """
+    h = LR.hitmap(i)
+    h.x.cellCentres = StatArray(LR.hdfFile['currentmodel/par/posterior/x/x/data'][i, :])
+    return h
+
+
+@pytest.mark.parametrize('chunkSize', [1, 3, 256])
+def test_credible_intervals_mode_and_opacity(lineResults, chunkSize):
+    """The chunked statistics match those of each data point's own hitmap. """
+    lower, upper = lineResults.computeCredibleInterval(percent=90.0, log=10, chunkSize=chunkSize)
+    mode = lineResults.computeModeParameter(chunkSize=chunkSize)
+    opacity = lineResults.computeOpacity(percent=90.0, log=10, chunkSize=chunkSize)
+
+    for i in range(lineResults.nPoints):
+        h = hitmap(lineResults, i)
+        _, low, high = h.credibleIntervals(percent=90.0, log=10)
+        assert np.allclose(lower[:, i], low)
+        assert np.allclose(upper[:, i], high)
+        assert np.allclose(mode[:, i], h.mode())
+        assert np.allclose(opacity[:, i], h.opacity(percent=90.0, log=10))
+
+
+def test_posterior_opacity(lineResults):
+    """The opacity of the error posteriors matches a loop over the histogram of each data point. """
+    posterior = lineResults.additiveErrorPosteriors
+    opacity = lineResults.compute_posterior_opacity(posterior, percent=90.0)
+
+    credibleRange = np.empty(lineResults.nPoints)
+    for i in range(lineResults.nPoints):
+        h = Histogram1D(bins=posterior._cellEdges + posterior.relativeTo[i])
+        h._counts = posterior.counts[i, :]
+        credibleRange[i] = h.credibleRange(percent=90.0)
+
+    credibleRange = (credibleRange - credibleRange.min()) / (credibleRange.max() - credibleRange.min())
+    assert np.allclose(opacity, 1.0 - credibleRange)
+
+
+def test_statistics_in_one_pass(lineResults, monkeypatch):
+    """Every statistic comes from a single pass over the posteriors, independent of the chunk size. """
+    x = np.asarray(lineResults.hdfFile['currentmodel/par/posterior/x/x/data'])
+    value = np.median(x)
+    depth, depth2 = lineResults.mesh.z.cellCentres[[10, 50]]
+
+    passes = []
+    parameterPosteriors = lineResults._parameterPosteriors
+    def spy(chunkSize):
+        passes.append(chunkSize)
+        return parameterPosteriors(chunkSize)
+    monkeypatch.setattr(lineResults, '_parameterPosteriors', spy)
+
+    lineResults.computeStatistics(['mean', 'mode', 'credible', 'opacity', 'doi', 'percentage'], value=value, depth=depth, depth2=depth2, chunkSize=3)
+    assert passes == [3]
+
+    mean = StatArray().fromHdf(lineResults.hdfFile['mean_parameter'])
+    percentage = StatArray().fromHdf(lineResults.hdfFile['percentage_parameter'])
+    assert mean.shape == lineResults.mesh.shape
+
+    j = lineResults.mesh.z.cellIndex(depth)
+    k = lineResults.mesh.z.cellIndex(depth2)
+    for i in range(lineResults.nPoints):
+        h = hitmap(lineResults, i)
+        assert np.allclose(mean[:, i], h.mean())
+
+        counts = np.sum(h.counts[j:k, :], axis=0)
+        assert np.isclose(percentage[i], np.sum(counts[h.x.cellEdges[1:] > value]) / np.sum(counts))
+
+    # Each product is the same when computed on its own in a different chunk size
+    mode = np.asarray(lineResults.hdfFile['mode_parameter/data'])
+    opacity = np.asarray(lineResults.hdfFile['opacity/data'])
+    doi = np.asarray(lineResults.hdfFile['doi/data'])
+    del lineResults.hdfFile['mode_parameter'], lineResults.hdfFile['opacity'], lineResults.hdfFile['doi']
+
+    assert np.array_equal(lineResults.computeModeParameter(chunkSize=256), mode)
+    assert np.array_equal(lineResults.computeOpacity(chunkSize=256), opacity)
+    assert np.array_equal(lineResults.computeDOI(), doi)
+
+
+def test_products_are_cached_in_the_line_file(lineResults, monkeypatch):
+    """Products are reused while their parameters and the posteriors are unchanged. """
+    passes = []
+    parameterPosteriors = lineResults._parameterPosteriors
+    def spy(chunkSize):
+        passes.append(chunkSize)
+        return parameterPosteriors(chunkSize)
+    monkeypatch.setattr(lineResults, '_parameterPosteriors', spy)
+
+    opacity = lineResults.computeOpacity()
+    assert len(passes) == 1
+
+    # Same parameters, the product is read from the file
+    assert np.array_equal(lineResults.computeOpacity(), opacity)
+    assert np.array_equal(lineResults.opacity, opacity)
+    assert len(passes) == 1
+
+    # Different parameters
+    lineResults.computeOpacity(percent=90.0)
+    assert len(passes) == 2
+
+    # Only the last parameters are stored
+    assert np.array_equal(lineResults.computeOpacity(), opacity)
+    assert len(passes) == 3
+
+    # New results for a data point change the fingerprint of the posteriors
+    lineResults.hdfFile['invtime'][0] += 1.0
+    lineResults.computeOpacity()
+    assert len(passes) == 4
+
+    # A product that is being rewritten is not trusted
+    lineResults._createProduct('opacity', opacity.shape)
+    lineResults.computeOpacity()
+    assert len(passes) == 5
+
+
+def test_properties_use_their_own_parameters(lineResults):
+    """The properties do not return a product that is stored with other parameters. """
+    lower, upper = lineResults.computeCredibleInterval(log=None)
+    assert np.all(lower > 0.0)
+
+    # The property is the log10 interval
+    assert np.allclose(lineResults.credibleLower, np.log10(lower))
+    assert np.allclose(lineResults.credibleUpper, np.log10(upper))
+
+    # Rewriting the product clears the properties of this session
+    lineResults.computeCredibleInterval(log=None)
+    assert not 'credibleLower' in lineResults.__dict__
+
+
+def test_depth_of_investigation_matches_loop():
+    """Every cutoff of every column is the deepest cell whose opacity reaches it, as found by walking up each column. """
+    prng = np.random.RandomState(0)
+    opacity = prng.uniform(size=(30, 50))
+    opacity[:, 0] = 0.0
+    z = RectilinearMesh1D(cellEdges=StatArray(np.arange(31.0)))
+    percents = [50.0, 67.0, 99.0]
+
+    doi = Inference2D._depthOfInvestigation(opacity, percents, z)
+
+    for j, percent in enumerate(percents):
+        for i in range(opacity.shape[1]):
+            iCell = opacity.shape[0] - 1
+            while iCell >= 0 and opacity[iCell, i] < 0.01 * percent:
+                iCell -= 1
+            assert doi[j, i] == (z.cellCentres[iCell-1] if iCell >= 0 else z.cellEdges[-1])
+
+    values = prng.uniform(size=(3, 50))
+    smooth = Inference2D._runningMean(values, 5)
+    for j in range(3):
+        tmp = np.convolve(values[j], np.ones(5) / 5.0, mode='valid')
+        assert np.allclose(smooth[j], np.r_[np.full(2, tmp[0]), tmp, np.full(2, tmp[-1])])
+
+
+def test_doi_shared_between_statistics_and_computeDOI(lineResults, monkeypatch):
+    """A DOI written by either path is reused by the other, and a single cutoff is not confused with a list of one. """
+    calls = []
+    def spy(opacity, percents, z):
+        calls.append(list(percents))
+        return Inference2D._depthOfInvestigation(opacity, percents, z)
+    monkeypatch.setattr(lineResults, '_depthOfInvestigation', spy)
+
+    lineResults.computeStatistics(['doi'], doiPercent=[50.0, 67.0])
+    nCalls = len(calls)
+    doi = lineResults.computeDOI([50.0, 67.0])
+    assert len(calls) == nCalls
+    assert doi.shape == (2, lineResults.nPoints)
+
+    doi = lineResults.computeDOI(67.0)
+    assert len(calls) == nCalls + 1
+    assert doi.shape == (lineResults.nPoints, )
+
+    lineResults.computeStatistics(['doi'], doiPercent=67.0)
+    assert len(calls) == nCalls + 1
+
+    doi1 = lineResults.computeDOI([67.0])
+    assert len(calls) == nCalls + 2
+    assert np.array_equal(doi1, doi[None, :])
+
+    assert np.array_equal(lineResults.doi, doi)
+
+
+def test_survey_doi(fdemInversion, tmp_path):
+    """The survey DOI is that of each line. """
+    for line in ['1.0.h5', '2.0.h5']:
+        copy(join(fdemInversion.serial, line), str(tmp_path))
+    survey = Inference3D(str(tmp_path), fdemSystemFile)
+
+    doi = survey.computeDOI([50.0, 67.0])
+    assert doi.shape == (2, fdemInversion.nPoints)
+    for i, line in enumerate(survey.lines):
+        assert np.array_equal(doi[:, survey.lineIndices[i]], line.computeDOI([50.0, 67.0]))
+    survey.close()
+
+
+@pytest.mark.parametrize('chunkSize', [1, 3, 256])
+def test_line_hitmap_keeps_every_count(lineResults, chunkSize):
+    """The chunked scatter-add gives the same line hitmap as np.add.at over each data point. """
+    lineHitmap = lineResults.computeLineHitmap(nBins=50, chunkSize=chunkSize)
+
+    counts = np.zeros(lineHitmap.counts.shape)
+    for i in range(lineResults.nPoints):
+        h = hitmap(lineResults, i)
+        np.add.at(counts, (np.s_[:], lineHitmap.x.cellIndex(h.x.cellCentres, clip=True)), h.counts)
+
+    assert np.array_equal(lineHitmap.counts, counts)
+    assert np.sum(lineHitmap.counts) == np.sum(lineResults.hdfFile['currentmodel/par/posterior/arr/data'])
+
+
+def test_survey_hitmap(fdemInversion, tmp_path):
+    """The survey hitmap is the sum of the line hitmaps on the survey bins. """
+    for line in ['1.0.h5', '2.0.h5']:
+        copy(join(fdemInversion.serial, line), str(tmp_path))
+    survey = Inference3D(str(tmp_path), fdemSystemFile)
+
+    surveyHitmap = survey.computeSurveyHitmap(nBins=50, chunkSize=3)
+
+    total = 0.0
+    for line in survey.lines:
+        assert np.array_equal(line.lineHitmap.x.cellEdges, surveyHitmap.x.cellEdges)
+        assert np.array_equal(line.lineHitmap.counts, line.computeLineHitmap(xBins=surveyHitmap.x.cellEdges).counts)
+        total = total + line.lineHitmap.counts
+    assert np.array_equal(surveyHitmap.counts, total)
+    survey.close()
+
+
+def test_doi_cache_records_the_opacity(lineResults, monkeypatch):
+    """A DOI from the opacity of other credible intervals is not reused, and matches that of computeStatistics. """
+    calls = []
+    def spy(opacity, percents, z):
+        calls.append(list(percents))
+        return Inference2D._depthOfInvestigation(opacity, percents, z)
+    monkeypatch.setattr(lineResults, '_depthOfInvestigation', spy)
+
+    doi = lineResults.computeDOI()
+    assert len(calls) == 1
+
+    doi90 = lineResults.computeDOI(opacityPercent=90.0)
+    assert len(calls) == 2
+    assert not np.array_equal(doi90, doi)
+
+    opacity = lineResults.computeOpacity(percent=90.0)
+    assert np.array_equal(doi90, Inference2D._depthOfInvestigation(np.asarray(opacity), [67.0], lineResults.hitmap(0).z)[0])
+
+    # The statistics with the same opacity reuse it
+    lineResults.computeStatistics(['doi'], percent=90.0)
+    assert len(calls) == 2
+
+    assert np.array_equal(lineResults.computeDOI(), doi)
+    assert len(calls) == 3
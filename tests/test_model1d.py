@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+
+from geobipy.src.base import customFunctions as cF
+from geobipy.src.classes.statistics.MvLogNormalDistribution import MvLogNormal
+from test_fdem import initialState
+
+
+def directInverseHessian(model, dataPoint):
+    WdJ = dataPoint.J * (dataPoint.std[dataPoint.active]**-1.0)[:, None]
+    return np.linalg.inv(np.dot(WdJ.T, WdJ) + model.par.prior.derivative(x=None, order=2))
+
+
+def restructured(model):
+    """Update the dimensions of the priors after a birth or death, as perturbStructure does. """
+    model.par.prior.ndim = model.nCells
+    model.dpar.prior.ndim = np.maximum(1, model.nCells - 1)
+    return model
+
+
+def incrementalSensitivity(dataPoint):
+    """Make the sensitivity of dataPoint update column by column, like a TdemDataPoint. """
+
+    def updateSensitivity(model):
+        i, J = model.action[1], dataPoint.J
+        full = np.asarray(type(dataPoint).sensitivity(dataPoint, model))
+        J1 = np.empty_like(full)
+        if model.action[0] == 'birth':
+            J1[:, :i], J1[:, i + 2:], J1[:, i:i + 2] = J[:, :i], J[:, i + 1:], full[:, i:i + 2]
+        else:
+            J1[:, :i], J1[:, i + 1:], J1[:, i] = J[:, :i], J[:, i + 2:], full[:, i]
+        dataPoint.J = J1
+
+    dataPoint._incrementalSensitivity = True
+    dataPoint.updateSensitivity = updateSensitivity
+    return dataPoint
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_inverse_hessian_after_birth_and_death(fdemDataFile, incremental):
+    """Births and deaths give the inverse of the Hessian of the updated sensitivity matrix. """
+    Mod, dataPoint = initialState(fdemDataFile)
+    if incremental:
+        dataPoint = incrementalSensitivity(dataPoint)
+
+    for z in [20.0, 60.0, 5.0]:
+        Mod = restructured(Mod.insertLayer(z))
+        Mod.updateLocalParameterVariance(dataPoint)
+        assert np.allclose(Mod.inverseHessian, directInverseHessian(Mod, dataPoint), rtol=1e-8, atol=0.0)
+
+    Mod = restructured(Mod.deleteLayer(1))
+    Mod.updateLocalParameterVariance(dataPoint)
+    assert np.allclose(Mod.inverseHessian, directInverseHessian(Mod, dataPoint), rtol=1e-8, atol=0.0)
+
+    # Only the incremental sensitivity uses the low rank updates
+    assert Mod._nHessianUpdates == (4 if incremental else 0)
+
+    if not incremental:
+        # The sensitivity is recomputed in full, as for a new model
+        J = dataPoint.sensitivity(Mod)
+        assert np.allclose(dataPoint.J, J, rtol=1e-12, atol=0.0)
+
+
+def test_inverse_hessian_after_error_change(fdemDataFile):
+    """The low rank update is only used while the data errors match those of the inverse Hessian. """
+    Mod, dataPoint = initialState(fdemDataFile)
+    dataPoint = incrementalSensitivity(dataPoint)
+
+    dataPoint.updateErrors(0.1, dataPoint.addErr)
+    Mod = restructured(Mod.insertLayer(20.0))
+    Mod.updateLocalParameterVariance(dataPoint)
+
+    assert Mod._nHessianUpdates == 0
+    assert np.allclose(Mod.inverseHessian, directInverseHessian(Mod, dataPoint), rtol=1e-8, atol=0.0)
+
+
+def test_inverse_hessian_is_kept_without_birth_or_death(fdemDataFile):
+    Mod, dataPoint = initialState(fdemDataFile)
+    Mod = restructured(Mod.insertLayer(20.0))
+    Mod.updateLocalParameterVariance(dataPoint)
+    factor = Mod._hessianFactor
+
+    for action in ['perturb', 'none']:
+        Mod.action = [action, 0, 0.0]
+        Mod.updateLocalParameterVariance(dataPoint)
+        assert Mod._hessianFactor is factor
+
+
+def test_inverse_hessian_is_recomputed_from_a_fresh_sensitivity(fdemDataFile, monkeypatch):
+    """The full recomputes, periodic or after a failed low rank update, rebuild the sensitivity matrix for the current model. """
+    Mod, dataPoint = initialState(fdemDataFile)
+    dataPoint = incrementalSensitivity(dataPoint)
+    maxUpdates = 2
+
+    def fresh(model):
+        WdJ = np.asarray(type(dataPoint).sensitivity(dataPoint, model)) * (dataPoint.std[dataPoint.active]**-1.0)[:, None]
+        return np.linalg.inv(np.dot(WdJ.T, WdJ) + model.par.prior.derivative(x=None, order=2))
+
+    prng = np.random.RandomState(0)
+    def check(Mod):
+        # Change the conductivities, as if the model had been accepted after a perturbation
+        Mod.par[:] = Mod.par * np.exp(prng.normal(size=Mod.nCells[0]))
+        Mod.updateLocalParameterVariance(dataPoint, maxUpdates=maxUpdates)
+        nUpdates.append(Mod._nHessianUpdates)
+        if Mod._nHessianUpdates == 0:
+            assert np.allclose(Mod.inverseHessian, fresh(Mod), rtol=1e-8, atol=0.0)
+        else:
+            assert np.allclose(Mod.inverseHessian, directInverseHessian(Mod, dataPoint), rtol=1e-8, atol=0.0)
+
+    nUpdates = []
+    for z in [20.0, 60.0, 5.0, 40.0, 90.0]:
+        Mod = restructured(Mod.insertLayer(z))
+        check(Mod)
+    for i in [3, 0, 1]:
+        Mod = restructured(Mod.deleteLayer(i))
+        check(Mod)
+
+    assert nUpdates == [1, 2, 0, 1, 2, 0, 1, 2]
+
+    # A failed low rank update has already updated the columns of the changed layers
+    Mod = restructured(Mod.insertLayer(30.0))
+    def singular(dataPoint):
+        dataPoint.updateSensitivity(Mod)
+        raise np.linalg.LinAlgError
+    monkeypatch.setattr(Mod, '_lowRankInverseHessian', singular)
+
+    maxUpdates = 10
+    check(Mod)
+    assert nUpdates[-1] == 0
+
+
+def test_proposal_uses_the_hessian_factor(fdemDataFile, monkeypatch):
+    """The Newton step and the parameter proposal use the Cholesky factor of the Hessian without forming its inverse. """
+    Mod, dataPoint = initialState(fdemDataFile)
+    Mod = restructured(Mod.insertLayer(20.0))
+    Mod.updateLocalParameterVariance(dataPoint)
+    dataPoint.forward(Mod)
+
+    WdJ = dataPoint.J * (dataPoint.std[dataPoint.active]**-1.0)[:, None]
+    hessian = np.dot(WdJ.T, WdJ) + Mod.par.prior.derivative(x=None, order=2)
+    assert np.allclose(np.dot(Mod._hessianFactor, Mod._hessianFactor.T), hessian, rtol=1e-12)
+
+    def formed(*args):
+        raise AssertionError('The inverse Hessian was formed')
+    monkeypatch.setattr(cF, 'choInv', formed)
+
+    Mod.action = ['perturb', 0, 0.0]
+    remapped, perturbed = Mod.perturb(dataPoint)
+    assert remapped._inverseHessian is None
+    assert perturbed.par.proposal._precision is remapped._hessianFactor
+
+    gradient = np.dot(dataPoint.J.T, dataPoint.predictedData.priorDerivative(order=1, i=dataPoint.active)) + remapped.par.priorDerivative(order=1)
+    assert np.allclose(remapped._inverseHessianDot(gradient), np.linalg.solve(hessian, gradient), rtol=1e-10)
+
+    dataPoint.forward(perturbed)
+    proposal, proposal1 = perturbed.proposalProbabilities(remapped, dataPoint)
+    monkeypatch.undo()
+
+    # The same densities from the explicit inverse Hessian
+    explicit = MvLogNormal(perturbed.par.proposal.mean, np.linalg.inv(hessian), linearSpace=True)
+    assert np.isclose(proposal1, explicit.probability(perturbed.par, log=True), rtol=1e-10)
+
+    gradient = np.dot(dataPoint.J.T, dataPoint.predictedData.priorDerivative(order=1, i=dataPoint.active)) + perturbed.par.priorDerivative(order=1)
+    explicit.mean = np.exp(np.log(perturbed.par) - 0.5 * np.linalg.solve(hessian, gradient))
+    assert np.isclose(proposal, explicit.probability(remapped.par, log=True), rtol=1e-10)
+
+    assert np.allclose(remapped.inverseHessian, np.linalg.inv(hessian), rtol=1e-8)
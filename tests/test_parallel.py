@@ -0,0 +1,119 @@
+import h5py
+import numpy as np
+import pytest
+import subprocess
+import sys
+from os import environ
+from os.path import abspath, dirname, join
+from pathlib import Path
+from shutil import copy, which
+
+from geobipy import serial_geobipy
+from geobipy.src.base import customFunctions
+from conftest import fdemData
+
+testsDirectory = dirname(abspath(__file__))
+packageDirectory = dirname(testsDirectory)
+
+inputFile = """import sys
+sys.path.insert(0, {!r})
+from geobipy import FdemData
+from conftest import fdemUserParameters, fdemSystemFile
+
+data_type = FdemData()
+dataFilename = {!r}
+systemFilename = fdemSystemFile
+userParameters = fdemUserParameters(dataFilename, ignoreLikelihood=True)
+"""
+
+
+def writeInput(directory):
+    """ Data file and user input file of the inversion in the fdemInversion fixture. """
+    dataFilename = str(directory / 'data.txt')
+    with open(dataFilename, 'w') as f:
+        f.write(fdemData)
+    fName = directory / 'inversionInput.py'
+    with open(str(fName), 'w') as f:
+        f.write(inputFile.format(testsDirectory, dataFilename))
+    return fName
+
+
+def assertMatchesSerial(fdemInversion, outputDir):
+    """The line results are those of the serial inversion, apart from the time taken by each data point. """
+    for line in ['1.0.h5', '2.0.h5']:
+        with h5py.File(join(fdemInversion.serial, line), 'r') as serial, h5py.File(join(str(outputDir), line), 'r') as f:
+            assert not np.any(np.isnan(f['invtime'][:]))
+            keys = []
+            serial.visititems(lambda key, x: keys.append(key) if isinstance(x, h5py.Dataset) else None)
+            for key in keys:
+                if key != 'invtime':
+                    assert np.array_equal(serial[key][()], f[key][()], equal_nan=np.issubdtype(serial[key].dtype, np.inexact)), key
+
+
+@pytest.mark.parametrize('schedule, batchSize', [('fifo', 2), ('ljf', 2)])
+def test_mpi_matches_serial(fdemInversion, tmp_path, schedule, batchSize):
+    """The master and two workers of an MPI run give the same results for every fiducial as the serial inversion. """
+    pytest.importorskip('mpi4py')
+    mpirun = which('mpirun')
+    if mpirun is None:
+        pytest.skip('mpirun is not available')
+
+    fName = writeInput(tmp_path)
+    script = 'import sys; from geobipy import geobipy_mpi; sys.argv = sys.argv[:1] + {!r}; geobipy_mpi()'.format(
+        [fName.name, 'results', '--seed', '0', '--schedule', schedule, '--batchSize', str(batchSize)])
+
+    out = subprocess.run([mpirun, '--allow-run-as-root', '--oversubscribe', '-n', '3', sys.executable, '-c', script],
+                         cwd=str(tmp_path), env=dict(environ, PYTHONPATH=packageDirectory), capture_output=True, text=True)
+    assert out.returncode == 0, out.stdout + out.stderr
+
+    assertMatchesSerial(fdemInversion, tmp_path / 'results')
+
+
+def test_multiprocessing_matches_serial(fdemInversion, tmp_path, monkeypatch):
+    """A pool of worker processes gives the same results for every fiducial as the serial inversion. """
+    fName = writeInput(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    serial_geobipy(Path(fName.name), tmp_path / 'results', seed=0, workers=2)
+
+    assertMatchesSerial(fdemInversion, tmp_path / 'results')
+
+
+def test_restart_inverts_only_unfinished_points(fdemInversion, tmp_path, monkeypatch):
+    """A restart keeps the data points whose inversion time is set, and inverts the others again. """
+    fName = writeInput(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    results = tmp_path / 'results'
+    results.mkdir()
+    for line in ['1.0.h5', '2.0.h5']:
+        copy(join(fdemInversion.serial, line), str(results))
+
+    # The first two points of line 1 were interrupted, the marker in 'i' shows which points are inverted again.
+    with h5py.File(str(results / '1.0.h5'), 'a') as f:
+        f['invtime'][:2] = np.nan
+        f['i'][:] = -1
+    with h5py.File(str(results / '2.0.h5'), 'a') as f:
+        f['i'][:] = -1
+
+    serial_geobipy(Path(fName.name), results, seed=0, skipHDF5=True)
+
+    with h5py.File(join(fdemInversion.serial, '1.0.h5'), 'r') as serial, h5py.File(str(results / '1.0.h5'), 'r') as f:
+        assert not np.any(np.isnan(f['invtime'][:]))
+        assert np.array_equal(f['i'][:2], serial['i'][:2])
+        assert np.all(f['i'][2:] == -1)
+        assert np.array_equal(f['currentmodel/par/posterior/arr/data'][()], serial['currentmodel/par/posterior/arr/data'][()])
+    with h5py.File(str(results / '2.0.h5'), 'r') as f:
+        assert np.all(f['i'][:] == -1)
+
+
+def test_fiducial_prng():
+    """A data point draws the same numbers from the same master seed, and different numbers for another fiducial or seed. """
+    a = customFunctions.fiducialPrng(0, 10.0).standard_normal(100)
+    assert np.array_equal(customFunctions.fiducialPrng(0, 10.0).standard_normal(100), a)
+    assert np.array_equal(customFunctions.fiducialPrng(0, np.float64(10)).standard_normal(100), a)
+
+    assert not np.array_equal(customFunctions.fiducialPrng(0, 11.0).standard_normal(100), a)
+    assert not np.array_equal(customFunctions.fiducialPrng(1, 10.0).standard_normal(100), a)
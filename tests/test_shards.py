@@ -0,0 +1,28 @@
+import h5py
+import numpy as np
+from glob import glob
+from os.path import basename, join
+
+
+def datasets(fName):
+    out = {}
+    with h5py.File(fName, 'r') as f:
+        f.visititems(lambda key, x: out.update({key : x[()]}) if isinstance(x, h5py.Dataset) else None)
+    return out
+
+
+def test_merged_shards_match_serial_results(fdemInversion):
+    """Merging the shards of two workers gives the same line results files as writing every point in serial. """
+    assert fdemInversion.nMerged == fdemInversion.nPoints
+    assert glob(join(fdemInversion.merged, 'shards', '*.h5')) == []
+
+    serialFiles = sorted(glob(join(fdemInversion.serial, '*.h5')))
+    assert len(serialFiles) == 2
+
+    for fName in serialFiles:
+        serial = datasets(fName)
+        merged = datasets(join(fdemInversion.merged, basename(fName)))
+        assert serial.keys() == merged.keys()
+        assert not np.any(np.isnan(serial['invtime']))
+        for key in serial:
+            assert np.array_equal(serial[key], merged[key], equal_nan=np.issubdtype(serial[key].dtype, np.inexact)), key
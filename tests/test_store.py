@@ -0,0 +1,51 @@
+import numpy as np
+import os
+
+from geobipy import FdemData
+from geobipy.src.base import fileIO
+from conftest import fdemSystemFile
+
+
+def readDatapoints(dataFilename):
+    D = FdemData(systems=fdemSystemFile)
+    D._initLineByLineRead([dataFilename], [fdemSystemFile])
+    points = []
+    for dataPoint in iter(D._readSingleDatapoint, None):
+        points.append((dataPoint.fiducial, dataPoint.x, dataPoint.y, dataPoint.z, dataPoint.data.copy()))
+    D._closeDatafiles()
+    return points
+
+
+def test_store_matches_text(fdemDataFile, monkeypatch):
+    """Reads from the binary store give the same values as parsing the text file. """
+    nLines = fileIO.getNlines(fdemDataFile, 1)
+    columns = fileIO.read_columns(fdemDataFile, [0, 1, 6, 17], 1, nLines)
+    points = readDatapoints(fdemDataFile)
+
+    store = fileIO.createStore(fdemDataFile)
+    assert fileIO.getStore(fdemDataFile) == store
+    assert fileIO.getNlines(fdemDataFile, 1) == nLines == 8
+    assert np.array_equal(fileIO.read_columns(fdemDataFile, [0, 1, 6, 17], 1, nLines), columns)
+
+    read = []
+    read_store_rows = fileIO.read_store_rows
+    monkeypatch.setattr(fileIO, 'read_store_rows', lambda *args, **kwargs: read.append(args) or read_store_rows(*args, **kwargs))
+    stored = readDatapoints(fdemDataFile)
+    assert len(read) == 1
+    assert len(stored) == len(points) == 8
+    for a, b in zip(stored, points):
+        assert a[:4] == b[:4]
+        assert np.array_equal(a[4], b[4])
+
+
+def test_store_is_ignored_once_the_text_changes(fdemDataFile):
+    store = fileIO.createStore(fdemDataFile)
+    assert fileIO.getStore(fdemDataFile, nHeaders=2) is None
+
+    with open(fdemDataFile, 'a') as f:
+        f.write("3 30 0 150 30 0 146.173 215.624 449.249 424.599 264.511 186.196 859.687 540.546 1416.86 411.493 1490.4 267.017\n")
+
+    assert fileIO.getStore(fdemDataFile) is None
+    assert fileIO.getNlines(fdemDataFile, 1) == 9
+    assert len(readDatapoints(fdemDataFile)) == 9
+    assert os.path.isfile(store)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from os.path import dirname, join
+
+from geobipy import Model1D, StatArray, Waveform, SquareLoop, CircularLoop, butterworth, TdemSystem
+from geobipy.src.classes.data.datapoint.TdemDataPoint import TdemDataPoint
+from geobipy.src.classes.forwardmodelling.Electromagnetic.TD import tdem1d
+
+dataFolder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples', 'supplementary', 'Data')
+
+
+def walktemDataPoint():
+    """ A ground based WalkTEM sounding with a low and high moment, forward modelled with empymod. """
+    filters = [butterworth(1, 4.5e5, btype='low'), butterworth(1, 3.e5, btype='low')]
+    lm = TdemSystem(offTimes=np.r_[1.149e-05, 2.000e-05, 3.700e-05, 7.949e-05, 1.875e-04, 4.580e-04],
+                    transmitterLoop=SquareLoop(sideLength=40.0), receiverLoop=CircularLoop(), loopOffset=np.r_[0.0, 0.0, 0.0],
+                    waveform=Waveform(time=np.r_[-1.041e-03, -9.850e-04, 0.0, 4.000e-06], amplitude=np.r_[0.0, 1.0, 1.0, 0.0], current=1.0),
+                    offTimeFilters=filters)
+    hm = TdemSystem(offTimes=np.r_[9.810e-05, 2.341e-04, 5.746e-04, 1.431e-03, 3.580e-03],
+                    transmitterLoop=SquareLoop(sideLength=40.0), receiverLoop=CircularLoop(), loopOffset=np.r_[0.0, 0.0, 0.0],
+                    waveform=Waveform(time=np.r_[-8.333e-03, -8.033e-03, 0.0, 5.600e-06], amplitude=np.r_[0.0, 1.0, 1.0, 0.0], current=1.0),
+                    offTimeFilters=filters)
+
+    data = [np.r_[7.98e-06, 1.57e-06, 5.88e-07, 2.06e-07, 5.60e-08, 1.14e-08],
+            np.r_[1.56e-07, 4.07e-08, 8.35e-09, 1.37e-09, 1.84e-10]]
+    return TdemDataPoint(data=data, system=[lm, hm], transmitter_loop=SquareLoop(sideLength=40.0), receiver_loop=CircularLoop())
+
+
+@pytest.fixture
+def model():
+    return Model1D(3, parameters=StatArray(np.r_[0.01, 0.1, 0.02]), thickness=StatArray(np.r_[20.0, 55.0]))
+
+
+def test_empymod_sensitivity_reuses_the_forward_model(model, monkeypatch):
+    """The base response of the finite differences is the forward model, so the fused call needs no separate forward. """
+    calls = []
+    walktem = tdem1d.empymod_walktem
+    monkeypatch.setattr(tdem1d, 'empymod_walktem', lambda system, model1d: calls.append(1) or walktem(system, model1d))
+
+    separate = walktemDataPoint()
+    separate.forward(model)
+    J = separate.sensitivity(model)
+    nSeparate = len(calls)
+
+    fused = walktemDataPoint()
+    J1 = fused.sensitivity(model, forward=True)
+
+    assert nSeparate == fused.nSystems * (model.nCells[0] + 2)
+    assert len(calls) - nSeparate == fused.nSystems * (model.nCells[0] + 1)
+
+    assert np.array_equal(fused.predictedData, separate.predictedData)
+    assert np.array_equal(J1, J)
+    assert np.all(np.abs(J) > 0.0)
+
+    # Only the changed layers of an incremental update, the predicted data are untouched
+    model = model.insertLayer(40.0)
+    fused.updateSensitivity(model)
+    assert np.array_equal(fused.predictedData, separate.predictedData)
+    assert np.array_equal(fused.J[:, [0, 3]], J[:, [0, 2]])
+
+
+def test_gaaem_sensitivity_reuses_the_forward_model(model, monkeypatch):
+    """The GA-AEM systems hold the forward model of the fused call, so the sensitivity does not forward model again. """
+    pytest.importorskip('gatdaem1d')
+
+    def skytemDataPoint():
+        systems = [TdemSystem().read(join(dataFolder, 'SkytemLM-SLV.stm')), TdemSystem().read(join(dataFolder, 'SkytemHM-SLV.stm'))]
+        return TdemDataPoint(z=30.0, data=[np.ones(s.nTimes) for s in systems], system=systems, transmitter_loop=CircularLoop(), receiver_loop=CircularLoop())
+
+    separate = skytemDataPoint()
+    separate.forward(model)
+    J = separate.sensitivity(model)
+
+    calls = []
+    sensitivity = tdem1d.gaTdem1dsen
+    monkeypatch.setattr(tdem1d, 'gaTdem1dsen', lambda datapoint, model1d, ix, modelChanged: calls.append(modelChanged) or sensitivity(datapoint, model1d, ix, modelChanged))
+
+    dataPoint = skytemDataPoint()
+    J1 = dataPoint.sensitivity(model, forward=True)
+
+    assert calls == [False]
+    assert np.allclose(dataPoint.predictedData, separate.predictedData, rtol=1e-12, atol=0.0)
+    assert np.allclose(J1, J, rtol=1e-12, atol=0.0)